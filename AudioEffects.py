@@ -0,0 +1,103 @@
+"""
+Pitch shifting for synthesized speech. Speed is left to the TTS model itself.
+
+Modes, from fastest to best sounding:
+- "balanced": WSOLA time stretch followed by resampling. Each frame is lined up with its
+  neighbour before it's added, which keeps the waveform continuous.
+- "quality": librosa's phase-vocoder pitch shift (the original behaviour).
+"fast" is accepted as another name for "balanced". It used to be plain overlap-add, but
+without the alignment the frame boundaries dominate the spectrum, so tones came out at their
+original pitch (see the pitch check in benchmarks/pitch_shift.py).
+
+A pitch shift of 0 semitones returns the input untouched.
+"""
+import numpy as np
+
+PITCH_SHIFT_MODES = ("balanced", "quality")
+MODE_ALIASES = {"fast": "balanced"}
+DEFAULT_MODE = "balanced"
+
+FRAME_DURATION = 0.04  # 40 ms frames, long enough to hold a couple of pitch periods
+SEARCH_DURATION = 0.01  # How far WSOLA may move a frame to line it up
+
+
+def _resample_to_length(wav, length):
+    """Linearly resamples `wav` to exactly `length` samples."""
+    if len(wav) == length:
+        return wav
+    positions = np.linspace(0, len(wav) - 1, num=length)
+    return np.interp(positions, np.arange(len(wav)), wav).astype(np.float32)
+
+
+def _frames(sr):
+    frame_length = int(FRAME_DURATION * sr) // 2 * 2
+    hop = frame_length // 2
+    window = np.hanning(frame_length + 1)[:-1].astype(np.float32)  # Periodic Hann sums to 1 at 50% overlap
+    return frame_length, hop, window
+
+
+def _overlap_add(frames, hop):
+    """Adds 50%-overlapping frames back together without a Python loop."""
+    output = np.zeros((len(frames) + 1) * hop, dtype=np.float32)
+    output[:-hop] += frames[:, :hop].ravel()
+    output[hop:] += frames[:, hop:].ravel()
+    return output
+
+
+def time_stretch(wav, sr, rate):
+    """
+    Changes the duration of `wav` by `rate` (2.0 = twice as long) without changing its pitch (WSOLA).
+    """
+    wav = np.asarray(wav, dtype=np.float32)
+    if rate == 1.0 or len(wav) == 0:
+        return wav
+
+    frame_length, hop, window = _frames(sr)
+    input_hop = hop / rate
+    output_length = int(round(len(wav) * rate))
+    frame_count = max(1, int(np.ceil(output_length / hop)))
+
+    tolerance = int(SEARCH_DURATION * sr)
+    padded = np.pad(wav, (tolerance, frame_length + hop + tolerance + int(np.ceil(input_hop))))
+    starts = (np.arange(frame_count) * input_hop).astype(np.int64) + tolerance
+    starts = _align_frames(padded, starts, frame_length, hop, tolerance)
+
+    frames = padded[starts[:, None] + np.arange(frame_length)[None, :]] * window
+    return _overlap_add(frames, hop)[:output_length]
+
+
+def _align_frames(padded, starts, frame_length, hop, tolerance):
+    """
+    WSOLA: nudges every frame start by up to `tolerance` samples so it best matches the audio
+    that would naturally follow the previous frame.
+    """
+    aligned = starts.copy()
+    offsets = np.arange(-tolerance, tolerance + 1)
+    for index in range(1, len(starts)):
+        natural = padded[aligned[index - 1] + hop:aligned[index - 1] + hop + frame_length]
+        candidates = padded[starts[index] - tolerance:starts[index] + tolerance + frame_length]
+        if len(natural) < frame_length or len(candidates) < frame_length + 2 * tolerance or not natural.any():
+            continue
+        correlation = np.correlate(candidates, natural, mode="valid")
+        aligned[index] = starts[index] + offsets[int(np.argmax(correlation))]
+    return aligned
+
+
+def shift_pitch(wav, sr, n_steps, mode=DEFAULT_MODE):
+    """Shifts the pitch of `wav` by `n_steps` semitones, keeping its duration."""
+    if n_steps == 0:
+        return wav
+
+    mode = MODE_ALIASES.get(mode, mode)
+    if mode == "quality":
+        import librosa
+        return librosa.effects.pitch_shift(np.asarray(wav, dtype=np.float32), sr=sr, n_steps=n_steps)
+
+    if mode not in PITCH_SHIFT_MODES:
+        raise ValueError(f"Unknown pitch shift mode {mode!r}. Choose from {PITCH_SHIFT_MODES}")
+
+    # Stretch by the pitch ratio, then resample back to the original length to raise or lower the pitch
+    ratio = 2 ** (n_steps / 12)
+    stretched = time_stretch(wav, sr, ratio)
+    return _resample_to_length(stretched, len(wav))
+
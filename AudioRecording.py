@@ -1,10 +1,8 @@
 import time
-import sounddevice as sd
-import soundfile as sf
 import numpy as np
 
 def record_audio(filename="tmp/response.wav", samplerate=44100, channels=1, silence_threshold=0.001,
-                 short_pause_duration=1.5, long_silence_duration=2.5):
+                 short_pause_duration=1.5, long_silence_duration=2.5, on_chunk=None):
     """
     Records audio and stops automatically after detecting a long silence **following** speech.
 
@@ -13,16 +11,22 @@ def record_audio(filename="tmp/response.wav", samplerate=44100, channels=1, sile
     - Ensures the audio stream properly closes after stopping.
 
     Parameters:
-    - filename (str): Name of the output file.
+    - filename (str): Name of the output file. Pass None to skip writing a WAV file.
     - samplerate (int): Sample rate of recording.
     - channels (int): Number of audio channels.
     - silence_threshold (float): Volume level below which sound is considered silence.
     - short_pause_duration (float): Max duration of short pauses allowed.
     - long_silence_duration (float): Duration required to detect a long silence and stop.
+    - on_chunk (callable): Optional callback that receives every captured block as it arrives
+      (used for streaming transcription). It runs on the audio thread, so it must be fast.
 
     Returns:
     - Saves the recorded file and exits.
     """
+    # Imported here because initialising PortAudio is slow and most importers never record
+    import sounddevice as sd
+    import soundfile as sf
+
     recording = []
     volume_history = []
     speech_detected = False
@@ -38,6 +42,8 @@ def record_audio(filename="tmp/response.wav", samplerate=44100, channels=1, sile
             print(f" Audio Input Error: {status}")
 
         recording.append(indata.copy())
+        if on_chunk is not None:
+            on_chunk(recording[-1])
 
         # Measure volume level (Root Mean Square)
         volume_norm = np.linalg.norm(indata) / len(indata)
@@ -85,7 +91,9 @@ def record_audio(filename="tmp/response.wav", samplerate=44100, channels=1, sile
         print("\n Stopping stream...")
 
     # Ensure the recording contains valid audio
-    if len(recording) > 0:
+    if len(recording) > 0 and filename is None:
+        print(" Recording streamed, no file written.")
+    elif len(recording) > 0:
         audio_data = np.concatenate(recording, axis=0)
         sf.write(filename, audio_data, samplerate)
         print(f" Saved recording as {filename}")
@@ -0,0 +1,165 @@
+"""
+Immutable index over a model catalogue, built once so pick_model doesn't rescan every model per prompt.
+
+Each model gets a bit position (its place in the catalogue). The index keeps:
+- bitmasks of local, online and vision models,
+- the models sorted by VRAM and by cost with a prefix bitmask per position, so "fits in X GB"
+  or "costs at most Y" is a bisect plus a mask lookup,
+- per subject, the models with that strength sorted strongest first, plus a bitmask of them.
+
+Vision prompts are restricted to the vision models within the same settings and ranked by their
+"Vision" strength, so an offline user gets a local vision model and an online one the strongest
+API model their cost tolerance allows.
+
+A pick is then a few bisects, an AND of the masks and a walk down one subject list. With a
+latency budget, models measured to be slower than the budget have their strength scaled down by
+budget / latency before ranking, so a much stronger slow model can still beat a weak fast one.
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from types import MappingProxyType
+
+from Model import LocalModel, OnlineModel
+
+VISION_SUBJECT = "Vision"
+
+
+def _prefix_masks(order):
+    """masks[k] has the bits of the first k models in `order` set."""
+    masks = [0]
+    for index in order:
+        masks.append(masks[-1] | (1 << index))
+    return tuple(masks)
+
+
+def iter_bits(mask):
+    """Bit positions set in `mask`, lowest (earliest in the catalogue) first."""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class CapabilityIndex:
+    __slots__ = ("models", "all_mask", "local_mask", "online_mask", "vision_mask", "_vram_values", "_vram_masks",
+                 "_cost_values", "_cost_masks", "_subject_levels", "_subject_rankings", "_subject_masks")
+
+    def __init__(self, models):
+        models = tuple(models)
+        self.models = models
+        self.all_mask = (1 << len(models)) - 1
+        # type() rather than isinstance() to match how pick_model has always told them apart
+        self.local_mask = sum(1 << i for i, model in enumerate(models) if type(model) == LocalModel)
+        self.online_mask = sum(1 << i for i, model in enumerate(models) if type(model) == OnlineModel)
+        self.vision_mask = sum(1 << i for i, model in enumerate(models) if model.vision_model)
+
+        by_vram = sorted(range(len(models)), key=lambda i: models[i].vram)
+        self._vram_values = tuple(models[i].vram for i in by_vram)
+        self._vram_masks = _prefix_masks(by_vram)
+
+        by_cost = sorted(range(len(models)), key=lambda i: models[i].cost)
+        self._cost_values = tuple(models[i].cost for i in by_cost)
+        self._cost_masks = _prefix_masks(by_cost)
+
+        # Exact subject names only; a model listing a subject twice counts once at its best level
+        levels = {}
+        for i, model in enumerate(models):
+            for strength in model.strengths:
+                subject_levels = levels.setdefault(strength.subject_strength, {})
+                subject_levels[i] = max(subject_levels.get(i, strength.strength_level), strength.strength_level)
+
+        self._subject_levels = MappingProxyType({subject: MappingProxyType(subject_levels)
+                                                 for subject, subject_levels in levels.items()})
+        # Strongest first; ties keep catalogue order, as the old stable sort did
+        self._subject_rankings = MappingProxyType({
+            subject: tuple(sorted(subject_levels, key=lambda i: (-subject_levels[i], i)))
+            for subject, subject_levels in levels.items()
+        })
+        self._subject_masks = MappingProxyType({subject: sum(1 << i for i in subject_levels)
+                                                for subject, subject_levels in levels.items()})
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("CapabilityIndex is immutable; build a new one for a new catalogue")
+        super().__setattr__(name, value)
+
+    def __len__(self):
+        return len(self.models)
+
+    def max_vram_mask(self, max_vram):
+        return self._vram_masks[bisect_right(self._vram_values, max_vram)]
+
+    def max_cost_mask(self, max_cost):
+        return self._cost_masks[bisect_right(self._cost_values, max_cost)]
+
+    def subject_mask(self, subject):
+        return self._subject_masks.get(subject, 0)
+
+    def eligible_mask(self, max_vram, max_cost, use_internet):
+        """Models that fit in the VRAM budget, cost tolerance and internet setting."""
+        location_mask = self.online_mask if use_internet else self.local_mask
+        return self.max_vram_mask(max_vram) & self.max_cost_mask(max_cost) & location_mask
+
+    def ranked(self, subject, mask, limit):
+        """Up to `limit` models in `mask`, strongest at `subject` first."""
+        if not mask & self.subject_mask(subject):
+            # Nobody lists the subject: fall back to the eligible models in catalogue order
+            return [self.models[i] for i, _ in zip(iter_bits(mask), range(limit))]
+
+        picked = []
+        for i in self._subject_rankings[subject]:
+            if mask >> i & 1:
+                picked.append(self.models[i])
+                if len(picked) == limit:
+                    break
+        return picked
+
+    def ranked_within_budget(self, subject, mask, limit, latency_budget, expected_latency):
+        """
+        Like ranked(), but trades strength against speed: a model expected to take longer than
+        `latency_budget` seconds has its strength multiplied by budget / latency.
+        `expected_latency(model)` returns seconds, or None for a model with no estimate (treated as
+        within budget).
+        """
+        levels = self._subject_levels.get(subject, {})
+        if mask & self.subject_mask(subject):
+            candidates = [i for i in self._subject_rankings[subject] if mask >> i & 1]
+        else:
+            candidates = list(iter_bits(mask))
+
+        def score(i):
+            latency = expected_latency(self.models[i])
+            strength = levels.get(i, 0)
+            if latency is not None and latency > latency_budget:
+                strength *= latency_budget / latency
+            return -strength, latency or 0.0, i
+
+        return [self.models[i] for i in sorted(candidates, key=score)[:limit]]
+
+    def first_vision_model(self, mask=None):
+        mask = self.vision_mask if mask is None else self.vision_mask & mask
+        return self.models[next(iter_bits(mask))] if mask else None
+
+    def pick(self, subject, requires_vision, max_vram, max_cost, use_internet, limit=2,
+             latency_budget=None, expected_latency=None):
+        mask = self.eligible_mask(max_vram, max_cost, use_internet)
+        if requires_vision:
+            # Vision prompts are ranked by vision strength among the vision models the settings allow
+            if mask & self.vision_mask:
+                subject, mask = VISION_SUBJECT, mask & self.vision_mask
+            else:
+                print("No vision model fits the settings, picking a text model")
+
+        if latency_budget is not None and expected_latency is not None:
+            return self.ranked_within_budget(subject, mask, limit, latency_budget, expected_latency)
+        return self.ranked(subject, mask, limit)
+
+
+@lru_cache(maxsize=8)
+def _build_index(models):
+    return CapabilityIndex(models)
+
+
+def get_capability_index(models):
+    """The index for this catalogue, built on first use and reused while the catalogue is unchanged."""
+    return _build_index(tuple(models))
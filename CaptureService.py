@@ -0,0 +1,301 @@
+"""
+Long-lived webcam capture, so taking a picture doesn't cost a device open and a 2 second sleep.
+
+A background thread keeps reading frames into a small ring buffer and scores each one for
+sharpness (variance of the Laplacian) and exposure (mean brightness, clipped pixels). A capture
+returns the best recent frame straight away, or waits only until the camera produces an
+acceptable one, which replaces the fixed warm-up sleep. The camera is released after
+IDLE_TIMEOUT seconds without a capture and reopened on the next one.
+
+The frame source is picked with the CAPTURE_SOURCE environment variable: a camera index
+(default "0"), the path of a video file, or "synthetic" for generated frames.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+BUFFER_SIZE = 8
+MAX_FRAME_AGE = 1.0  # Seconds; older frames no longer show what's in front of the camera
+CAPTURE_TIMEOUT = 5.0  # Longest a capture waits for an acceptable frame
+IDLE_TIMEOUT = 300.0  # Release the camera after this long without a capture
+
+# Frame quality thresholds, measured on a SCORING_WIDTH-wide greyscale copy
+SCORING_WIDTH = 320
+MIN_SHARPNESS = 30.0
+MIN_BRIGHTNESS = 40  # Webcams start dark while auto exposure settles
+MAX_BRIGHTNESS = 220
+MAX_CLIPPED = 0.25  # Share of pixels at pure black or white
+
+
+@dataclass
+class Frame:
+    image: np.ndarray
+    timestamp: float
+    sharpness: float
+    brightness: float
+    clipped: float
+
+    @property
+    def well_exposed(self):
+        return MIN_BRIGHTNESS <= self.brightness <= MAX_BRIGHTNESS and self.clipped <= MAX_CLIPPED
+
+    @property
+    def acceptable(self):
+        return self.well_exposed and self.sharpness >= MIN_SHARPNESS
+
+
+def score_frame(image, timestamp=None):
+    """Measures sharpness and exposure of a BGR frame."""
+    height, width = image.shape[:2]
+    if width > SCORING_WIDTH:
+        image = cv2.resize(image, (SCORING_WIDTH, int(height * SCORING_WIDTH / width)), interpolation=cv2.INTER_AREA)
+    grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    sharpness = float(cv2.Laplacian(grey, cv2.CV_64F).var())
+    clipped = float(np.count_nonzero((grey <= 2) | (grey >= 253))) / grey.size
+    return sharpness, float(grey.mean()), clipped
+
+
+class CameraSource:
+    """A webcam, or anything else cv2.VideoCapture can open."""
+
+    def __init__(self, device=0):
+        self.device = device
+        self.capture = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.device)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open camera {self.device!r}")
+
+    def read(self):
+        return self.capture.read()
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class VideoFileSource(CameraSource):
+    """Plays a video file at its own frame rate, looping, as if it were a camera."""
+
+    def __init__(self, path, loop=True):
+        super().__init__(path)
+        self.loop = loop
+        self.frame_interval = 0.0
+        self._next_frame = 0.0
+
+    def open(self):
+        super().open()
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_interval = 1.0 / fps
+        self._next_frame = time.monotonic()
+
+    def read(self):
+        # A file reads much faster than a camera delivers frames, so pace it
+        delay = self._next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame = max(self._next_frame + self.frame_interval, time.monotonic())
+
+        ok, image = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, image = self.capture.read()
+        return ok, image
+
+
+class SyntheticSource:
+    """
+    Generated frames for testing without a camera: a textured scene that starts dark and blurry
+    for `warmup` seconds, like a webcam whose auto exposure and focus are still settling.
+    """
+
+    def __init__(self, width=640, height=480, fps=30.0, warmup=0.5, seed=0):
+        self.width = width
+        self.height = height
+        self.frame_interval = 1.0 / fps
+        self.warmup = warmup
+        self.rng = np.random.default_rng(seed)
+        self.scene = None
+        self._opened = 0.0
+        self._next_frame = 0.0
+
+    def open(self):
+        # A checkerboard with noise gives the Laplacian plenty of edges
+        y, x = np.mgrid[0:self.height, 0:self.width]
+        board = (((x // 40) + (y // 40)) % 2 * 140 + 50).astype(np.uint8)
+        noise = self.rng.integers(0, 30, (self.height, self.width), dtype=np.uint8)
+        self.scene = cv2.cvtColor(board + noise, cv2.COLOR_GRAY2BGR)
+        self._opened = self._next_frame = time.monotonic()
+
+    def read(self):
+        delay = self._next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame = max(self._next_frame + self.frame_interval, time.monotonic())
+
+        settled = min(1.0, (time.monotonic() - self._opened) / self.warmup) if self.warmup else 1.0
+        if settled >= 1.0:
+            return True, self.scene.copy()
+        blurred = cv2.GaussianBlur(self.scene, (0, 0), 1 + 8 * (1 - settled))
+        return True, (blurred * (0.15 + 0.85 * settled)).astype(np.uint8)
+
+    def release(self):
+        self.scene = None
+
+
+def source_from_environment():
+    source = os.getenv("CAPTURE_SOURCE", "0")
+    if source == "synthetic":
+        return SyntheticSource()
+    if source.isdigit():
+        return CameraSource(int(source))
+    return VideoFileSource(source)
+
+
+class CaptureService:
+    def __init__(self, source=None, buffer_size=BUFFER_SIZE, idle_timeout=IDLE_TIMEOUT):
+        self.source = source if source is not None else source_from_environment()
+        self.idle_timeout = idle_timeout
+        self.frames = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._last_request = time.monotonic()
+
+        self.frames_read = 0
+        self.captures = 0
+        self.capture_wait = 0.0  # Total seconds captures spent waiting for a good frame
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return self
+            previous = self._thread
+        # A grabber that just went idle may still be releasing the camera
+        if previous is not None:
+            previous.join()
+
+        with self._condition:
+            if self._running:
+                return self
+            self.source.open()
+            self._running = True
+            self._last_request = time.monotonic()
+            self._thread = threading.Thread(target=self._grab, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _grab(self):
+        try:
+            while self._running:
+                if time.monotonic() - self._last_request > self.idle_timeout:
+                    print("Camera idle, releasing it")
+                    break
+
+                ok, image = self.source.read()
+                if not ok:
+                    time.sleep(0.01)
+                    continue
+                timestamp = time.monotonic()
+                frame = Frame(image, timestamp, *score_frame(image))
+                with self._condition:
+                    self.frames.append(frame)
+                    self.frames_read += 1
+                    self._condition.notify_all()
+        finally:
+            with self._condition:
+                self._running = False
+                self.frames.clear()
+                self._condition.notify_all()
+            self.source.release()
+
+    def latest(self):
+        """The newest frame, or None before the first one arrives."""
+        with self._condition:
+            return self.frames[-1] if self.frames else None
+
+    def _best_recent(self):
+        now = time.monotonic()
+        recent = [frame for frame in self.frames if now - frame.timestamp <= MAX_FRAME_AGE and frame.acceptable]
+        return max(recent, key=lambda frame: frame.sharpness) if recent else None
+
+    def best_frame(self, timeout=CAPTURE_TIMEOUT):
+        """
+        The sharpest well-exposed frame from the last MAX_FRAME_AGE seconds, waiting for one if
+        the camera is still settling. After `timeout` the newest frame is returned regardless.
+        """
+        self.start()
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._condition:
+            self._last_request = start
+            frame = self._best_recent()
+            while frame is None and self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("No well-exposed frame yet, using the latest one")
+                    frame = self.frames[-1] if self.frames else None
+                    break
+                self._condition.wait(remaining)
+                frame = self._best_recent()
+
+            self.captures += 1
+            self.capture_wait += time.monotonic() - start
+        return frame
+
+    def capture(self, save_path):
+        """Saves the best recent frame to `save_path`. Returns the path, or None on failure."""
+        try:
+            frame = self.best_frame()
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return None
+
+        if frame is None:
+            print("Failed to capture image")
+            return None
+        cv2.imwrite(save_path, frame.image)
+        print(f"Image saved as {save_path}")
+        return save_path
+
+    def stats(self):
+        return {
+            "running": self._running,
+            "frames_read": self.frames_read,
+            "captures": self.captures,
+            "mean_capture_wait_s": self.capture_wait / self.captures if self.captures else 0.0,
+        }
+
+
+_capture_service = None
+_service_lock = threading.Lock()
+
+
+def get_capture_service():
+    """The shared capture service; the camera is opened on the first capture."""
+    global _capture_service
+    with _service_lock:
+        if _capture_service is None:
+            _capture_service = CaptureService()
+            atexit.register(_capture_service.stop)
+    return _capture_service
@@ -0,0 +1,238 @@
+"""
+SQLite-backed cache of prompt classifications, so repeated questions skip the LLM classifier.
+
+Two tiers:
+- Exact: keyed on the normalised prompt (lower-case, punctuation and extra spaces removed),
+  so "What is photosynthesis?" and "what is photosynthesis" share an entry.
+- Near-duplicate (optional, off unless CLASSIFICATION_CACHE_NEAR_DUPLICATES=1): MinHash signatures
+  of the prompt's character 4-grams, bucketed with LSH. A candidate is only used if its estimated
+  Jaccard similarity is at least NEAR_DUPLICATE_THRESHOLD.
+
+Entries expire after TTL_SECONDS and the least recently used ones are evicted past MAX_ENTRIES.
+
+Show hit rates or empty the cache with:
+    python ClassificationCache.py [stats | clear]
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+CACHE_PATH = "tmp/classification_cache.db"
+TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 10000
+
+NEAR_DUPLICATES = os.getenv("CLASSIFICATION_CACHE_NEAR_DUPLICATES", "0") == "1"
+NEAR_DUPLICATE_THRESHOLD = 0.7
+SHINGLE_SIZE = 4
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands of 4 rows: pairs around 0.7 similarity almost always share a bucket
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)  # Fixed seed: signatures must match across restarts
+_PERMUTATION_A = _rng.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _rng.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_prompt(prompt):
+    """Lower-case, drop punctuation and collapse whitespace, like Settings.normalize_response."""
+    text = re.sub(r'[^\w\s]', '', prompt.strip().lower())
+    return " ".join(text.split())
+
+
+def minhash(text):
+    """MinHash signature (uint32 array) of the character shingles of a normalised prompt."""
+    padded = f" {text} "
+    shingles = {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+    # Python's hash() is salted per process, so hash the shingles with blake2b instead
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") & _MERSENNE_PRIME
+         for s in shingles),
+        dtype=np.uint64, count=len(shingles))
+    permuted = (np.outer(hashes, _PERMUTATION_A) + _PERMUTATION_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def lsh_buckets(signature):
+    """One bucket id per band; prompts sharing any bucket are near-duplicate candidates."""
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [(band, hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).hexdigest())
+            for band in range(LSH_BANDS)]
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+
+class ClassificationCache:
+    def __init__(self, path=CACHE_PATH, ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES,
+                 near_duplicates=NEAR_DUPLICATES, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.hits = {"exact": 0, "near": 0}
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared between the CLI thread and the async views, so guard it with the lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript('''
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                subject TEXT,
+                difficulty INTEGER,
+                requires_thinking INTEGER,
+                requires_vision INTEGER,
+                signature BLOB,
+                created REAL,
+                last_used REAL
+            );
+            CREATE INDEX IF NOT EXISTS classifications_last_used ON classifications (last_used);
+            CREATE INDEX IF NOT EXISTS classifications_created ON classifications (created);
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                band INTEGER,
+                bucket TEXT,
+                key TEXT
+            );
+            CREATE INDEX IF NOT EXISTS lsh_buckets_lookup ON lsh_buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS lsh_buckets_key ON lsh_buckets (key);
+        ''')
+        self.conn.commit()
+
+    def get(self, prompt):
+        """Returns the cached fields as a dict, or None on a miss."""
+        key = normalize_prompt(prompt)
+        with self._lock:
+            row = self._lookup(key)
+            tier = "exact"
+            if row is None and self.near_duplicates and key:
+                row = self._lookup_near(key)
+                tier = "near"
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits[tier] += 1
+            self.conn.execute("UPDATE classifications SET last_used = ? WHERE key = ?", (time.time(), row[0]))
+            self.conn.commit()
+        return {"subject": row[1], "difficulty": row[2], "requires_thinking": bool(row[3]),
+                "requires_vision": bool(row[4])}
+
+    def _fresh_after(self):
+        return time.time() - self.ttl_seconds
+
+    def _lookup(self, key):
+        return self.conn.execute('''
+            SELECT key, subject, difficulty, requires_thinking, requires_vision FROM classifications
+            WHERE key = ? AND created >= ?
+        ''', (key, self._fresh_after())).fetchone()
+
+    def _lookup_near(self, key):
+        signature = minhash(key)
+        candidates = set()
+        for band, bucket in lsh_buckets(signature):
+            candidates.update(row[0] for row in self.conn.execute(
+                "SELECT key FROM lsh_buckets WHERE band = ? AND bucket = ?", (band, bucket)))
+        if not candidates:
+            return None
+
+        placeholders = ",".join("?" * len(candidates))
+        rows = self.conn.execute(f'''
+            SELECT key, subject, difficulty, requires_thinking, requires_vision, signature FROM classifications
+            WHERE key IN ({placeholders}) AND created >= ?
+        ''', (*candidates, self._fresh_after())).fetchall()
+
+        best, best_similarity = None, self.near_duplicate_threshold
+        for row in rows:
+            score = similarity(signature, np.frombuffer(row[5], dtype=np.uint32))
+            if score >= best_similarity:
+                best, best_similarity = row[:5], score
+        return best
+
+    def put(self, prompt, classification):
+        """Stores a classification (anything with subject/difficulty/requires_* attributes)."""
+        key = normalize_prompt(prompt)
+        if not key:
+            return
+        signature = minhash(key) if self.near_duplicates else None
+        now = time.time()
+        with self._lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO classifications
+                (key, subject, difficulty, requires_thinking, requires_vision, signature, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, classification.subject, int(classification.difficulty), int(classification.requires_thinking),
+                  int(classification.requires_vision), None if signature is None else signature.tobytes(), now, now))
+            self.conn.execute("DELETE FROM lsh_buckets WHERE key = ?", (key,))
+            if signature is not None:
+                self.conn.executemany("INSERT INTO lsh_buckets (band, bucket, key) VALUES (?, ?, ?)",
+                                      [(band, bucket, key) for band, bucket in lsh_buckets(signature)])
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Drops expired entries, then the least recently used ones past max_entries, with their LSH buckets."""
+        evicted = {row[0] for row in self.conn.execute(
+            "SELECT key FROM classifications WHERE created < ?", (self._fresh_after(),))}
+        evicted.update(row[0] for row in self.conn.execute(
+            "SELECT key FROM classifications ORDER BY last_used DESC LIMIT -1 OFFSET ?", (self.max_entries,)))
+        if not evicted:
+            return
+        keys = [(key,) for key in evicted]
+        self.conn.executemany("DELETE FROM classifications WHERE key = ?", keys)
+        self.conn.executemany("DELETE FROM lsh_buckets WHERE key = ?", keys)
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM classifications")
+            self.conn.execute("DELETE FROM lsh_buckets")
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+
+    def stats(self):
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            "entries": len(self),
+            "exact_hits": self.hits["exact"],
+            "near_hits": self.hits["near"],
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+_classification_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_classification_cache():
+    """The shared cache, opened on first use so importing the classifier doesn't touch the disk."""
+    global _classification_cache
+    with _cache_lock:
+        if _classification_cache is None:
+            _classification_cache = ClassificationCache()
+    return _classification_cache
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "clear":
+        get_classification_cache().clear()
+        print("Classification cache cleared")
+    else:
+        print(get_classification_cache().stats())
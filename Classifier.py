@@ -1,15 +1,16 @@
+import asyncio
 import json
+import os
 import re
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field, fields
 
-from AudioRecording import record_audio
+from ClassificationCache import get_classification_cache
+from FastClassifier import SUBJECTS, fast_classify
 from Model import deepseek_r1_1_5, gptturbo
-from SpeechToText import transcribe_audio
 from Model import Model, LocalModel, _available_models, OnlineModel
-from Settings import load_settings
-
-# Load settings from settings.json
-user_settings = load_settings()
+from ResidencyManager import residency_manager
+from Settings import get_user_settings
 
 
 @dataclass
@@ -18,52 +19,83 @@ class Classification:
     difficulty: int
     requires_thinking: bool
     requires_vision: bool
+    # Set when the fast local classifier answered: its difficulty is a keyword guess, not the LLM's judgement
+    estimated_difficulty: bool = field(default=False, compare=False, metadata={"local": True})
 
 
-def classify_prompt(prompt: str):
-    system_message = (
-             "You are an AI assistant that classifies prompts into three categories with high accuracy:\n\n"
-        "1. **Subject**: Identify the primary academic category of the prompt. Choose from a fixed list:\n"
-        "   - 'Math'\n"
-        "   - 'Science'\n"
-        "   - 'History'\n"
-        "   - 'Literature'\n"
-        "   - 'Philosophy'\n"
-        "   - 'Technology'\n"
-        "   - 'Engineering'\n"
-        "   - 'Business_and_Economics'\n"
-        "   - 'NLP'\n"
-        "   - 'Other' (if the prompt does not fit into a clear category)\n\n"
-        "2. **Difficulty**: Assign a difficulty level based on complexity:\n"
-        "   - 1 (Easy): Basic facts, definitions, simple arithmetic, or yes/no questions.\n"
-        "   - 2 (Moderate): Requires some explanation, multi-step reasoning, or understanding of a concept.\n"
-        "   - 3 (Difficult): Involves deep reasoning, derivations, complex problem-solving, or critical analysis.\n\n"
-        "3. **Requires Thinking**: Determine whether the prompt requires reasoning or problem-solving.\n"
-        "   - True: If answering requires logical reasoning, synthesis of information, or analytical thinking.\n"
-        "   - False: If the answer is straightforward, fact-based, or requires minimal thought.\n\n"
-         "4. **Requires Vision**: Determine whether the prompt requires analyzing an image, diagram, or visual content.\n"
-        "   - True: If answering requires interpreting visual data, charts, diagrams, images, or EXPLICITLY STATED by USER (e.g., 'Can you take a look at this?').\n"
-        "   - False: If the answer is purely text-based and does not rely on visual input.\n\n"
-
-        "### **Formatting Instructions:**\n"
-        "Output the classification as JSON with keys: `subject`, `difficulty`,`requires_thinking`, and `requires_vision`.\n"
-        "Make SURE to include all keys. ONLY use the subjects listed above."
-        "YOU MUST STICK TO THE FORMAT OF THE EXAMPLE OUTPUT"
-        "MAKE SURE SUBJECT IS INCLUDED IN THE OUTPUT"
-        "Example output:\n"
-        '{ "subject": "Science", "difficulty": 2, "requires_thinking": true, "requires_vision": false }\n\n"'
-        )
+def llm_fields():
+    """The Classification fields the LLM classifier fills in."""
+    return [item for item in fields(Classification) if not item.metadata.get("local")]
 
-    if not user_settings.use_internet:
-        response = deepseek_r1_1_5.chat(prompt=f"Classify this prompt: {prompt}", system_message=system_message)
 
-    elif user_settings.use_internet:
-        response = gptturbo.chat(prompt=f"Classify this prompt: {prompt}", system_message=system_message)
-        print("using online classifier")
+CLASSIFIER_SYSTEM_MESSAGE = (
+    "You are an AI assistant that classifies prompts into three categories with high accuracy:\n\n"
+    "1. **Subject**: Identify the primary academic category of the prompt. Choose from a fixed list:\n"
+    "   - 'Math'\n"
+    "   - 'Science'\n"
+    "   - 'History'\n"
+    "   - 'Literature'\n"
+    "   - 'Philosophy'\n"
+    "   - 'Technology'\n"
+    "   - 'Engineering'\n"
+    "   - 'Business_and_Economics'\n"
+    "   - 'NLP'\n"
+    "   - 'Other' (if the prompt does not fit into a clear category)\n\n"
+    "2. **Difficulty**: Assign a difficulty level based on complexity:\n"
+    "   - 1 (Easy): Basic facts, definitions, simple arithmetic, or yes/no questions.\n"
+    "   - 2 (Moderate): Requires some explanation, multi-step reasoning, or understanding of a concept.\n"
+    "   - 3 (Difficult): Involves deep reasoning, derivations, complex problem-solving, or critical analysis.\n\n"
+    "3. **Requires Thinking**: Determine whether the prompt requires reasoning or problem-solving.\n"
+    "   - True: If answering requires logical reasoning, synthesis of information, or analytical thinking.\n"
+    "   - False: If the answer is straightforward, fact-based, or requires minimal thought.\n\n"
+    "4. **Requires Vision**: Determine whether the prompt requires analyzing an image, diagram, or visual content.\n"
+    "   - True: If answering requires interpreting visual data, charts, diagrams, images, or EXPLICITLY STATED by USER (e.g., 'Can you take a look at this?').\n"
+    "   - False: If the answer is purely text-based and does not rely on visual input.\n\n"
+
+    "### **Formatting Instructions:**\n"
+    "Output the classification as JSON with keys: `subject`, `difficulty`,`requires_thinking`, and `requires_vision`.\n"
+    "Make SURE to include all keys. ONLY use the subjects listed above."
+    "YOU MUST STICK TO THE FORMAT OF THE EXAMPLE OUTPUT"
+    "MAKE SURE SUBJECT IS INCLUDED IN THE OUTPUT"
+    "Example output:\n"
+    '{ "subject": "Science", "difficulty": 2, "requires_thinking": true, "requires_vision": false }\n\n"'
+)
+
+
+# "structured" constrains the model to the Classification schema; "legacy" scrapes JSON out of free text
+CLASSIFIER_OUTPUT_MODES = ("structured", "legacy")
+CLASSIFIER_OUTPUT_MODE = os.getenv("CLASSIFIER_OUTPUT_MODE", "structured")
+
+# A classification is about 30 tokens of JSON; anything past this is the model rambling
+MAX_CLASSIFICATION_TOKENS = 64
+
+_JSON_TYPES = {str: "string", int: "integer", bool: "boolean"}
+
+
+def classification_schema():
+    """JSON schema for the Classification dataclass, limited to the known subjects and difficulties."""
+    properties = {item.name: {"type": _JSON_TYPES[item.type]} for item in llm_fields()}
+    properties["subject"]["enum"] = SUBJECTS
+    properties["difficulty"]["enum"] = [1, 2, 3]
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def get_classifier_model():
+    """The local classifier runs offline; online users get the API one."""
+    # Load settings from settings.json
+    user_settings = get_user_settings()
+
+    if not user_settings.use_internet:
+        # The classifier runs on every prompt, so never let it be unloaded
+        residency_manager.pin(deepseek_r1_1_5)
+        return deepseek_r1_1_5
 
+    print("using online classifier")
+    return gptturbo
 
-    #response = gptturbo.chat(prompt=f"Classify this prompt: {prompt}", system_message=system_message)
 
+def parse_classification(response: str):
+    """Pulls the classification JSON out of the model's response."""
     match = re.search(r"{[\s\S]*?}", response)
 
     if match: json_string = match.group(0)  # Extract the JSON portion print(json_string) else: print("No JSON found.")
@@ -81,7 +113,157 @@ def classify_prompt(prompt: str):
     # TODO: Implement GOOD error handling. This is AI we're talking about
     return classification
 
+
+def parse_structured_classification(response: str):
+    """Parses schema-constrained output. Returns None if it still doesn't match the schema."""
+    try:
+        c_dict = json.loads(response)
+        classification = Classification(**{item.name: c_dict[item.name] for item in llm_fields()})
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+    # JSON mode (without a schema) can still produce a made-up subject
+    if classification.subject not in SUBJECTS or classification.difficulty not in (1, 2, 3):
+        return None
+    return classification
+
+
+class ClassifierStats:
+    """How many prompts each tier answered and how long it took."""
+
+    def __init__(self):
+        self.counts = {"cache": 0, "fast": 0, "llm": 0}
+        self.seconds = {"cache": 0.0, "fast": 0.0, "llm": 0.0}
+        # Per output mode: LLM calls, unparseable responses and tokens used
+        self.outputs = {mode: {"calls": 0, "parse_failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+                        for mode in CLASSIFIER_OUTPUT_MODES}
+
+    def record(self, tier, seconds):
+        self.counts[tier] += 1
+        self.seconds[tier] += seconds
+
+    def record_output(self, mode, completion, parsed):
+        output = self.outputs[mode]
+        output["calls"] += 1
+        output["parse_failures"] += not parsed
+        output["prompt_tokens"] += completion.prompt_tokens
+        output["completion_tokens"] += completion.completion_tokens
+
+    def output_summary(self, mode):
+        """Parse-failure rate and mean tokens per classification for one output mode."""
+        output = self.outputs[mode]
+        calls = output["calls"] or 1
+        return {
+            "calls": output["calls"],
+            "parse_failure_rate": output["parse_failures"] / calls,
+            "prompt_tokens": output["prompt_tokens"] / calls,
+            "completion_tokens": output["completion_tokens"] / calls,
+        }
+
+    def mean(self, tier):
+        return self.seconds[tier] / self.counts[tier] if self.counts[tier] else 0.0
+
+    def latency_saved(self):
+        """Estimated seconds saved by not sending cached and fast-path prompts to the LLM."""
+        return max(0.0, sum(self.counts[tier] * (self.mean("llm") - self.mean(tier)) for tier in ("cache", "fast")))
+
+    def __repr__(self):
+        return (f"ClassifierStats(cache={self.counts['cache']} @ {self.mean('cache') * 1000:.1f}ms, "
+                f"fast={self.counts['fast']} @ {self.mean('fast') * 1000:.1f}ms, "
+                f"llm={self.counts['llm']} @ {self.mean('llm'):.2f}s, saved≈{self.latency_saved():.1f}s)")
+
+
+classifier_stats = ClassifierStats()
+
+
+def try_cached_classification(prompt: str):
+    """Returns the cached Classification of this prompt or a near-duplicate of it, or None."""
+    start = time.perf_counter()
+    cached = get_classification_cache().get(prompt)
+    if cached is None:
+        return None
+
+    classifier_stats.record("cache", time.perf_counter() - start)
+    print("Cached classification")
+    return Classification(**cached)
+
+
+def cache_classification(prompt: str, classification):
+    # A difficulty of 0 means the LLM's answer couldn't be parsed; don't keep that around
+    if classification.difficulty:
+        get_classification_cache().put(prompt, classification)
+    return classification
+
+
+def try_fast_classification(prompt: str):
+    """Returns a Classification from the local fast path, or None if it isn't confident."""
+    start = time.perf_counter()
+    fast = fast_classify(prompt)
+    if not fast.confident:
+        return None
+
+    classifier_stats.record("fast", time.perf_counter() - start)
+    print(f"Fast classification via {fast.source} (confidence {fast.confidence})")
+    return Classification(fast.subject, fast.difficulty, fast.requires_thinking, fast.requires_vision,
+                          estimated_difficulty=True)
+
+
+def _llm_request(prompt: str, mode: str):
+    if mode not in CLASSIFIER_OUTPUT_MODES:
+        raise ValueError(f"Unknown classifier output mode {mode!r}. Choose from {CLASSIFIER_OUTPUT_MODES}")
+    if mode == "legacy":
+        return {"prompt": f"Classify this prompt: {prompt}", "system_message": CLASSIFIER_SYSTEM_MESSAGE}
+    return {"prompt": f"Classify this prompt: {prompt}", "system_message": CLASSIFIER_SYSTEM_MESSAGE,
+            "schema": classification_schema(), "max_tokens": MAX_CLASSIFICATION_TOKENS}
+
+
+def _llm_classification(prompt: str, completion, mode: str):
+    if mode == "legacy":
+        classification = parse_classification(completion.text)
+        parsed = classification.difficulty != 0
+    else:
+        classification = parse_structured_classification(completion.text)
+        parsed = classification is not None
+        if not parsed:
+            print(f"Error: Classification didn't match the schema: {completion.text!r}")
+            classification = Classification("Other", 0, False, False)
+
+    classifier_stats.record_output(mode, completion, parsed)
+    return cache_classification(prompt, classification)
+
+
+def classify_with_llm(prompt: str, mode: str = CLASSIFIER_OUTPUT_MODE):
+    start = time.perf_counter()
+    completion = get_classifier_model().complete(**_llm_request(prompt, mode))
+    classifier_stats.record("llm", time.perf_counter() - start)
+    return _llm_classification(prompt, completion, mode)
+
+
+async def aclassify_with_llm(prompt: str, mode: str = CLASSIFIER_OUTPUT_MODE):
+    start = time.perf_counter()
+    completion = await get_classifier_model().acomplete(**_llm_request(prompt, mode))
+    classifier_stats.record("llm", time.perf_counter() - start)
+    return await asyncio.to_thread(_llm_classification, prompt, completion, mode)  # Writes to the SQLite cache
+
+
+def classify_prompt(prompt: str):
+    """
+    Checks the classification cache, then answers confident cases locally, and only sends the
+    rest to the LLM classifier. LLM results are cached for next time.
+    """
+    return try_cached_classification(prompt) or try_fast_classification(prompt) or classify_with_llm(prompt)
+
+
+async def aclassify_prompt(prompt: str):
+    """Async version of classify_prompt for the ASGI chat view. The SQLite cache is read off the event loop."""
+    return (await asyncio.to_thread(try_cached_classification, prompt) or try_fast_classification(prompt)
+            or await aclassify_with_llm(prompt))
+
+
 if __name__ == '__main__':
+    from AudioRecording import record_audio
+    from SpeechToText import transcribe_audio
+
     record_audio()
     #_prompt = transcribe_audio("output.mp3")
     _prompt = transcribe_audio("tmp/response.wav")
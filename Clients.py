@@ -0,0 +1,267 @@
+"""
+One place that creates the OpenAI and Ollama clients, shared by Model, Vision, Fashion and the chat views.
+
+- Clients are created once (async ones once per event loop) and keep their HTTP connections
+  alive in a pool, instead of every call or module setting up its own.
+- Timeouts, pool sizes and the base URLs come from the environment (see below).
+- At most MAX_CONCURRENT_REQUESTS[backend] requests run against a backend at a time; the rest wait
+  up to SLOT_TIMEOUT seconds and then fail with BackendBusyError. Async streams are read into a
+  buffer by abuffered_stream(), so their slot is freed when the backend is done rather than when
+  the (possibly slow) reader is.
+- Bulk jobs can also share a RateLimiter to stay under the API's requests-per-minute limit.
+- Requests that fail with a connection error, a timeout, 408/409/429 or a 5xx are retried up to
+  MAX_RETRIES times with full-jitter exponential backoff. OpenAI streams are retried until they
+  start; Ollama only sends the request once its stream is read, so those aren't retried.
+
+Point everything at benchmarks/stub_server.py for load testing with
+OPENAI_BASE_URL=http://127.0.0.1:8765/v1 and OLLAMA_HOST=http://127.0.0.1:8765.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv("secrets.env")
+
+BACKENDS = ("openai", "ollama")
+
+REQUEST_TIMEOUT = float(os.getenv("MODEL_REQUEST_TIMEOUT", 120))  # Seconds; local models can be slow
+CONNECT_TIMEOUT = float(os.getenv("MODEL_CONNECT_TIMEOUT", 5))
+
+# Size of the shared HTTP connection pools
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 50
+
+MAX_CONCURRENT_REQUESTS = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", 32)),
+    "ollama": int(os.getenv("OLLAMA_MAX_CONCURRENCY", 4)),  # Ollama runs few requests in parallel anyway
+}
+SLOT_TIMEOUT = float(os.getenv("MODEL_SLOT_TIMEOUT", 60))  # Seconds to wait for a free slot
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # Seconds
+BACKOFF_MAX = 8.0
+RETRY_STATUS_CODES = (408, 409, 429)
+
+
+class BackendBusyError(RuntimeError):
+    """No request slot came free within SLOT_TIMEOUT. Not retried: the wait was the retry."""
+
+
+def get_api_key():
+    """The OpenAI key from secrets.env. OPEN_API_KEY is the old name Fashion.py used."""
+    api_key = os.getenv("OPENAI_API_KEY") or os.getenv("OPEN_API_KEY")
+    if api_key is None:
+        raise ValueError("API key not found. Check your secrets.env file.")
+    return api_key
+
+
+def _timeout():
+    import httpx
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def _limits():
+    import httpx
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+
+
+def _create_client(backend, asynchronous):
+    import httpx
+
+    if backend == "openai":
+        import openai
+        http_client = (httpx.AsyncClient if asynchronous else httpx.Client)(limits=_limits(), timeout=_timeout())
+        client_class = openai.AsyncOpenAI if asynchronous else openai.OpenAI
+        # Retries are done here, with jitter, so turn off the SDK's own
+        return client_class(api_key=get_api_key(), base_url=os.getenv("OPENAI_BASE_URL"), http_client=http_client,
+                            max_retries=0)
+    if backend == "ollama":
+        import ollama
+        client_class = ollama.AsyncClient if asynchronous else ollama.Client
+        # The host comes from OLLAMA_HOST
+        return client_class(limits=_limits(), timeout=_timeout())
+    raise ValueError(f"Unknown backend {backend!r}. Choose from {BACKENDS}")
+
+
+_clients = {}
+_semaphores = {backend: threading.BoundedSemaphore(limit) for backend, limit in MAX_CONCURRENT_REQUESTS.items()}
+_lock = threading.Lock()
+
+# Async clients and semaphores are bound to the event loop that created them, so keep one set per loop
+_async_clients = weakref.WeakKeyDictionary()
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_client(backend: str):
+    """The process-wide client for `backend` ("openai" or "ollama")."""
+    with _lock:
+        if backend not in _clients:
+            _clients[backend] = _create_client(backend, asynchronous=False)
+        return _clients[backend]
+
+
+def get_async_client(backend: str):
+    """The async client for `backend` shared by every coroutine on the running event loop."""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if backend not in clients:
+        clients[backend] = _create_client(backend, asynchronous=True)
+    return clients[backend]
+
+
+def openai_client():
+    return get_client("openai")
+
+
+def ollama_client():
+    return get_client("ollama")
+
+
+def _busy(backend, timeout):
+    return BackendBusyError(f"All {MAX_CONCURRENT_REQUESTS[backend]} {backend} request slots stayed busy for {timeout:g}s")
+
+
+@contextmanager
+def request_slot(backend: str, timeout: float = SLOT_TIMEOUT):
+    """Waits up to `timeout` seconds for one of the backend's MAX_CONCURRENT_REQUESTS slots and holds it."""
+    semaphore = _semaphores[backend]
+    if not semaphore.acquire(timeout=timeout):
+        raise _busy(backend, timeout)
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+@asynccontextmanager
+async def arequest_slot(backend: str, timeout: float = SLOT_TIMEOUT):
+    semaphores = _async_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if backend not in semaphores:
+        semaphores[backend] = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS[backend])
+    try:
+        await asyncio.wait_for(semaphores[backend].acquire(), timeout)
+    except asyncio.TimeoutError:
+        raise _busy(backend, timeout) from None
+    try:
+        yield
+    finally:
+        semaphores[backend].release()
+
+
+async def abuffered_stream(backend: str, stream):
+    """
+    Yields the chunks of `stream`, an async generator reading a model's streamed response. It runs
+    in its own task holding one of the backend's slots and buffers what it reads, so the slot is
+    released as soon as the backend has sent everything, however slowly the caller consumes it.
+    Closing this generator early (e.g. the client went away) cancels the read.
+    """
+    queue = asyncio.Queue()
+
+    async def read():
+        try:
+            async with arequest_slot(backend):
+                async for chunk in stream:
+                    queue.put_nowait(("chunk", chunk))
+        except Exception as e:
+            queue.put_nowait(("error", e))
+        else:
+            queue.put_nowait(("end", None))
+
+    task = asyncio.create_task(read())
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        task.cancel()
+
+
+class RateLimiter:
+    """Spaces requests out to at most `per_minute`, across all the threads sharing it."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def is_retryable(error):
+    """Connection problems, timeouts, rate limits and server errors are worth another try."""
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRY_STATUS_CODES or status_code >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+
+    import httpx
+    if isinstance(error, httpx.TransportError):
+        return True
+    try:
+        import openai
+        return isinstance(error, openai.APIConnectionError)  # Includes APITimeoutError
+    except ImportError:
+        return False
+
+
+def backoff_delay(attempt):
+    """Full jitter: a random wait up to an exponentially growing cap."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def retry(backend: str, function, *args, **kwargs):
+    """Calls `function`, retrying transient failures with jittered backoff."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{backend} request failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+async def aretry(backend: str, function, *args, **kwargs):
+    """Async version of retry(); `function` returns an awaitable."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await function(*args, **kwargs)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{backend} request failed ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+def call_with_retry(backend: str, function, *args, **kwargs):
+    """Calls `function` within the backend's concurrency limit, retrying transient failures."""
+    def attempt():
+        with request_slot(backend):
+            return function(*args, **kwargs)
+    return retry(backend, attempt)
+
+
+async def acall_with_retry(backend: str, function, *args, **kwargs):
+    """Async version of call_with_retry()."""
+    async def attempt():
+        async with arequest_slot(backend):
+            return await function(*args, **kwargs)
+    return await aretry(backend, attempt)
@@ -1,25 +1,65 @@
 import sqlite3
 import os
+import re
+import sys
 import json
-import openai
-import base64
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import cv2  # Import OpenCV for displaying images
+from Clients import RateLimiter, call_with_retry, openai_client
 from Take_Clothing import TakePicture  # Uses the new module for image capture
-from dotenv import load_dotenv
+from FastClassifier import STOPWORDS
+from ImageStore import DISPLAY_SIDE, find_images, get_image_store
+from OutfitCache import cache_outfit, get_cached_outfit, outfit_cache_stats
+from WardrobeEmbeddings import (DUPLICATE_THRESHOLD, TEXT_DUPLICATE_THRESHOLD, combine, embed_image, embed_text,
+                                get_wardrobe_embeddings, part_similarities)
+from WardrobeIndex import CATEGORIES, TOP_K, candidate_lines, compact_summary, estimate_tokens, extract_attributes, get_wardrobe_index
 
-# Load environment variables (for OpenAI API key)
-load_dotenv("secrets.env")
-openai.api_key = os.getenv("OPEN_API_KEY")
-print("API Key loaded successfully")
+DESCRIBE_PROMPT = "Provide a detailed description of the clothing item including its key details and category (e.g., top, bottom, shoes)."
+
+# Bulk ingest
+INGEST_WORKERS = 4
+INGEST_REQUESTS_PER_MINUTE = 60
+INGEST_BATCH_SIZE = 20  # Items written per transaction
+
+# How outfit candidates are found: "fts" (SQLite full-text search) or "embeddings" (WardrobeEmbeddings)
+OUTFIT_RETRIEVAL = os.getenv("OUTFIT_RETRIEVAL", "fts")
 
 
 # ------------------------------
 # Image Encoding and Vision Model Integration
 # ------------------------------
-def encode_image(image_path):
-    """Encodes an image to base64 format."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+def describe_image(image_path):
+    """
+    Asks the vision model to describe a clothing image.
+    Returns (description, details); raises if the API call fails.
+    The stored upload-size copy is sent rather than the full-size picture.
+    """
+    image = get_image_store().upload_image(image_path)
+    response = call_with_retry(
+        "openai", openai_client().chat.completions.create,
+        model="gpt-4o",  # Adjust this model name as needed.
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": DESCRIBE_PROMPT},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image.data_url()
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=300,
+        temperature=0.7,
+    )
+    # For now, assume the AI output is the description.
+    description = response.choices[0].message.content
+    details = ""  # Optionally, parse additional details.
+    return description, details
 
 
 def process_image(image_path):
@@ -29,36 +69,10 @@ def process_image(image_path):
 
     Falls back to manual input if the API call fails.
     """
-    base64_image = encode_image(image_path)
-
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",  # Adjust this model name as needed.
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text",
-                         "text": "Provide a detailed description of the clothing item including its key details and category (e.g., top, bottom, shoes)."},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=300,
-            temperature=0.7,
-        )
-        ai_output = response.choices[0].message.content
+        description, details = describe_image(image_path)
         print("AI Vision Model Output:")
-        print(ai_output)
-
-        # For now, assume the AI output is the description.
-        description = ai_output
-        details = ""  # Optionally, parse additional details.
+        print(description)
 
     except Exception as e:
         print("Error calling vision model:", e)
@@ -71,13 +85,12 @@ def process_image(image_path):
 # ------------------------------
 # Database Functions
 # ------------------------------
-def init_db(db_path='fashion.db'):
-    """
-    Initializes the SQLite database and creates the clothing table if it does not exist.
-    """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
+# Columns of a clothing row, in the order every query returns them
+CLOTHING_COLUMNS = "id, image_path, description, details, category, colour, season, formality"
+
+
+def _create_base_tables(conn):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS clothing (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             image_path TEXT,
@@ -85,31 +98,443 @@ def init_db(db_path='fashion.db'):
             details TEXT
         )
     ''')
-    conn.commit()
+    # One row per image a bulk ingest has handled, so an interrupted ingest can resume
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_progress (
+            image_path TEXT PRIMARY KEY,
+            status TEXT,
+            error TEXT,
+            updated REAL
+        )
+    ''')
+
+
+def _add_attribute_columns(conn):
+    """Category, colour, season and formality, extracted from the descriptions, with indexes."""
+    for column in ("category", "colour", "season", "formality"):
+        conn.execute(f"ALTER TABLE clothing ADD COLUMN {column} TEXT")
+    # (category, id) also serves "newest items of a category" without a sort
+    conn.execute("CREATE INDEX idx_clothing_category ON clothing (category, id)")
+    conn.execute("CREATE INDEX idx_clothing_colour ON clothing (colour)")
+    conn.execute("CREATE INDEX idx_clothing_season ON clothing (season)")
+    conn.execute("CREATE INDEX idx_clothing_formality ON clothing (formality)")
+
+    rows = conn.execute("SELECT id, description, details FROM clothing").fetchall()
+    conn.executemany("UPDATE clothing SET category = ?, colour = ?, season = ?, formality = ? WHERE id = ?",
+                     [(*extract_attributes(f"{description or ''} {details or ''}"), item_id)
+                      for item_id, description, details in rows])
+
+
+def fts5_available(conn):
+    return any(option == ("ENABLE_FTS5",) for option in conn.execute("PRAGMA compile_options"))
+
+
+def _add_full_text_search(conn):
+    """An FTS5 index over the descriptions, kept in sync with the clothing table by triggers."""
+    if not fts5_available(conn):
+        print("SQLite was built without FTS5; outfit suggestions will search descriptions in Python")
+        return
+    conn.execute('''
+        CREATE VIRTUAL TABLE clothing_fts USING fts5(
+            description, details, content='clothing', content_rowid='id', tokenize='porter unicode61'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER clothing_fts_insert AFTER INSERT ON clothing BEGIN
+            INSERT INTO clothing_fts (rowid, description, details) VALUES (new.id, new.description, new.details);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER clothing_fts_delete AFTER DELETE ON clothing BEGIN
+            INSERT INTO clothing_fts (clothing_fts, rowid, description, details)
+            VALUES ('delete', old.id, old.description, old.details);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER clothing_fts_update AFTER UPDATE OF description, details ON clothing BEGIN
+            INSERT INTO clothing_fts (clothing_fts, rowid, description, details)
+            VALUES ('delete', old.id, old.description, old.details);
+            INSERT INTO clothing_fts (rowid, description, details) VALUES (new.id, new.description, new.details);
+        END
+    ''')
+    conn.execute("INSERT INTO clothing_fts (clothing_fts) VALUES ('rebuild')")
+
+
+def _add_outfit_cache(conn):
+    """A wardrobe version that triggers bump on every change, and the saved outfit suggestions (OutfitCache)."""
+    conn.execute("CREATE TABLE wardrobe_version (version INTEGER NOT NULL)")
+    conn.execute("INSERT INTO wardrobe_version (version) VALUES (0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f'''
+            CREATE TRIGGER clothing_version_{event.lower()} AFTER {event} ON clothing BEGIN
+                UPDATE wardrobe_version SET version = version + 1;
+            END
+        ''')
+    conn.execute('''
+        CREATE TABLE outfit_cache (
+            prompt_key TEXT,
+            wardrobe_version INTEGER,
+            top_id INTEGER,
+            bottom_id INTEGER,
+            shoes_id INTEGER,
+            seconds REAL,
+            served INTEGER,
+            created REAL
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_outfit_cache_key ON outfit_cache (wardrobe_version, prompt_key)")
+
+
+# Schema version N is reached by running MIGRATIONS[N - 1]; the version is kept in PRAGMA user_version.
+# Only ever append to this list.
+MIGRATIONS = [_create_base_tables, _add_attribute_columns, _add_full_text_search, _add_outfit_cache]
+
+
+def migrate(conn):
+    """Brings the database up to the latest schema, one migration per transaction."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        # Python's sqlite3 doesn't open a transaction for DDL by itself
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Wardrobe database migrated to schema version {number} ({migration.__name__})")
+
+
+def init_db(db_path='fashion.db'):
+    """
+    Opens the SQLite database and migrates it to the latest schema.
+    """
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
     return conn
 
 
+def _clothing_row(image_path, description, details):
+    return (image_path, description, details, *extract_attributes(f"{description or ''} {details or ''}"))
+
+
+_INSERT_CLOTHING = '''
+    INSERT INTO clothing (image_path, description, details, category, colour, season, formality)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+
 def save_clothing_item(conn, image_path, description, details):
     """
-    Saves a clothing item to the database.
+    Saves a clothing item to the database, with its attributes extracted from the description,
+    and adds it to the embedding index. Returns the new item's ID.
     """
+    embeddings = wardrobe_embeddings(conn)  # Before the insert, so it isn't seen as out of date
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO clothing (image_path, description, details)
-        VALUES (?, ?, ?)
-    ''', (image_path, description, details))
+    cursor.execute(_INSERT_CLOTHING, _clothing_row(image_path, description, details))
     conn.commit()
 
+    if embeddings is not None:
+        embeddings.add(cursor.lastrowid, combine(embed_text(f"{description} {details}"), embed_image(image_path)))
+    return cursor.lastrowid
+
 
-def get_all_clothing_items(conn):
+def save_ingested_items(conn, results):
     """
-    Retrieves all clothing items from the database.
+    Saves a batch of (image_path, description, details) in one transaction, together with their
+    ingest progress, so an item is either fully saved and marked done or not at all.
+    Returns the new items' IDs.
+    """
+    now = time.time()
+    item_ids = []
+    with conn:
+        for result in results:
+            item_ids.append(conn.execute(_INSERT_CLOTHING, _clothing_row(*result)).lastrowid)
+        conn.executemany('''
+            INSERT OR REPLACE INTO ingest_progress (image_path, status, error, updated)
+            VALUES (?, 'done', NULL, ?)
+        ''', [(image_path, now) for image_path, _, _ in results])
+    return item_ids
+
+
+def wardrobe_embeddings(conn):
+    """
+    The embedding index stored next to the connection's database file, re-embedded first if it
+    doesn't cover the same number of items. None for an in-memory database.
+    """
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not db_path:
+        return None
+    embeddings = get_wardrobe_embeddings(db_path)
+    if len(embeddings) != count_clothing_items(conn):
+        print("Updating the wardrobe embeddings...")
+        embeddings.rebuild(conn)
+    return embeddings
+
+
+def record_ingest_failure(conn, image_path, error, status="failed"):
+    with conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO ingest_progress (image_path, status, error, updated)
+            VALUES (?, ?, ?, ?)
+        ''', (image_path, status, str(error), time.time()))
+
+
+def _attributes_conflict(attributes, other):
+    """Whether two (category, colour) pairs name a different category or colour."""
+    return any(value and other_value and value != other_value for value, other_value in zip(attributes, other))
+
+
+def find_duplicate(conn, embeddings, vector, text, earlier=()):
+    """
+    Why the item with the full vector `vector` and description `text` may already be in the
+    wardrobe, or None. Its picture and description have to match an item (see
+    WardrobeEmbeddings.find_duplicates) or one of `earlier`, unsaved (label, vector, text), and
+    the two mustn't name a different category or colour.
+    """
+    attributes = extract_attributes(text)[:2]
+    for item_id, image_similarity, text_similarity in embeddings.find_duplicates(vector):
+        row = conn.execute("SELECT category, colour FROM clothing WHERE id = ?", (item_id,)).fetchone()
+        if row is not None and not _attributes_conflict(attributes, row):
+            return f"looks like item {item_id} (picture {image_similarity:.2f}, description {text_similarity:.2f})"
+    for label, other, other_text in earlier:
+        image_similarity, text_similarity = part_similarities(vector, other)
+        if (image_similarity >= DUPLICATE_THRESHOLD and text_similarity >= TEXT_DUPLICATE_THRESHOLD
+                and not _attributes_conflict(attributes, extract_attributes(other_text)[:2])):
+            return f"looks like {label} (picture {image_similarity:.2f}, description {text_similarity:.2f})"
+    return None
+
+
+def ingest_directory(conn, directory, workers=INGEST_WORKERS, requests_per_minute=INGEST_REQUESTS_PER_MINUTE,
+                     batch_size=INGEST_BATCH_SIZE, describe=describe_image, skip_duplicates=False,
+                     recheck_duplicates=False):
+    """
+    Adds every clothing image in `directory` to the wardrobe.
+
+    Images are described by `workers` threads at no more than `requests_per_minute` vision calls,
+    and saved `batch_size` at a time. Images finished by an earlier run are skipped; failed ones
+    are recorded and tried again on the next run. An image whose picture and description both
+    match an item already in the wardrobe (or another image in the folder, see find_duplicate)
+    is saved and listed as a possible duplicate to check by hand; with `skip_duplicates` it's
+    recorded as a duplicate and not saved instead. Recorded duplicates count as finished too, unless
+    `recheck_duplicates` is set, e.g. after deleting the items they matched. Returns a summary dict.
+    """
+    finished = ("done", "duplicate") if not recheck_duplicates else ("done",)
+    done = {row[0] for row in conn.execute(
+        f"SELECT image_path FROM ingest_progress WHERE status IN ({','.join('?' * len(finished))})", finished)}
+    all_images = find_images(directory)
+    images = [path for path in all_images if path not in done]
+    print(f"{len(all_images)} images in {directory}, {len(all_images) - len(images)} already ingested"
+          f"{'' if recheck_duplicates else ' or left out as duplicates'}")
+
+    embeddings = wardrobe_embeddings(conn)
+    image_vectors = {}
+    if embeddings is not None:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            image_vectors = dict(zip(images, executor.map(embed_image, images)))
+
+    limiter = RateLimiter(requests_per_minute)
+
+    def work(image_path):
+        limiter.wait()
+        return describe(image_path)
+
+    saved, failed, pending = 0, 0, []
+    duplicates, possible_duplicates = 0, []
+    start = time.perf_counter()
+
+    def check_duplicates():
+        """Splits `pending` into the items to save, with their vectors, and their duplicate reasons."""
+        nonlocal duplicates
+        kept, vectors, reasons = [], [], []
+        earlier = []  # Earlier items of this batch; those of earlier batches are in `embeddings` already
+        for image_path, description, details in pending:
+            text = f"{description} {details}"
+            vector = combine(embed_text(text), image_vectors[image_path])
+            reason = find_duplicate(conn, embeddings, vector, text, earlier)
+            if reason and skip_duplicates:
+                print(f"Not saving {image_path}: {reason}")
+                record_ingest_failure(conn, image_path, reason, status="duplicate")
+                duplicates += 1
+                continue
+            kept.append((image_path, description, details))
+            vectors.append(vector)
+            reasons.append(reason)
+            earlier.append((image_path, vector, text))
+        return kept, vectors, reasons
+
+    def flush():
+        nonlocal saved
+        if pending:
+            if embeddings is None:
+                item_ids = save_ingested_items(conn, pending)
+            else:
+                kept, vectors, reasons = check_duplicates()
+                item_ids = save_ingested_items(conn, kept)
+                embeddings.add_many(item_ids, vectors)
+                embeddings.flush()
+                for item_id, (image_path, _, _), reason in zip(item_ids, kept, reasons):
+                    if reason:
+                        print(f"Possible duplicate: item {item_id} ({image_path}) {reason}")
+                        possible_duplicates.append(item_id)
+            saved += len(item_ids)
+            pending.clear()
+            minutes = (time.perf_counter() - start) / 60
+            print(f"Saved {saved}/{len(images)} items, {saved / minutes:.1f} items/min")
+
+    # Only this thread touches the database; the workers just call the API
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(work, image_path): image_path for image_path in images}
+        for future in as_completed(futures):
+            image_path = futures[future]
+            try:
+                description, details = future.result()
+            except Exception as e:
+                print(f"Could not describe {image_path}: {e}")
+                record_ingest_failure(conn, image_path, e)
+                failed += 1
+                continue
+            pending.append((image_path, description, details))
+            if len(pending) >= batch_size:
+                flush()
+    finally:
+        # On Ctrl+C keep what's been described; the rest is picked up by the next run
+        executor.shutdown(wait=False, cancel_futures=True)
+        flush()
+
+    seconds = time.perf_counter() - start
+    summary = {"images": len(all_images), "skipped": len(all_images) - len(images), "saved": saved,
+               "possible_duplicates": len(possible_duplicates), "duplicates": duplicates, "failed": failed,
+               "seconds": round(seconds, 2), "items_per_minute": round(saved / seconds * 60, 1) if seconds else 0.0}
+    print(f"Ingest finished: {summary}")
+    if possible_duplicates:
+        print(f"Check these items for duplicates (option 4 deletes one): {possible_duplicates}")
+    return summary
+
+
+def get_all_clothing_items(conn, category=None):
+    """
+    Retrieves all clothing items (or those of one category) from the database, grouped by category.
     """
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM clothing')
+    if category is None:
+        cursor.execute(f'SELECT {CLOTHING_COLUMNS} FROM clothing ORDER BY category, id')
+    else:
+        cursor.execute(f'SELECT {CLOTHING_COLUMNS} FROM clothing WHERE category = ? ORDER BY id', (category,))
     return cursor.fetchall()
 
 
+def get_clothing_item(conn, item_id):
+    """
+    Retrieves one clothing item by its ID, or None.
+    """
+    return conn.execute(f'SELECT {CLOTHING_COLUMNS} FROM clothing WHERE id = ?', (item_id,)).fetchone()
+
+
+def count_clothing_items(conn):
+    return conn.execute('SELECT COUNT(*) FROM clothing').fetchone()[0]
+
+
+def _match_expression(prompt):
+    """An FTS5 query matching any word of the prompt (quoted, so punctuation can't break the syntax)."""
+    words = [word for word in re.findall(r"[a-z0-9]+", prompt.lower()) if word not in STOPWORDS]
+    return " OR ".join(f'"{word}"' for word in words)
+
+
+def _search_category(conn, category, match, k):
+    """Best full-text matches for one category (items without a category compete in all of them)."""
+    if not match:
+        return []
+    return conn.execute(f'''
+        SELECT {", ".join("c." + column for column in CLOTHING_COLUMNS.split(", "))}
+        FROM clothing_fts JOIN clothing c ON c.id = clothing_fts.rowid
+        WHERE clothing_fts MATCH ? AND (c.category = ? OR c.category IS NULL)
+        ORDER BY bm25(clothing_fts) LIMIT ?
+    ''', (match, category, k)).fetchall()
+
+
+def _top_up(conn, category, items, k):
+    """
+    Fills `items` up to `k` with the newest other items of the category or without one, as items
+    without a category compete in every category (like in _search_category).
+    """
+    if len(items) >= k:
+        return items
+    seen = [item[0] for item in items]
+    not_seen = ", ".join("?" * len(seen))
+    missing = k - len(items)
+    # Two index range scans on (category, id), each stopping after `missing` rows
+    return items + conn.execute(f'''
+        SELECT * FROM (SELECT {CLOTHING_COLUMNS} FROM clothing
+                       WHERE category = ? AND id NOT IN ({not_seen}) ORDER BY id DESC LIMIT ?)
+        UNION ALL
+        SELECT * FROM (SELECT {CLOTHING_COLUMNS} FROM clothing
+                       WHERE category IS NULL AND id NOT IN ({not_seen}) ORDER BY id DESC LIMIT ?)
+        ORDER BY id DESC LIMIT ?
+    ''', (category, *seen, missing, *seen, missing, missing)).fetchall()
+
+
+def _embedding_candidates(conn, embeddings, user_prompt, k):
+    """Nearest items to the prompt in the embedding index, grouped by category."""
+    item_ids = [item_id for item_id, _ in embeddings.search_text(user_prompt, k=k * len(CATEGORIES) * 4)]
+    rows = {row[0]: row for row in conn.execute(
+        f'SELECT {CLOTHING_COLUMNS} FROM clothing WHERE id IN ({", ".join("?" * len(item_ids))})', item_ids)}
+    candidates = {category: [] for category in CATEGORIES}
+    for item_id in item_ids:
+        row = rows.get(item_id)
+        for category in (CATEGORIES if row is None or row[4] is None else (row[4],)):
+            if row is not None and len(candidates[category]) < k:
+                candidates[category].append(row)
+    return candidates
+
+
+def outfit_candidates(conn, user_prompt, k=TOP_K, retrieval=OUTFIT_RETRIEVAL):
+    """
+    Up to `k` items per category for the prompt: the best full-text (or embedding, see
+    OUTFIT_RETRIEVAL) matches first, topped up with the newest items of the category or without
+    one. Falls back
+    to WardrobeIndex when there's no FTS5 table.
+    """
+    if retrieval == "embeddings":
+        embeddings = wardrobe_embeddings(conn)
+        if embeddings is not None:
+            candidates = _embedding_candidates(conn, embeddings, user_prompt, k)
+            return {category: _top_up(conn, category, items, k) for category, items in candidates.items()}
+
+    has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'clothing_fts'").fetchone()
+    if not has_fts:
+        return get_wardrobe_index(get_all_clothing_items(conn)).candidates(user_prompt, k=k)
+
+    match = _match_expression(user_prompt)
+    return {category: _top_up(conn, category, _search_category(conn, category, match, k), k)
+            for category in CATEGORIES}
+
+
+def show_similar_items(conn, k=5):
+    """
+    Prompts for an item ID and lists the `k` items that look and read most like it.
+    """
+    embeddings = wardrobe_embeddings(conn)
+    if embeddings is None:
+        print("Similar items need the wardrobe database on disk.")
+        return
+    try:
+        item_id = int(input("Enter the ID of the clothing item: ").strip())
+    except ValueError:
+        print("Invalid ID. Please enter a numeric value.")
+        return
+    if item_id not in embeddings:
+        print(f"No clothing item with ID {item_id} was found.")
+        return
+
+    for similar_id, similarity in embeddings.similar_items(item_id, k=k):
+        item = get_clothing_item(conn, similar_id)
+        if item:
+            print(f"ID: {item[0]} ({similarity:.2f}), {item[4] or 'unknown'}: {compact_summary(item[2] or '', item[3] or '')}")
+
+
 def delete_clothing_item(conn):
     """
     Displays all clothing items and prompts the user for the ID of the item to delete.
@@ -131,18 +556,23 @@ def delete_clothing_item(conn):
         print("Invalid ID. Please enter a numeric value.")
         return
 
-    item_to_delete = next((item for item in items if item[0] == id_to_delete), None)
+    item_to_delete = get_clothing_item(conn, id_to_delete)
     if item_to_delete is None:
         print(f"No clothing item with ID {id_to_delete} was found.")
         return
 
+    embeddings = wardrobe_embeddings(conn)
     cursor = conn.cursor()
     cursor.execute("DELETE FROM clothing WHERE id = ?", (id_to_delete,))
     conn.commit()
+    if embeddings is not None:
+        embeddings.remove(id_to_delete)
+        embeddings.flush()
     print(f"Clothing item with ID {id_to_delete} has been deleted from the database.")
 
     image_path = item_to_delete[1]
     if os.path.exists(image_path):
+        get_image_store().remove(image_path)
         os.remove(image_path)
         print(f"Image file {image_path} has also been deleted.")
     else:
@@ -163,28 +593,57 @@ def display_all_clothing_items(conn):
         print(f"Image Path: {item[1]}")
         print(f"Description: {item[2]}")
         print(f"Key Details: {item[3]}")
+        print(f"Category: {item[4] or 'unknown'}, Colour: {item[5] or '-'}, Season: {item[6] or '-'}, "
+              f"Formality: {item[7] or '-'}")
         print("-" * 40)
 
 
 # ------------------------------
 # AI-Based Full Outfit Generation Using OpenAI API
 # ------------------------------
-def ai_generate_full_outfit_with_openai(user_prompt, items):
+def _item_id(value):
+    """An item ID from the model's JSON as an int, or None for null or anything that isn't one."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+def outfit_ids(outfit):
+    """The (top_id, bottom_id, shoes_id) of an outfit returned by ai_generate_full_outfit_with_openai."""
+    return tuple(outfit[category][0] if outfit.get(category) else None for category in CATEGORIES)
+
+
+def ai_generate_full_outfit_with_openai(conn, user_prompt, top_k=TOP_K, use_cache=True, exclude=()):
     """
-    Uses OpenAI's Chat API to select a full outfit from a list of clothing items.
+    Uses OpenAI's Chat API to select a full outfit from the clothing items in the database.
     The outfit must include exactly one top, one bottom, and one pair of shoes.
-    Each clothing item is described as: "ID {id}: {description} - {details}".
-    Returns a JSON object with keys 'top', 'bottom', and 'shoes' containing the selected item IDs.
+    Only the `top_k` items per category that best match the prompt (see outfit_candidates) are sent,
+    each as a one-line summary: "ID {id}: {category} | {summary}".
+    Suggestions are saved per prompt until the wardrobe changes, and repeated prompts reuse them
+    (see OutfitCache) unless `use_cache` is False. For a different suggestion, pass the outfit_ids
+    already shown as `exclude`: they're neither reused nor, if the model can help it, suggested again.
+    Returns a dict with keys 'top', 'bottom', and 'shoes' containing the selected items.
     """
-    descriptions_list = []
-    for item in items:
-        descriptions_list.append(f"ID {item[0]}: {item[2]} - {item[3]}")
-    combined_descriptions = "\n".join(descriptions_list)
+    start = time.perf_counter()
+    exclude = [tuple(_item_id(item_id) for item_id in ids) for ids in exclude]
+    cached = get_cached_outfit(conn, user_prompt, top_k, exclude) if use_cache else None
+    if cached is not None:
+        print(f"Reusing a saved suggestion for this prompt ({outfit_cache_stats})")
+        return {category: get_clothing_item(conn, item_id)
+                for category, item_id in zip(CATEGORIES, cached) if item_id is not None}
+
+    candidates = outfit_candidates(conn, user_prompt, k=top_k)
+    combined_descriptions = "\n".join(candidate_lines(candidates))
+    retrieval_seconds = time.perf_counter() - start
 
     system_message = (
         "You are an AI assistant tasked with selecting a full outfit from a list of clothing items. "
         "The outfit must include exactly one top, one bottom, and one pair of shoes. "
-        "Each clothing item is described as: 'ID {id}: {description} - {details}'. "
+        "Each clothing item is described as: 'ID {id}: {category} | {summary}'. "
         "Return a JSON object with keys 'top', 'bottom', and 'shoes', each containing the corresponding item ID. "
         "If an item for a category is not available, return null for that key. "
         "Only return the JSON and no additional text."
@@ -195,9 +654,13 @@ def ai_generate_full_outfit_with_openai(user_prompt, items):
         f"Task: Based on the prompt '{user_prompt}', choose one clothing item for each category (top, bottom, shoes) to form a full outfit. "
         "Do not select more than one item for any category."
     )
+    if exclude:
+        shown = "; ".join(", ".join(f"{category} {item_id}" for category, item_id in zip(CATEGORIES, ids)) for ids in exclude)
+        prompt_message += f" The user has already seen these outfits and wants a different one: {shown}."
 
     try:
-        response = openai.chat.completions.create(
+        response = call_with_retry(
+            "openai", openai_client().chat.completions.create,
             model="gpt-3.5-turbo",  # or "gpt-4" if available
             messages=[
                 {"role": "system", "content": system_message},
@@ -205,32 +668,42 @@ def ai_generate_full_outfit_with_openai(user_prompt, items):
             ],
             max_tokens=150,
             temperature=0.7,
+            response_format={"type": "json_object"},
         )
         response_text = response.choices[0].message.content
     except Exception as e:
         print("Error calling OpenAI API:", e)
         return {}
 
+    prompt_tokens = response.usage.prompt_tokens if response.usage else estimate_tokens(system_message + prompt_message)
+    print(f"Sent {sum(len(group) for group in candidates.values())} candidates of {count_clothing_items(conn)} items, "
+          f"{prompt_tokens} prompt tokens | retrieval {retrieval_seconds * 1000:.1f}ms, "
+          f"total {time.perf_counter() - start:.2f}s")
+
     print("\n--- AI Response ---")
     print(response_text)
     print("--- End of AI Response ---\n")
 
     try:
         result = json.loads(response_text)
-        top_id = result.get("top")
-        bottom_id = result.get("bottom")
-        shoes_id = result.get("shoes")
+        # Anything but an item ID (a nested object, a list, a name) counts as no item for that category
+        top_id = _item_id(result.get("top"))
+        bottom_id = _item_id(result.get("bottom"))
+        shoes_id = _item_id(result.get("shoes"))
     except Exception as e:
         print("Error parsing AI response:", e)
         return {}
 
     selected_items = {}
     if top_id is not None:
-        selected_items["top"] = next((item for item in items if item[0] == top_id), None)
+        selected_items["top"] = get_clothing_item(conn, top_id)
     if bottom_id is not None:
-        selected_items["bottom"] = next((item for item in items if item[0] == bottom_id), None)
+        selected_items["bottom"] = get_clothing_item(conn, bottom_id)
     if shoes_id is not None:
-        selected_items["shoes"] = next((item for item in items if item[0] == shoes_id), None)
+        selected_items["shoes"] = get_clothing_item(conn, shoes_id)
+    # Only suggestions made of real items are worth repeating
+    if use_cache and selected_items and all(item is not None for item in selected_items.values()):
+        cache_outfit(conn, user_prompt, top_k, (top_id, bottom_id, shoes_id), time.perf_counter() - start)
     return selected_items
 
 
@@ -240,15 +713,23 @@ def generate_full_outfit_with_ai(conn):
     (one top, one bottom, one pair of shoes) based on the user's prompt.
     Displays the selected items along with their details and images.
     """
-    items = get_all_clothing_items(conn)
-    if not items:
+    if not count_clothing_items(conn):
         print("No clothing items found in the database.")
         return
 
     outfit_prompt = input("Enter the style or type of outfit you'd like (e.g., casual, sporty): ").strip()
 
-    full_outfit = ai_generate_full_outfit_with_openai(outfit_prompt, items)
+    shown = []
+    while True:
+        full_outfit = ai_generate_full_outfit_with_openai(conn, outfit_prompt, exclude=shown)
+        show_outfit(full_outfit)
+        if not full_outfit or input("\nWould you like a different suggestion? (y/n): ").strip().lower() != "y":
+            return
+        shown.append(outfit_ids(full_outfit))
 
+
+def show_outfit(full_outfit):
+    """Prints the items of a suggested outfit and shows their pictures."""
     print("\nFull Outfit Suggestion Based on Your Prompt:")
     for category, item in full_outfit.items():
         if item:
@@ -257,8 +738,8 @@ def generate_full_outfit_with_ai(conn):
             print(f"Image Path: {item[1]}")
             print(f"Description: {item[2]}")
             print(f"Key Details: {item[3]}")
-            # Load and display the image using OpenCV
-            image = cv2.imread(item[1])
+            # Load and display the display-size copy of the image using OpenCV
+            image = get_image_store().load(item[1], DISPLAY_SIDE)
             if image is not None:
                 window_title = f"{category.capitalize()} - {item[2]}"
                 cv2.imshow(window_title, image)
@@ -284,13 +765,23 @@ def main():
         print("2. View all clothing items")
         print("3. Get full outfit suggestion (top, bottom, shoes)")
         print("4. Delete a clothing item")
-        print("5. Exit")
-        choice = input("Enter your choice (1-5): ").strip()
+        print("5. Add every clothing image in a folder")
+        print("6. Find similar clothing items")
+        print("7. Exit")
+        choice = input("Enter your choice (1-7): ").strip()
 
         if choice == "1":
             image_path = TakePicture()  # Uses the new TakePicture function from Take_Clothing.py
             if image_path:
                 description, details = process_image(image_path)
+                embeddings = wardrobe_embeddings(conn)
+                text = f"{description} {details}"
+                reason = find_duplicate(conn, embeddings, combine(embed_text(text), embed_image(image_path)),
+                                        text) if embeddings is not None else None
+                if reason:
+                    print(f"This {reason}.")
+                    if input("Save it anyway? (y/n): ").strip().lower() != "y":
+                        continue
                 save_clothing_item(conn, image_path, description, details)
                 print("Clothing item saved to database.")
             else:
@@ -302,12 +793,38 @@ def main():
         elif choice == "4":
             delete_clothing_item(conn)
         elif choice == "5":
+            directory = input("Folder with the clothing images: ").strip()
+            if os.path.isdir(directory):
+                skip = input("Leave out images that look like items already saved, instead of saving and "
+                             "listing them? (y/n): ").strip().lower() == "y"
+                recheck = False
+                if conn.execute("SELECT 1 FROM ingest_progress WHERE status = 'duplicate' LIMIT 1").fetchone():
+                    recheck = input("Look again at images left out as duplicates before? (y/n): ").strip().lower() == "y"
+                ingest_directory(conn, directory, skip_duplicates=skip, recheck_duplicates=recheck)
+            else:
+                print(f"{directory} is not a folder.")
+        elif choice == "6":
+            show_similar_items(conn)
+        elif choice == "7":
             break
         else:
-            print("Invalid choice. Please enter a number between 1 and 5.")
+            print("Invalid choice. Please enter a number between 1 and 7.")
 
+    if outfit_cache_stats.hits + outfit_cache_stats.misses:
+        print(f"Outfit suggestions this session: {outfit_cache_stats}")
     conn.close()
 
 
 if __name__ == "__main__":
-    main()
+    # python Fashion.py ingest DIRECTORY [workers] [requests per minute] [--skip-duplicates] [--recheck-duplicates]
+    if len(sys.argv) > 2 and sys.argv[1] == "ingest":
+        arguments = [argument for argument in sys.argv[2:] if not argument.startswith("--")]
+        connection = init_db()
+        ingest_directory(connection, arguments[0],
+                         workers=int(arguments[1]) if len(arguments) > 1 else INGEST_WORKERS,
+                         requests_per_minute=float(arguments[2]) if len(arguments) > 2 else INGEST_REQUESTS_PER_MINUTE,
+                         skip_duplicates="--skip-duplicates" in sys.argv,
+                         recheck_duplicates="--recheck-duplicates" in sys.argv)
+        connection.close()
+    else:
+        main()
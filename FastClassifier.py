@@ -0,0 +1,265 @@
+"""
+Cheap local classification stage that runs before the LLM classifier.
+
+Keyword rules catch prompts with an obvious subject. Everything else goes through a TF-IDF
+nearest-centroid model built from a handful of example prompts per subject. Only predictions
+with a confidence above CONFIDENCE_THRESHOLD are used; the rest fall through to the LLM.
+Difficulty, thinking and vision are estimated from simple cues in the prompt; the difficulty is a
+guess, so the "skip_easy" response pipeline doesn't act on it.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+SUBJECTS = ["Math", "Science", "History", "Literature", "Philosophy", "Technology", "Engineering",
+            "Business_and_Economics", "NLP", "Other"]
+
+CONFIDENCE_THRESHOLD = 0.6
+
+# Similarity to a subject centroid below which a TF-IDF prediction is not trusted fully
+MIN_SIMILARITY = 0.35
+
+# Strong signals: a match here names the subject if the TF-IDF model agrees or several patterns match
+KEYWORD_RULES = {
+    "Math": [r"\bmath(s|ematics)?\b", r"\bintegra(l|te)\b", r"\bderivative\b", r"\bsolve for\b", r"\balgebra", r"\bcalculus\b",
+             r"\bequation", r"\bprime numbers?\b", r"\btheorem\b", r"\bfactori[sz]e\b", r"\bprobability\b",
+             r"\bpolynomial", r"\bsquare root\b", r"\bfraction", r"\d+\s*[-+*/^x]\s*\d+", r"\bmatri(x|ces)\b",
+             r"\bgeometry\b", r"\btriangle\b", r"\blogarithm"],
+    "Science": [r"\bphotosynthesis\b", r"\batoms?\b", r"\bmolecules?\b", r"\bcells?\b", r"\bdna\b",
+                r"\bgravity\b", r"\bchemical\b", r"\bevolution\b", r"\bphysics\b", r"\bchemistry\b",
+                r"\bbiology\b", r"\bplanets?\b", r"\belectrons?\b", r"\bspecies\b", r"\bquantum\b",
+                r"\bvolcano", r"\bclimate\b"],
+    "History": [r"\bwar\b", r"\bempire\b", r"\bcentury\b", r"\brevolution\b", r"\bancient\b",
+                r"\bdynasty\b", r"\bmedieval\b", r"\bworld war\b", r"\bhistor(y|ical)\b", r"\bpresident\b",
+                r"\bcivilization\b", r"\btreaty\b", r"\bcolonial"],
+    "Literature": [r"\bnovel\b", r"\bpoem\b", r"\bpoetry\b", r"\bshakespeare\b", r"\bauthor\b",
+                   r"\bcharacters?\b", r"\bprotagonist\b", r"\bsonnet\b", r"\bhamlet\b", r"\bmetaphor\b",
+                   r"\bplay(wright)?\b.*\bwrote\b", r"\bbooks?\b", r"\bliterary\b", r"\bgatsby\b"],
+    "Philosophy": [r"\bphilosoph", r"\bethic", r"\bmorality\b", r"\bmoral\b", r"\bfree will\b",
+                   r"\bexistential", r"\bkant\b", r"\bnietzsche\b", r"\bplato\b", r"\bsocrates\b",
+                   r"\bconsciousness\b", r"\bmeaning of life\b", r"\butilitarian"],
+    "Technology": [r"\bpython\b", r"\bjavascript\b", r"\bcode\b", r"\bcoding\b", r"\bprogram(ming)?\b",
+                   r"\bsoftware\b", r"\bcomputer\b", r"\binternet\b", r"\bapi\b", r"\bdatabase\b",
+                   r"\bfunction\b", r"\bbug\b", r"\bgit\b", r"\blinux\b", r"\bsmartphone\b", r"\bwifi\b",
+                   r"\bsql\b", r"\bapp\b"],
+    "Engineering": [r"\bbridge\b", r"\bcircuit", r"\bbeam\b", r"\bload\b", r"\bstress\b", r"\btorque\b",
+                    r"\bengine\b", r"\bthermodynamic", r"\bresistor", r"\bvoltage\b", r"\bmechanical\b",
+                    r"\bcivil engineering\b", r"\bgear", r"\bmotor\b", r"\bstructural\b"],
+    "Business_and_Economics": [r"\binflation\b", r"\beconom", r"\bmarket", r"\bstocks?\b", r"\binvest",
+                               r"\bbusiness\b", r"\bprofit\b", r"\brevenue\b", r"\binterest rates?\b",
+                               r"\bgdp\b", r"\bsupply and demand\b", r"\bstartup\b", r"\bbudget\b",
+                               r"\btax(es)?\b", r"\bcompany\b"],
+    "NLP": [r"\btranslate\b", r"\bgrammar\b", r"\bsynonym", r"\bantonym", r"\bsummari[sz]e\b",
+            r"\bparaphrase\b", r"\brewrite\b", r"\bspell(ing)?\b", r"\bsentence\b", r"\bmeaning of the word\b",
+            r"\bproofread\b", r"\bpart of speech\b"],
+}
+
+# A few example prompts per subject for the TF-IDF centroids
+SEED_PROMPTS = {
+    "Math": [
+        "What is the derivative of x squared", "Solve this quadratic equation", "How do I calculate the area of a circle",
+        "What is the integral of sine", "Explain the Pythagorean theorem", "How many ways can I arrange five books",
+        "What is the probability of rolling two sixes", "Simplify this fraction", "What is a prime number",
+        "How do you find the slope of a line", "Multiply these two matrices", "What is the square root of 144",
+        "Convert this decimal to a percentage", "What is the sum of the angles in a triangle",
+    ],
+    "Science": [
+        "How does photosynthesis work", "What is the speed of light", "Why is the sky blue",
+        "What are the parts of a cell", "How do vaccines train the immune system", "What is DNA made of",
+        "Why do objects fall because of gravity", "What happens in a chemical reaction", "How do black holes form",
+        "What causes earthquakes", "How does natural selection drive evolution", "What is the periodic table",
+        "Why do planets orbit the sun", "What is an atom made of",
+    ],
+    "History": [
+        "What caused World War One", "Who was the first emperor of Rome", "When did the Berlin Wall fall",
+        "Why did the Roman Empire collapse", "What was the Industrial Revolution", "Who won the battle of Waterloo",
+        "What happened during the French Revolution", "Who was Napoleon", "What was the Cold War",
+        "When did the American Civil War end", "Who built the pyramids in ancient Egypt",
+        "What was life like in medieval Europe", "Who was the first president of the United States",
+        "What was the Ming dynasty known for",
+    ],
+    "Literature": [
+        "Who wrote Pride and Prejudice", "What is the theme of The Great Gatsby", "Summarize the plot of Hamlet",
+        "Who is the protagonist of To Kill a Mockingbird", "What is a sonnet", "Analyze the symbolism in Moby Dick",
+        "What poems did Emily Dickinson write", "Recommend a classic novel to read", "What is the setting of 1984",
+        "Explain the ending of Of Mice and Men", "Who are the main characters in Harry Potter",
+        "What does the green light symbolize in Gatsby", "What genre is Frankenstein", "Who wrote the Odyssey",
+    ],
+    "Philosophy": [
+        "What is the meaning of life", "Do humans have free will", "What did Plato say about justice",
+        "Explain Kant's categorical imperative", "What is utilitarianism", "Is it ever right to lie",
+        "What is existentialism", "What is the trolley problem", "Can we know anything for certain",
+        "What did Nietzsche mean by God is dead", "What is the mind body problem", "What makes an action moral",
+        "What is stoicism", "What is the nature of consciousness",
+    ],
+    "Technology": [
+        "How do I reverse a list in Python", "Why is my JavaScript code not working", "What is an API",
+        "How does the internet work", "What is cloud computing", "How do I fix this bug in my program",
+        "What is the difference between RAM and storage", "How do I write a SQL query", "What is machine learning",
+        "How do I install Linux", "Which smartphone has the best battery", "How do I use git branches",
+        "What programming language should I learn first", "How does encryption keep data safe",
+    ],
+    "Engineering": [
+        "How do suspension bridges carry load", "How do I calculate the current through a resistor",
+        "What is the difference between AC and DC", "How does a car engine work", "What is torque",
+        "How do you design a beam for bending stress", "How do gears change speed", "What is a transistor used for",
+        "How does a jet engine produce thrust", "What is the efficiency of a heat engine",
+        "How do I size a motor for a conveyor", "What materials are used in building skyscrapers",
+        "How does a heat pump work", "What does a civil engineer do",
+    ],
+    "Business_and_Economics": [
+        "What causes inflation", "How does the stock market work", "What is supply and demand",
+        "How do interest rates affect the economy", "How do I start a small business", "What is GDP",
+        "Should I invest in index funds", "What is a recession", "How do companies make a profit",
+        "What is a marketing strategy", "How do taxes work", "What is opportunity cost",
+        "How do I make a budget", "What does a central bank do",
+    ],
+    "NLP": [
+        "Translate this sentence into Spanish", "Fix the grammar in this paragraph", "What is a synonym for happy",
+        "Summarize this text for me", "Paraphrase this sentence", "Rewrite this email to sound more formal",
+        "How do you spell necessary", "What does this word mean", "Is this sentence grammatically correct",
+        "What is the plural of cactus", "Proofread my essay", "What part of speech is quickly",
+        "Give me an antonym for brave", "How do you say thank you in French",
+    ],
+    "Other": [
+        "Tell me a joke", "How are you today", "What should I cook for dinner", "Recommend a good movie",
+        "What is the weather like", "Set a timer for ten minutes", "What is your name", "Good morning",
+        "What should I do this weekend", "Give me a fun fact", "How do I get better sleep",
+        "What is a good gift for my mom", "Play some music", "Can you help me plan a trip",
+    ],
+}
+
+# Only phrases that can't be about anything but the camera set requires_vision locally. "Look at this" or
+# "can you see this" are just as often about text or code, so prompts using them are left to the LLM.
+VISION_CUES = [r"\bthis (picture|photo|image)\b", r"\bwhat am i holding\b", r"\bcan you see (me|what i)\b",
+               r"\bwhat do you see\b", r"\bwhat('s| is) in my hand\b"]
+AMBIGUOUS_VISION_CUES = [r"\blook at (this|me)\b", r"\bin front of me\b", r"\bcan you see this\b",
+                         r"\b(web)?cam(era)?\b", r"\btake a (picture|photo)\b"]
+
+HARD_CUES = [r"\bprove\b", r"\bderive\b", r"\bcompare\b", r"\banaly[sz]e\b", r"\bevaluate\b", r"\bcritique\b",
+             r"\bdesign\b", r"\boptimi[sz]e\b", r"\bstep by step\b", r"\bimplications?\b"]
+MODERATE_CUES = [r"\bwhy\b", r"\bhow (does|do|did|can|would|should)\b", r"\bexplain\b", r"\bdifference\b",
+                 r"\bcauses?\b", r"\bsolve\b", r"\bcalculate\b", r"\bfix\b", r"\bwrite\b"]
+
+STOPWORDS = {"a", "an", "the", "is", "are", "was", "were", "be", "of", "to", "in", "on", "for", "and", "or",
+             "what", "who", "how", "why", "when", "do", "does", "did", "i", "me", "my", "you", "your", "it",
+             "this", "that", "can", "could", "would", "should", "with", "about", "at", "by", "from", "as",
+             "please", "tell", "give", "some", "there", "their", "they", "we", "us", "if", "so", "much", "many",
+             "use", "used", "using", "get", "make", "need", "want", "know", "like", "good", "best", "right", "now"}
+
+
+@dataclass
+class FastClassification:
+    subject: str
+    difficulty: int
+    requires_thinking: bool
+    requires_vision: bool
+    confidence: float
+    source: str  # "rules" or "tfidf"
+
+    @property
+    def confident(self):
+        return self.confidence >= CONFIDENCE_THRESHOLD
+
+
+def tokenize(text):
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        # Crude stemming so "equations" and "equation" share a feature
+        for suffix in ("ing", "es", "s"):
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+
+def _normalize(vector):
+    length = math.sqrt(sum(value * value for value in vector.values()))
+    return {term: value / length for term, value in vector.items()} if length else {}
+
+
+class CentroidModel:
+    """TF-IDF nearest-centroid classifier over the seed prompts."""
+
+    def __init__(self, examples):
+        documents = [(subject, tokenize(prompt)) for subject, prompts in examples.items() for prompt in prompts]
+        document_frequency = Counter(term for _, tokens in documents for term in set(tokens))
+        self.idf = {term: math.log((1 + len(documents)) / (1 + count)) + 1 for term, count in document_frequency.items()}
+
+        sums = {subject: Counter() for subject in examples}
+        for subject, tokens in documents:
+            for term, value in self.vectorize(tokens).items():
+                sums[subject][term] += value
+        self.centroids = {subject: _normalize(vector) for subject, vector in sums.items()}
+
+    def vectorize(self, tokens):
+        counts = Counter(token for token in tokens if token in self.idf)
+        return _normalize({term: (1 + math.log(count)) * self.idf[term] for term, count in counts.items()})
+
+    def similarities(self, text):
+        vector = self.vectorize(tokenize(text))
+        return {subject: sum(value * centroid.get(term, 0.0) for term, value in vector.items())
+                for subject, centroid in self.centroids.items()}
+
+
+_centroid_model = None
+
+
+def get_centroid_model():
+    global _centroid_model
+    if _centroid_model is None:
+        _centroid_model = CentroidModel(SEED_PROMPTS)
+    return _centroid_model
+
+
+def _matches(patterns, text):
+    return sum(1 for pattern in patterns if re.search(pattern, text))
+
+
+def estimate_difficulty(text):
+    """1 = easy fact, 2 = needs explanation, 3 = deep reasoning."""
+    words = len(text.split())
+    if _matches(HARD_CUES, text) or words > 40:
+        return 3
+    if _matches(MODERATE_CUES, text) or words > 15:
+        return 2
+    return 1
+
+
+def fast_classify(prompt: str):
+    """Classifies `prompt` locally. Check `.confident` before trusting the result."""
+    text = prompt.lower()
+    difficulty = estimate_difficulty(text)
+    requires_thinking = difficulty >= 2
+    requires_vision = _matches(VISION_CUES, text) > 0
+
+    rule_hits = {subject: _matches(patterns, text) for subject, patterns in KEYWORD_RULES.items()}
+    rule_hits = {subject: hits for subject, hits in rule_hits.items() if hits}
+
+    similarities = get_centroid_model().similarities(prompt)
+    ranked = sorted(similarities.items(), key=lambda item: item[1], reverse=True)
+    (top_subject, top_score), (_, second_score) = ranked[0], ranked[1]
+
+    if len(rule_hits) == 1:
+        subject, hits = next(iter(rule_hits.items()))
+        # Broad keywords ("load", "books") misfire, so one hit only clears the threshold if the centroid
+        # model agrees; two or more hits are enough on their own
+        confidence = min(0.95, 0.45 + 0.1 * hits + (0.2 if subject == top_subject else 0.0))
+        source = "rules"
+    else:
+        subject = top_subject
+        # A big lead only counts if the prompt actually shares enough vocabulary with the subject
+        margin = (top_score - second_score) / top_score if top_score > 0 else 0.0
+        confidence = margin * min(1.0, top_score / MIN_SIMILARITY)
+        if len(rule_hits) > 1:
+            confidence *= 0.5  # The rules disagree with each other
+        source = "tfidf"
+
+    if not requires_vision and _matches(AMBIGUOUS_VISION_CUES, text):
+        confidence *= 0.5  # Might be about the camera
+
+    return FastClassification(subject, difficulty, requires_thinking, requires_vision, round(confidence, 3), source)
@@ -0,0 +1,134 @@
+"""
+Turns a captured frame into a vision-API payload in memory: resize, encode once, base64.
+
+The vision API (high detail) scales an image to fit in 2048x2048, then scales its short side
+down to 768px, and bills 85 tokens plus 170 per 512px tile. Pixels beyond that are uploaded and
+thrown away, so frames are resized to the same limits first. Sizes that spill a few pixels
+into an extra tile row or column are shrunk to the tile boundary (TILE_SLACK). Low detail is
+a flat 85 tokens for a 512x512 image.
+
+Local vision models have limits of their own: llama3.2-vision works on up to 2x2 tiles of 560px,
+so images for it are capped at LOCAL_MAX_SIDE on both sides instead.
+
+Format and quality come from VISION_IMAGE_FORMAT ("jpeg" or "webp") and VISION_IMAGE_QUALITY.
+"""
+import base64
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+LOW_DETAIL_SIDE = 512
+TILE_SIZE = 512
+TILE_SLACK = 0.08  # Shrink up to 8% to avoid paying for a mostly empty tile
+LOCAL_MAX_SIDE = 1120
+
+BASE_TOKENS = 85
+TOKENS_PER_TILE = 170
+
+IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg")
+IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", 85))
+
+_ENCODERS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, "image/jpeg"),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, "image/webp"),
+}
+
+
+def vision_tokens(width, height, detail="high"):
+    """Estimated prompt tokens the vision API charges for an image of this size."""
+    if detail == "low":
+        return BASE_TOKENS
+    scale = min(1.0, MAX_LONG_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, MAX_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    return BASE_TOKENS + TOKENS_PER_TILE * math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def target_size(width, height, detail="high", max_long_side=MAX_LONG_SIDE, max_short_side=MAX_SHORT_SIDE):
+    """The size the API would scale the image to, snapped down to whole tiles when that's nearly free."""
+    if detail == "low":
+        scale = min(1.0, LOW_DETAIL_SIDE / max(width, height))
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    scale = min(1.0, max_long_side / max(width, height), max_short_side / min(width, height))
+    for side in (width * scale, height * scale):
+        tiles = math.ceil(side / TILE_SIZE)
+        snapped = (tiles - 1) * TILE_SIZE
+        if tiles > 1 and snapped / side >= 1 - TILE_SLACK:
+            scale = min(scale, scale * snapped / side)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    encode_seconds: float
+    detail: str
+
+    @property
+    def tokens(self):
+        return vision_tokens(self.width, self.height, self.detail)
+
+    def base64(self):
+        return base64.b64encode(self.data).decode("ascii")
+
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.base64()}"
+
+
+class ImageStats:
+    """Bytes and encode time of every image prepared for upload."""
+
+    def __init__(self):
+        self.images = 0
+        self.bytes = 0
+        self.encode_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, image):
+        with self._lock:
+            self.images += 1
+            self.bytes += len(image.data)
+            self.encode_seconds += image.encode_seconds
+
+    def __repr__(self):
+        mean_kb = self.bytes / self.images / 1024 if self.images else 0.0
+        mean_ms = self.encode_seconds / self.images * 1000 if self.images else 0.0
+        return f"ImageStats(images={self.images}, mean {mean_kb:.0f}KB, encode {mean_ms:.1f}ms)"
+
+
+image_stats = ImageStats()
+
+
+def prepare_image(frame, detail="high", image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY,
+                  max_long_side=MAX_LONG_SIDE, max_short_side=MAX_SHORT_SIDE):
+    """Resizes a BGR frame to what the API will actually look at and encodes it once."""
+    if image_format not in _ENCODERS:
+        raise ValueError(f"Unknown image format {image_format!r}. Choose from {tuple(_ENCODERS)}")
+    extension, quality_flag, mime_type = _ENCODERS[image_format]
+
+    start = time.perf_counter()
+    height, width = frame.shape[:2]
+    new_width, new_height = target_size(width, height, detail, max_long_side, max_short_side)
+    if (new_width, new_height) != (width, height):
+        # INTER_AREA avoids aliasing on big reductions but is several times slower than INTER_LINEAR
+        interpolation = cv2.INTER_AREA if width >= 2 * new_width else cv2.INTER_LINEAR
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=interpolation)
+
+    ok, encoded = cv2.imencode(extension, frame, [quality_flag, quality])
+    if not ok:
+        raise ValueError(f"Could not encode the image as {image_format}")
+    image = EncodedImage(encoded.tobytes(), mime_type, new_width, new_height, time.perf_counter() - start, detail)
+
+    image_stats.record(image)
+    return image
@@ -0,0 +1,233 @@
+"""
+Smaller copies of the wardrobe pictures, so showing or uploading one doesn't decode the full-size
+capture every time.
+
+Each picture gets three derivatives in STORE_DIR:
+- thumb: THUMB_SIDE pixels on the long side, for lists, galleries and the embedding encoder,
+- display: DISPLAY_SIDE pixels on the long side, for showing an item on screen,
+- upload: the payload ImagePipeline.prepare_image makes for the vision API (high detail).
+They're written when a picture is taken (Take_Clothing.TakePicture) or first asked for. Files are
+named after a hash of the picture's contents plus the variant's settings, so a changed picture or
+changed sizes just give new names and the copies are made again on first use. Readers ask for the
+smallest copy at least as big as they need (load, upload_image) and fall back to the original.
+
+Usage (from the repository root):
+    python ImageStore.py rebuild [images folder] [--force] [--prune] | stats
+"""
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from ImagePipeline import (IMAGE_FORMAT, IMAGE_QUALITY, LOW_DETAIL_SIDE, MAX_LONG_SIDE, MAX_SHORT_SIDE, _ENCODERS,
+                           EncodedImage, prepare_image)
+
+STORE_DIR = os.getenv("IMAGE_STORE_DIR", os.path.join("images", ".derivatives"))
+THUMB_SIDE = 256
+DISPLAY_SIDE = 1024
+DERIVATIVE_QUALITY = 85
+VARIANTS = ("thumb", "display", "upload")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def find_images(directory):
+    """Image files under `directory`, as absolute paths in a stable order. Hidden folders (like STORE_DIR) are skipped."""
+    paths = []
+    for root, directories, files in os.walk(directory):
+        directories[:] = [name for name in directories if not name.startswith(".")]
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.abspath(os.path.join(root, name)))
+    return sorted(paths)
+
+
+def _shrink(image, max_side):
+    height, width = image.shape[:2]
+    scale = max_side / max(width, height)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def _write_atomically(path, data):
+    """Writes through a temporary file, so a reader (or another thread) never sees half a file."""
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(descriptor, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+class ImageStore:
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        self._hashes = {}  # (path, mtime, size) -> content hash
+        self._upload_sizes = {}  # upload copy path -> (width, height)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.generated = 0
+
+    def content_hash(self, source):
+        """Hash of the file's bytes, remembered while its modification time and size stay the same."""
+        stat = os.stat(source)
+        key = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            with open(source, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:24]
+            self._hashes[key] = digest
+        return digest
+
+    def path(self, source, variant):
+        """Where the `variant` copy of `source` is (or will be) stored."""
+        digest = self.content_hash(source)
+        if variant == "thumb":
+            name = f"{digest}_thumb{THUMB_SIDE}q{DERIVATIVE_QUALITY}.jpg"
+        elif variant == "display":
+            name = f"{digest}_display{DISPLAY_SIDE}q{DERIVATIVE_QUALITY}.jpg"
+        elif variant == "upload":
+            extension = _ENCODERS[IMAGE_FORMAT][0]
+            name = f"{digest}_upload{MAX_LONG_SIDE}x{MAX_SHORT_SIDE}q{IMAGE_QUALITY}{extension}"
+        else:
+            raise ValueError(f"Unknown image variant {variant!r}. Choose from {VARIANTS}")
+        return os.path.join(self.directory, name)
+
+    def generate(self, source, frame=None, force=False):
+        """
+        Writes the missing derivatives of `source` from one decode (or from `frame`, the picture
+        already in memory). Returns {variant: path}; empty if the picture can't be read.
+        """
+        paths = {variant: self.path(source, variant) for variant in VARIANTS}
+        missing = [variant for variant, path in paths.items() if force or not os.path.exists(path)]
+        if not missing:
+            return paths
+        if frame is None:
+            frame = cv2.imread(source)
+            if frame is None:
+                return {}
+
+        os.makedirs(self.directory, exist_ok=True)
+        display = _shrink(frame, DISPLAY_SIDE)
+        for variant in missing:
+            if variant == "upload":
+                image = prepare_image(frame, "high")
+                data = image.data
+                self._upload_sizes[paths[variant]] = (image.width, image.height)
+            else:
+                image = display if variant == "display" else _shrink(display, THUMB_SIDE)
+                ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, DERIVATIVE_QUALITY])
+                if not ok:
+                    raise ValueError(f"Could not encode the {variant} copy of {source}")
+                data = encoded.tobytes()
+            _write_atomically(paths[variant], data)
+        with self._lock:
+            self.generated += len(missing)
+        return paths
+
+    def ensure(self, source, variant):
+        """Path of the `variant` copy, made first if it's missing; None if `source` can't be read."""
+        try:
+            path = self.path(source, variant)
+        except OSError:
+            return None
+        if os.path.exists(path):
+            with self._lock:
+                self.hits += 1
+            return path
+        return self.generate(source).get(variant)
+
+    def load(self, source, max_side):
+        """
+        The picture as a BGR array from the smallest copy with at least `max_side` pixels on the
+        long side (the original if no copy is that big). None if it can't be read.
+        """
+        variant = "thumb" if max_side <= THUMB_SIDE else "display" if max_side <= DISPLAY_SIDE else None
+        path = self.ensure(source, variant) if variant else None
+        image = cv2.imread(path) if path else None
+        return image if image is not None else cv2.imread(source)
+
+    def upload_image(self, source, detail="high"):
+        """The vision API payload for `source` as an ImagePipeline.EncodedImage, read from the stored copy."""
+        if detail != "high":
+            image = self.load(source, LOW_DETAIL_SIDE)
+            if image is None:
+                raise ValueError(f"Could not read the image {source}")
+            return prepare_image(image, detail)
+
+        path = self.ensure(source, "upload")
+        if path is None:
+            raise ValueError(f"Could not read the image {source}")
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            data = f.read()
+        if path not in self._upload_sizes:
+            self._upload_sizes[path] = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE).shape[::-1]
+        width, height = self._upload_sizes[path]
+        return EncodedImage(data, _ENCODERS[IMAGE_FORMAT][2], width, height, time.perf_counter() - start, detail)
+
+    def remove(self, source):
+        """Deletes the derivatives of `source`; call it before deleting the picture itself."""
+        try:
+            digest = self.content_hash(source)
+        except OSError:
+            return 0
+        paths = glob.glob(os.path.join(self.directory, f"{digest}_*"))
+        for path in paths:
+            os.remove(path)
+        return len(paths)
+
+    def rebuild(self, directory="images", force=False, prune=False):
+        """
+        Makes the missing derivatives of every picture under `directory` (all of them with
+        `force`). With `prune`, also deletes stored files that aren't a current derivative of one
+        of those pictures, including the copies of pictures kept elsewhere.
+        """
+        current, done, failed = set(), 0, 0
+        for source in find_images(directory):
+            paths = self.generate(source, force=force)
+            if paths:
+                done += 1
+            else:
+                print(f"Could not read {source}")
+                failed += 1
+            current.update(os.path.abspath(path) for path in paths.values())
+
+        pruned = 0
+        if prune:
+            for path in glob.glob(os.path.join(self.directory, "*")):
+                if os.path.abspath(path) not in current:
+                    os.remove(path)
+                    pruned += 1
+        return {"images": done, "failed": failed, "pruned": pruned}
+
+    def stats(self):
+        files = glob.glob(os.path.join(self.directory, "*"))
+        return {"files": len(files), "bytes": sum(os.path.getsize(path) for path in files),
+                "hits": self.hits, "generated": self.generated}
+
+
+_image_store = None
+
+
+def get_image_store():
+    global _image_store
+    if _image_store is None:
+        _image_store = ImageStore()
+    return _image_store
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        arguments = [argument for argument in sys.argv[2:] if not argument.startswith("--")]
+        start = time.perf_counter()
+        result = get_image_store().rebuild(arguments[0] if arguments else "images", force="--force" in sys.argv,
+                                           prune="--prune" in sys.argv)
+        print(f"Rebuilt the derivatives of {result['images']} images in {time.perf_counter() - start:.1f}s "
+              f"({result['failed']} unreadable, {result['pruned']} stale files removed)")
+    print(get_image_store().stats())
@@ -2,24 +2,17 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import List
 
-from ollama import ChatResponse, chat
+from Clients import abuffered_stream, acall_with_retry, aretry, call_with_retry, get_async_client, get_client, request_slot, retry
+from ResidencyManager import residency_manager
+from Telemetry import API_HARDWARE, catalogue_latency, local_hardware, model_telemetry
 
 
-from dotenv import load_dotenv
-import os
-import openai
-from sympy.physics.units import speed
-
-from AudioRecording import record_audio
-from SpeechToText import transcribe_audio
-
-load_dotenv("secrets.env")
-
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-if openai.api_key is None:
-    raise ValueError("API key not found. Check your secrets.env file.")
-
+@dataclass
+class Completion:
+    """A non-streamed response together with the tokens it used."""
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
 
 
 class Strengths:
@@ -30,7 +23,6 @@ class Strengths:
 
 class Model(ABC):
     # TODO: Speed
-    # TODO: is_reasoning_model
     def __init__(self, name: str):
         self._name = name
 
@@ -51,8 +43,30 @@ class Model(ABC):
     @property
     @abstractmethod
     def response_speed(self) -> int:
+        """
+        Unitless catalogue score for how long the model takes to answer: 0 (API models, fastest)
+        to 10 (the largest local models, slowest). Telemetry.catalogue_latency turns it into seconds.
+        """
         pass
 
+    @property
+    @abstractmethod
+    def hardware(self) -> str:
+        """What the model runs on, as used to key its telemetry."""
+        pass
+
+    def measured_latency(self, kind="chat"):
+        """Average seconds per `kind` call measured on this hardware, or None if never measured."""
+        return model_telemetry.get(self.name, self.hardware, "latency", kind)
+
+    def expected_latency(self):
+        """Seconds per full answer: measured once the model has been used here, else estimated from response_speed."""
+        measured = self.measured_latency("chat")
+        return measured if measured is not None else catalogue_latency(self.response_speed)
+
+    def _timer(self, kind="chat"):
+        return model_telemetry.timer(self.name, self.hardware, kind)
+
     @property
     @abstractmethod
     def cost(self) -> int:
@@ -65,6 +79,39 @@ class Model(ABC):
 
     @abstractmethod
     def chat(self, prompt: str, system_message: str = "", image: str = None):
+        """
+        `image` is an ImagePipeline.EncodedImage, or a string the backend accepts directly
+        (a file path or base64 for Ollama, a URL or data URL for OpenAI).
+        """
+        pass
+
+    @abstractmethod
+    async def achat(self, prompt: str, system_message: str = "", image: str = None):
+        pass
+
+    @abstractmethod
+    def chat_stream(self, prompt: str, system_message: str = "", image: str = None):
+        """Like chat(), but yields the response in chunks as the model produces them."""
+        pass
+
+    @abstractmethod
+    async def achat_stream(self, prompt: str, system_message: str = "", image: str = None):
+        """Async version of chat_stream()."""
+        pass
+
+    @abstractmethod
+    def complete(self, prompt: str, system_message: str = "", schema: dict = None, max_tokens: int = None,
+                 image=None) -> Completion:
+        """
+        Like chat(), but returns a Completion with token counts. With a JSON schema the backend
+        constrains the output to match it; max_tokens caps the length of the response.
+        """
+        pass
+
+    @abstractmethod
+    async def acomplete(self, prompt: str, system_message: str = "", schema: dict = None, max_tokens: int = None,
+                        image=None) -> Completion:
+        """Async version of complete()."""
         pass
 
     def __str__(self):
@@ -96,8 +143,8 @@ class LocalModel(Model):
         return self._strengths
 
     @property
-    def response_speed(self) -> int:
-        pass
+    def response_speed(self):
+        return self._speed
 
     @property
     def vision_model(self) -> bool:
@@ -107,47 +154,133 @@ class LocalModel(Model):
     def cost(self) -> int:
         return self._cost
 
-    def chat(self, prompt: str, system_message: str = "", image: str = None):
+    @property
+    def hardware(self) -> str:
+        return local_hardware()
 
+    def _messages(self, prompt: str, system_message: str = "", image: str = None):
         if image:
-            response: ChatResponse = chat(
-                model=self.name,
-                messages=[
-                    # {
-                    #     "role": "system",
-                    #     "content": system_message
-                    # },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                        "images": [image]
-                    }
-                ]
-            )
+            # Ollama takes the encoded bytes as they are, no base64 round trip needed
+            messages = [{"role": "system", "content": system_message}] if system_message else []
+            return messages + [
+                {
+                    "role": "user",
+                    "content": prompt,
+                    "images": [getattr(image, "data", image)]
+                }
+            ]
+
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": f"{prompt}"},
+        ]
 
-        else:
-            response: ChatResponse = chat(
-                model=self.name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": f"{prompt}"},
-                ]
-            )
+    def chat(self, prompt: str, system_message: str = "", image: str = None):
+        from ollama import ChatResponse
 
+        with residency_manager.lease(self) as lease:
+            timer = self._timer()
+            response: ChatResponse = call_with_retry("ollama", get_client("ollama").chat, model=self.name,
+                                                     messages=self._messages(prompt, system_message, image),
+                                                     keep_alive=lease.keep_alive)
+            timer.finish(response.eval_count)
+            lease.record_load(response.load_duration)
 
         response_text = response.message.content.strip()
 
         return response_text
 
+    async def achat(self, prompt: str, system_message: str = "", image: str = None):
+        client = get_async_client("ollama")
+        async with residency_manager.alease(self) as lease:
+            timer = self._timer()
+            response = await acall_with_retry("ollama", client.chat, model=self.name,
+                                              messages=self._messages(prompt, system_message, image),
+                                              keep_alive=lease.keep_alive)
+            timer.finish(response.eval_count)
+            lease.record_load(response.load_duration)
+
+        return response.message.content.strip()
+
+    def chat_stream(self, prompt: str, system_message: str = "", image: str = None):
+        # The request only goes out once the stream is iterated, so it isn't retried
+        with residency_manager.lease(self) as lease, request_slot("ollama"):
+            timer = self._timer()
+            for part in get_client("ollama").chat(model=self.name, messages=self._messages(prompt, system_message, image),
+                                                  stream=True, keep_alive=lease.keep_alive):
+                if part.message.content:
+                    timer.token()
+                    yield part.message.content
+                if part.done:
+                    lease.record_load(part.load_duration)
+            timer.finish()
+
+    async def achat_stream(self, prompt: str, system_message: str = "", image: str = None):
+        client = get_async_client("ollama")
+
+        async def read():
+            async with residency_manager.alease(self) as lease:
+                timer = self._timer()
+                async for part in await client.chat(model=self.name, messages=self._messages(prompt, system_message, image),
+                                                    stream=True, keep_alive=lease.keep_alive):
+                    if part.message.content:
+                        timer.token()
+                        yield part.message.content
+                    if part.done:
+                        lease.record_load(part.load_duration)
+                timer.finish()
+
+        async for chunk in abuffered_stream("ollama", read()):
+            yield chunk
+
+    def _completion_kwargs(self, prompt, system_message, schema, max_tokens, keep_alive, image=None):
+        kwargs = {"model": self.name, "messages": self._messages(prompt, system_message, image), "keep_alive": keep_alive}
+        if schema is not None:
+            # Ollama compiles the schema into a grammar, so a reasoning model can't emit its <think> preamble
+            kwargs["format"] = schema
+            kwargs["options"] = {"temperature": 0}
+        if max_tokens is not None:
+            kwargs.setdefault("options", {})["num_predict"] = max_tokens
+        return kwargs
+
+    @staticmethod
+    def _completion(response):
+        return Completion(response.message.content.strip(), response.prompt_eval_count or 0, response.eval_count or 0)
+
+    def complete(self, prompt: str, system_message: str = "", schema: dict = None, max_tokens: int = None, image=None):
+        with residency_manager.lease(self) as lease:
+            timer = self._timer("complete")
+            response = call_with_retry("ollama", get_client("ollama").chat,
+                                       **self._completion_kwargs(prompt, system_message, schema, max_tokens, lease.keep_alive, image))
+            completion = self._completion(response)
+            timer.finish(completion.completion_tokens)
+            lease.record_load(response.load_duration)
+        return completion
+
+    async def acomplete(self, prompt: str, system_message: str = "", schema: dict = None, max_tokens: int = None, image=None):
+        client = get_async_client("ollama")
+        async with residency_manager.alease(self) as lease:
+            timer = self._timer("complete")
+            response = await acall_with_retry("ollama", client.chat,
+                                              **self._completion_kwargs(prompt, system_message, schema, max_tokens, lease.keep_alive, image))
+            completion = self._completion(response)
+            timer.finish(completion.completion_tokens)
+            lease.record_load(response.load_duration)
+        return completion
+
 
 class OnlineModel(Model):
-    def __init__(self, name: str, vram: int, strengths: List[Strengths], response_speed: int, cost: int, vision_model: bool = False):
+    def __init__(self, name: str, vram: int, strengths: List[Strengths], response_speed: int, cost: int, vision_model: bool = False,
+                 json_schema_output: bool = False, reasoning_model: bool = False):
         super().__init__(name)
         self._vram = vram
         self._strengths = strengths
-        self._response_speed = speed
+        self._response_speed = response_speed
         self._cost = cost
         self._vision_model = vision_model
+        # Older models only support JSON mode, not structured outputs with a schema
+        self._json_schema_output = json_schema_output
+        self._reasoning_model = reasoning_model
 
     @property
     def vram(self) -> int:
@@ -158,8 +291,8 @@ class OnlineModel(Model):
         return self._strengths
 
     @property
-    def response_speed(self) -> int:
-        pass
+    def response_speed(self):
+        return self._response_speed
 
     @property
     def cost(self) -> int:
@@ -169,29 +302,39 @@ class OnlineModel(Model):
     def vision_model(self) -> bool:
        return self._vision_model
 
-    def chat(self, prompt: str, system_message: str = "", image: str = None):
-        # Insert OpenAPI library calls here
+    @property
+    def hardware(self) -> str:
+        return API_HARDWARE
 
+    def _messages(self, prompt: str, system_message: str = "", image: str = None):
         if image:
-            response = openai.chat.completions.create(
-                model=self.name,  # GPT-4 Vision model
-                messages=[
-                    {"role": "user", "content": prompt},
-                    {"role": "user", "content": [image]}
-                ]
-            )
+            # The prompt and the image go in one user message as text and image_url parts
+            url = image.data_url() if hasattr(image, "data_url") else image
+            messages = [{"role": "system", "content": system_message}] if system_message else []
+            return messages + [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": {"url": url, "detail": getattr(image, "detail", "auto")}},
+                    ],
+                }
+            ]
+
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": f"{prompt}"},
+        ]
 
-
-        else:
-            response = openai.chat.completions.create(
-                model=self.name,  # Or "gpt-3.5-turbo" if GPT-4 is unavailable
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": f"{prompt}"},
-                ],
-                # max_completion_tokens=500,
-
-            )
+    def chat(self, prompt: str, system_message: str = "", image: str = None):
+        timer = self._timer()
+        response = call_with_retry(
+            "openai", get_client("openai").chat.completions.create,
+            model=self.name,
+            messages=self._messages(prompt, system_message, image),
+            # max_completion_tokens=500,
+        )
+        timer.finish(response.usage.completion_tokens if response.usage else None)
 
 
         response_text = response.choices[0].message.content.strip()
@@ -199,6 +342,90 @@ class OnlineModel(Model):
 
         return response_text
 
+    async def achat(self, prompt: str, system_message: str = "", image: str = None):
+        client = get_async_client("openai")
+        timer = self._timer()
+        response = await acall_with_retry(
+            "openai", client.chat.completions.create,
+            model=self.name,
+            messages=self._messages(prompt, system_message, image),
+        )
+        timer.finish(response.usage.completion_tokens if response.usage else None)
+
+        return response.choices[0].message.content.strip()
+
+    def chat_stream(self, prompt: str, system_message: str = "", image: str = None):
+        with request_slot("openai"):
+            timer = self._timer()
+            stream = retry(
+                "openai", get_client("openai").chat.completions.create,
+                model=self.name,
+                messages=self._messages(prompt, system_message, image),
+                stream=True,
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    timer.token()
+                    yield chunk.choices[0].delta.content
+            timer.finish()
+
+    async def achat_stream(self, prompt: str, system_message: str = "", image: str = None):
+        client = get_async_client("openai")
+
+        async def read():
+            timer = self._timer()
+            stream = await aretry(
+                "openai", client.chat.completions.create,
+                model=self.name,
+                messages=self._messages(prompt, system_message, image),
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    timer.token()
+                    yield chunk.choices[0].delta.content
+            timer.finish()
+
+        async for chunk in abuffered_stream("openai", read()):
+            yield chunk
+
+    def _completion_kwargs(self, prompt, system_message, schema, max_tokens, image=None):
+        kwargs = {"model": self.name, "messages": self._messages(prompt, system_message, image)}
+        if schema is not None:
+            if self._json_schema_output:
+                kwargs["response_format"] = {"type": "json_schema",
+                                             "json_schema": {"name": "response", "schema": schema, "strict": True}}
+            else:
+                kwargs["response_format"] = {"type": "json_object"}
+        if self._reasoning_model:
+            # Keep the hidden reasoning short. max_tokens is left off: max_completion_tokens would also
+            # count the hidden reasoning, and a cap sized for the answer leaves nothing for the answer
+            kwargs["reasoning_effort"] = "low"
+        elif max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        return kwargs
+
+    @staticmethod
+    def _completion(response):
+        usage = response.usage
+        return Completion((response.choices[0].message.content or "").strip(),
+                          usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0)
+
+    def complete(self, prompt: str, system_message: str = "", schema: dict = None, max_tokens: int = None, image=None):
+        timer = self._timer("complete")
+        completion = self._completion(call_with_retry("openai", get_client("openai").chat.completions.create,
+                                                      **self._completion_kwargs(prompt, system_message, schema, max_tokens, image)))
+        timer.finish(completion.completion_tokens)
+        return completion
+
+    async def acomplete(self, prompt: str, system_message: str = "", schema: dict = None, max_tokens: int = None, image=None):
+        client = get_async_client("openai")
+        timer = self._timer("complete")
+        completion = self._completion(await acall_with_retry("openai", client.chat.completions.create,
+                                                             **self._completion_kwargs(prompt, system_message, schema, max_tokens, image)))
+        timer.finish(completion.completion_tokens)
+        return completion
+
 
 
 deepseek_r1_671b = LocalModel(
@@ -303,7 +530,9 @@ o3mini = OnlineModel(
         Strengths("Other", 6)
     ],
     response_speed=0,
-    cost=3  # API cost: $0.30 per 1M tokens x 10
+    cost=3,  # API cost: $0.30 per 1M tokens x 10
+    json_schema_output=True,
+    reasoning_model=True
 )
 
 llama3_2_vision = LocalModel(
@@ -328,6 +557,51 @@ llama3_2_vision = LocalModel(
     vision_model=True
 )
 
+gpt4o_mini = OnlineModel(
+    name="gpt-4o-mini",
+    vram=0,  # Online model, no local VRAM required
+    strengths=[
+        Strengths("NLP", 7),
+        Strengths("Coding", 6),
+        Strengths("Math", 6),
+        Strengths("Science", 6),
+        Strengths("Technology", 6),
+        Strengths("Business_and_Economics", 6),
+        Strengths("History", 6),
+        Strengths("Literature", 6),
+        Strengths("Philosophy", 6),
+        Strengths("Other", 6),
+        Strengths("Vision", 8)  # Good enough for describing a photo, at a fraction of the cost
+    ],
+    response_speed=0,
+    cost=2,  # API cost: $0.15 per 1M input tokens x 10, rounded up
+    vision_model=True,
+    json_schema_output=True
+)
+
+gpt4o = OnlineModel(
+    name="gpt-4o",
+    vram=0,  # Online model, no local VRAM required
+    strengths=[
+        Strengths("NLP", 10),
+        Strengths("Coding", 8),
+        Strengths("Math", 8),
+        Strengths("Science", 9),
+        Strengths("Technology", 9),
+        Strengths("Engineering", 8),
+        Strengths("Business_and_Economics", 8),
+        Strengths("History", 8),
+        Strengths("Literature", 8),
+        Strengths("Philosophy", 8),
+        Strengths("Other", 7),
+        Strengths("Vision", 10)
+    ],
+    response_speed=0,
+    cost=25,  # API cost: $2.50 per 1M input tokens x 10
+    vision_model=True,
+    json_schema_output=True
+)
+
 gpt4_vision = OnlineModel(
     name="gpt-4-turbo",
     vram=0,  # No VRAM needed for API calls
@@ -353,11 +627,16 @@ gpt4_vision = OnlineModel(
 
 _available_models = [deepseek_r1_671b, deepseek_r1_8b, deepseek_r1_1_5, tinyllama, gptturbo, o3mini, llama3_2_vision, gpt4_vision]
 
+# Only offered for vision prompts (Vision.pick_vision_model). In _available_models they'd undercut
+# gpt-3.5-turbo on cost and take over text prompts for users with a low API cost tolerance.
+_vision_only_models = [gpt4o_mini, gpt4o]
+
 # TODO: Move to settings file
 
 #
 
 if __name__ == '__main__':
+    from AudioRecording import record_audio
 
     record_audio()
     #
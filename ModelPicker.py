@@ -1,94 +1,46 @@
+from CapabilityIndex import get_capability_index
 from Classifier import Classification
-from Model import Model, LocalModel, _available_models, OnlineModel
-from Settings import load_settings
-
-# Load settings from settings.json
-user_settings = load_settings()
-
-# Now you can use the variables inside ModelPicker
-print(f"Using settings: user_vram={user_settings.user_vram}, use_internet={user_settings.use_internet}, api_cost_tolerance={user_settings.api_cost_tolerance}")
+from Model import Model, _available_models
+from Settings import get_user_settings
 
 # Example usage
 
 
 
 #def pick_model(available_models: list[Model], prompt_classification: Classification, settings: Settings, max_number_of_models: int = 1):
-def pick_model(available_models: list[Model], prompt_classification: Classification, max_number_of_models: int = 2):
-    print(available_models)
-
-    if prompt_classification.requires_vision:
-        for model in available_models:
-            if model.vision_model:
-                print(model)
-                return [model]
-
-        else:
-            print("No vision models supported...")
-
-    vram_filtered_models = []
-    for model in available_models:
-        if model.vram <= user_settings.user_vram:
-            vram_filtered_models.append(model)
-
-    print(vram_filtered_models)
-    api_cost_filtered_models = []
-
-
-    #print(user_settings.api_cost_tolerance)
-
-    for model in vram_filtered_models:
-        if model.cost <= user_settings.api_cost_tolerance:
-            api_cost_filtered_models.append(model)
-
-    print("below is the api_cost_filtered models")
-    print(api_cost_filtered_models)
-    internet_filtered_models = []
-
-    for model in api_cost_filtered_models:
-        if not user_settings.use_internet:
-            if type(model) == LocalModel:
-                internet_filtered_models.append(model)
-        elif user_settings.use_internet:
-            if type(model) == OnlineModel:
-                internet_filtered_models.append(model)
-
-
-    print("below is the internet filtered models")
-    print(internet_filtered_models)
-    subject_filtered_models = []
-
-    for model in internet_filtered_models:
-        for model_strength in model.strengths:
-            if prompt_classification.subject in model_strength.subject_strength:
-                subject_filtered_models.append(model)
-
-    print(subject_filtered_models)
-
-    models_to_sort = subject_filtered_models if subject_filtered_models else internet_filtered_models
-
-    # Sort models by subject strength (or default 0 if not found)
-    sorted_subject_strength_models = sorted(
-        models_to_sort,
-        key=lambda model: next(
-            (strength.strength_level for strength in model.strengths if
-             strength.subject_strength == prompt_classification.subject),
-            0  # Default to 0 if the subject is not found
-        ),
-        reverse=True
+def pick_model(available_models: list[Model], prompt_classification: Classification, max_number_of_models: int = 2,
+               latency_budget: float = None):
+    """
+    Returns up to `max_number_of_models` models for the prompt, strongest at its subject first.
+
+    Only models within the user's VRAM, API cost tolerance and internet setting are considered.
+    Vision prompts get the vision models among those, strongest at vision first (text models if
+    none fit). If no model lists the subject, they're returned in catalogue order.
+
+    With a `latency_budget` (seconds), models expected to answer slower than that are ranked as if
+    proportionally weaker. The expected time is the one measured on this machine for full answers,
+    or estimated from the catalogue speed for models not used yet (see Telemetry.py).
+    """
+    # Load settings from settings.json
+    user_settings = get_user_settings()
+
+    index = get_capability_index(available_models)
+    best_models = index.pick(
+        subject=prompt_classification.subject,
+        requires_vision=prompt_classification.requires_vision,
+        max_vram=user_settings.user_vram,
+        max_cost=user_settings.api_cost_tolerance,
+        use_internet=user_settings.use_internet,
+        limit=max_number_of_models,
+        latency_budget=latency_budget,
+        expected_latency=lambda model: model.expected_latency(),
     )
 
-    print("Sorted models:", sorted_subject_strength_models)
-
-    # TODO: Default model if none match
-
-    return sorted_subject_strength_models[:max_number_of_models]
-
-    # TODO: sort subject filtered models by strength
-
+    print("Sorted models:", best_models)
 
     # TODO: Default model if none match
 
-    #return subject_filtered_models[:max_number_of_models]
+    return best_models
 
 
 
@@ -98,7 +50,6 @@ if __name__ == '__main__':
 
     #user_settings = Settings("path/to/settings.json")
    # user_settings = Settings("settings.json")
-    user_settings = load_settings()
 
 
 
@@ -0,0 +1,106 @@
+"""
+Saved outfit suggestions, so asking for the same style twice doesn't call the model again while
+the wardrobe is unchanged.
+
+Suggestions are stored in the wardrobe database, keyed on the normalised style prompt
+(ClassificationCache.normalize_prompt) and the wardrobe version: a counter that triggers bump on
+every insert, update or delete of a clothing item (see Fashion._add_outfit_cache). A changed
+wardrobe therefore misses every older suggestion, and those are dropped on the next store.
+
+A repeated prompt is answered from the stored suggestions, least served first, so they take
+turns. The model is only asked again when the user wants a different suggestion than the ones
+they've been shown (`exclude`) and none of the stored ones qualifies. Identical suggestions are
+stored once, and up to SUGGESTIONS_PER_PROMPT distinct ones are kept per key.
+"""
+import threading
+import time
+
+from ClassificationCache import normalize_prompt
+
+SUGGESTIONS_PER_PROMPT = 3
+
+
+class OutfitCacheStats:
+    """Hits, misses and the model time the hits saved, for this process."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+
+    def record_hit(self, seconds_saved):
+        with self._lock:
+            self.hits += 1
+            self.seconds_saved += max(0.0, seconds_saved)
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return (f"OutfitCacheStats(hits={self.hits}, misses={self.misses}, hit rate {self.hit_rate:.0%}, "
+                f"{self.seconds_saved:.1f}s saved)")
+
+
+outfit_cache_stats = OutfitCacheStats()
+
+
+def wardrobe_version(conn):
+    return conn.execute("SELECT version FROM wardrobe_version").fetchone()[0]
+
+
+def prompt_key(user_prompt, top_k):
+    # The number of candidates changes what the model sees, so it's part of the key
+    return f"{normalize_prompt(user_prompt)}|{top_k}"
+
+
+def _stored(conn, key, version):
+    return conn.execute('''
+        SELECT rowid, top_id, bottom_id, shoes_id, seconds FROM outfit_cache
+        WHERE wardrobe_version = ? AND prompt_key = ?
+        ORDER BY served, rowid
+    ''', (version, key)).fetchall()
+
+
+def get_cached_outfit(conn, user_prompt, top_k, exclude=()):
+    """
+    (top_id, bottom_id, shoes_id) of the least served suggestion stored for the prompt and the
+    current wardrobe that isn't one of `exclude` (suggestions already shown); None on a miss.
+    """
+    start = time.perf_counter()
+    for rowid, top_id, bottom_id, shoes_id, seconds in _stored(conn, prompt_key(user_prompt, top_k), wardrobe_version(conn)):
+        if (top_id, bottom_id, shoes_id) in exclude:
+            continue
+        with conn:
+            conn.execute("UPDATE outfit_cache SET served = served + 1 WHERE rowid = ?", (rowid,))
+        outfit_cache_stats.record_hit(seconds - (time.perf_counter() - start))
+        return top_id, bottom_id, shoes_id
+    outfit_cache_stats.record_miss()
+    return None
+
+
+def cache_outfit(conn, user_prompt, top_k, outfit_ids, seconds):
+    """
+    Stores a suggestion the model took `seconds` to make, unless the same one is stored already,
+    and drops those for older wardrobes. Past SUGGESTIONS_PER_PROMPT, the most served one makes
+    room. Returns whether it was stored.
+    """
+    key, version, outfit_ids = prompt_key(user_prompt, top_k), wardrobe_version(conn), tuple(outfit_ids)
+    with conn:
+        conn.execute("DELETE FROM outfit_cache WHERE wardrobe_version < ?", (version,))
+        stored = _stored(conn, key, version)
+        if any(tuple(row[1:4]) == outfit_ids for row in stored):
+            return False
+        for row in stored[SUGGESTIONS_PER_PROMPT - 1:]:
+            conn.execute("DELETE FROM outfit_cache WHERE rowid = ?", (row[0],))
+        conn.execute('''
+            INSERT INTO outfit_cache (prompt_key, wardrobe_version, top_id, bottom_id, shoes_id, seconds, served, created)
+            VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+        ''', (key, version, *outfit_ids, seconds, time.time()))
+    return True
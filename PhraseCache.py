@@ -0,0 +1,216 @@
+"""
+On-disk cache of synthesized speech for the fixed phrases the assistant says over and over.
+
+Entries are content-addressed by (text, speaker, speed, pitch, model name) and stored as
+float32 PCM `.npy` files, so `play_tts` can memory-map a cached phrase and play it without
+running VITS or the pitch shift again.
+
+Phrases get in by `play_tts(..., cache_phrase=True)` or by pre-rendering every literal phrase
+passed to `play_tts` in the codebase with:
+    python PhraseCache.py warm
+"""
+import ast
+import hashlib
+import json
+import os
+import sys
+import uuid
+
+import numpy as np
+
+CACHE_DIR = "tmp/tts_cache"
+MAX_CACHE_BYTES = 200 * 1024 ** 2
+
+
+class PhraseCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text, speaker, speed, pitch, model_name):
+        payload = json.dumps([text, speaker, float(speed), float(pitch), model_name])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, text, speaker, speed, pitch, model_name):
+        """Returns the cached audio as a read-only memory map, or None."""
+        path = self._path(self.key(text, speaker, speed, pitch, model_name))
+        try:
+            wav = np.load(path, mmap_mode="r")
+            os.utime(path)  # Mark as recently used for eviction
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return wav
+
+    def put(self, text, speaker, speed, pitch, model_name, wav):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(self.key(text, speaker, speed, pitch, model_name))
+
+        # Write under a temporary name first so a reader never sees a half-written entry
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as file:
+            np.save(file, np.asarray(wav, dtype=np.float32))
+        os.replace(temp_path, path)
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+phrase_cache = PhraseCache()
+
+
+# ------------------------------
+# Warm-up
+# ------------------------------
+def _literal(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float)):
+        return node.value
+    return None
+
+
+def _string_assignments(scope):
+    """Maps names to every string literal assigned to them inside `scope`."""
+    assignments = {}
+    for node in ast.walk(scope):
+        if isinstance(node, ast.Assign) and isinstance(_literal(node.value), str):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    assignments.setdefault(target.id, set()).add(node.value.value)
+    return assignments
+
+
+def _call_name(call):
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+def _call_argument(call, index, name):
+    if len(call.args) > index:
+        return call.args[index]
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def find_tts_phrases(root=".", defaults=None):
+    """
+    Scans the Python files under `root` for phrases passed to `play_tts`.
+
+    Literal arguments are picked up directly. Calls like `play_tts(question, ...)` inside a
+    helper are followed one level up, so `ask_yes_no("Would you like ...?")` and
+    `question = "..."; ask_yes_no(question)` are found too.
+    Returns a set of (text, speaker, speed, pitch) tuples.
+    """
+    defaults = defaults or {"speaker": "p227", "speed": 1.0, "pitch": -1}
+    trees = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = [d for d in subdirectories if not d.startswith(".") and d not in ("venv", "tmp")]
+        for name in files:
+            if name.endswith(".py"):
+                with open(os.path.join(directory, name), encoding="utf-8") as file:
+                    try:
+                        trees.append(ast.parse(file.read()))
+                    except SyntaxError:
+                        continue
+
+    phrases = set()
+    forwarders = {}  # helper name -> (parameter index, parameter name, voice settings)
+
+    def voice(call):
+        settings = dict(defaults)
+        for index, name in enumerate(("speaker", "speed", "pitch"), start=1):
+            argument = _call_argument(call, index, name)
+            if argument is not None:
+                value = _literal(argument)
+                if value is None:
+                    return None  # Voice depends on runtime values, nothing to pre-render
+                settings[name] = value
+        return settings["speaker"], settings["speed"], settings["pitch"]
+
+    # Module bodies count as scopes too, e.g. the calls under `if __name__ == '__main__':`
+    scopes = trees + [node for tree in trees for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
+
+    for scope in scopes:
+        parameters = [argument.arg for argument in scope.args.args] if isinstance(scope, ast.FunctionDef) else []
+        assignments = _string_assignments(scope)
+        for call in ast.walk(scope):
+            if not isinstance(call, ast.Call) or _call_name(call) != "play_tts":
+                continue
+            text = _call_argument(call, 0, "text")
+            settings = voice(call)
+            if text is None or settings is None:
+                continue
+            if isinstance(_literal(text), str):
+                phrases.add((text.value,) + settings)
+            elif isinstance(text, ast.Name) and text.id in parameters:
+                forwarders[scope.name] = (parameters.index(text.id), text.id, settings)
+            elif isinstance(text, ast.Name):
+                phrases.update((value,) + settings for value in assignments.get(text.id, ()))
+
+    for scope in scopes:
+        assignments = _string_assignments(scope)
+        for call in ast.walk(scope):
+            if not isinstance(call, ast.Call) or _call_name(call) not in forwarders:
+                continue
+            index, name, settings = forwarders[_call_name(call)]
+            argument = _call_argument(call, index, name)
+            if isinstance(_literal(argument), str):
+                phrases.add((argument.value,) + settings)
+            elif isinstance(argument, ast.Name):
+                phrases.update((value,) + settings for value in assignments.get(argument.id, ()))
+
+    return phrases
+
+
+def warm(root="."):
+    """Pre-renders every phrase found by `find_tts_phrases` into the cache."""
+    from TextToSpeech import CACHE_VOICE_ID, render
+
+    phrases = sorted(find_tts_phrases(root), key=str)
+    for text, speaker, speed, pitch in phrases:
+        if phrase_cache.get(text, speaker, speed, pitch, CACHE_VOICE_ID) is not None:
+            print(f"Cached:   {text!r}")
+            continue
+        phrase_cache.put(text, speaker, speed, pitch, CACHE_VOICE_ID, render(text, speaker, speed, pitch))
+        print(f"Rendered: {text!r} ({speaker}, speed={speed}, pitch={pitch})")
+
+    print(f"{len(phrases)} phrases ready in {phrase_cache.cache_dir}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["warm"]:
+        warm()
+    else:
+        for phrase in sorted(find_tts_phrases(), key=str):
+            print(phrase)
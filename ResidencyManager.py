@@ -0,0 +1,258 @@
+"""
+Decides which local Ollama models stay loaded, so switching between the classifier, the draft
+model, the refinement model and the vision model doesn't cold-load multi-GB weights every time.
+
+Every LocalModel call takes a lease on its model. A model that isn't resident yet gets room made
+for it first: least recently used models are unloaded (keep_alive=0) until it fits in the VRAM
+budget (Settings.user_vram unless given). Models being used or pinned are never unloaded. Calls
+pass a long keep_alive so Ollama doesn't unload behind our back; unloading is our job.
+
+The bookkeeping happens under a lock; the Ollama requests it decides on (listing and unloading
+models) are made after the lock is released, so one slow unload doesn't hold up every other call.
+Async callers use alease(), which runs those requests in a worker thread to keep the event loop
+free.
+
+preload() loads a model in the background, e.g. the refinement model while the draft model
+is still generating. Ollama reports load_duration on every response, which gives the loads
+and cold-start latency per model in stats().
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+from Clients import call_with_retry, ollama_client
+from Telemetry import API_HARDWARE
+
+KEEP_ALIVE = "30m"  # Long enough that unloading is left to the residency manager
+PINNED_KEEP_ALIVE = -1  # Never unload
+COLD_LOAD_SECONDS = 0.25  # A load_duration above this means the weights weren't in memory
+
+
+class ModelLease:
+    """One call's use of a model. record_load() takes Ollama's load_duration (nanoseconds)."""
+
+    def __init__(self, manager, model, keep_alive):
+        self.manager = manager
+        self.model = model
+        self.keep_alive = keep_alive
+
+    def record_load(self, load_duration_ns):
+        if load_duration_ns:
+            self.manager._record_load(self.model.name, load_duration_ns / 1e9)
+
+
+class ResidencyManager:
+    def __init__(self, vram_budget_gb=None, keep_alive=KEEP_ALIVE):
+        self._vram_budget_gb = vram_budget_gb
+        self.keep_alive = keep_alive
+        self._resident = OrderedDict()  # name -> vram in GB, least recently used first
+        self._in_use = {}  # name -> number of calls running on it
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self._synced = False
+
+        self.loads = {}
+        self.unloads = {}
+        self.preloads = {}
+        self.cold_start_seconds = {}  # name -> list of load durations
+
+    @property
+    def vram_budget_gb(self):
+        if self._vram_budget_gb is None:
+            from Settings import get_user_settings
+            return get_user_settings().user_vram
+        return self._vram_budget_gb
+
+    @staticmethod
+    def manages(model):
+        return model.hardware != API_HARDWARE
+
+    def sync(self):
+        """Picks up the models Ollama already has loaded, e.g. from a previous run."""
+        try:
+            running = ollama_client().ps().models
+        except Exception as e:
+            print(f"Could not list loaded Ollama models: {e}")
+            running = []
+
+        with self._lock:
+            for entry in running:
+                # Ollama lists untagged models as "name:latest"
+                name = entry.model.removesuffix(":latest")
+                self._resident.setdefault(name, (entry.size_vram or 0) / 1024 ** 3)
+            self._synced = True
+
+    def pin(self, model):
+        """Keeps `model` loaded for good (e.g. the classifier, which runs on every prompt)."""
+        with self._lock:
+            self._pinned.add(model.name)
+
+    def unpin(self, model):
+        with self._lock:
+            self._pinned.discard(model.name)
+
+    def _keep_alive(self, name):
+        return PINNED_KEEP_ALIVE if name in self._pinned else self.keep_alive
+
+    def vram_used_gb(self):
+        return sum(self._resident.values())
+
+    def _make_room(self, model):
+        """
+        Takes least recently used idle models off the resident list until `model` fits. Returns
+        their (name, vram) for _unload() to unload once the lock is released.
+        """
+        budget = self.vram_budget_gb
+        evicted = []
+        for name in list(self._resident):
+            if self.vram_used_gb() + model.vram <= budget:
+                break
+            if name == model.name or name in self._pinned or self._in_use.get(name):
+                continue
+            evicted.append((name, self._resident.pop(name)))
+        return evicted
+
+    def _could_fit(self, model):
+        """Whether unloading every idle, unpinned model would make room for `model`."""
+        kept = sum(vram for name, vram in self._resident.items()
+                   if name in self._pinned or self._in_use.get(name))
+        return kept + model.vram <= self.vram_budget_gb
+
+    def _unload(self, evicted):
+        """Asks Ollama to unload the models _make_room() picked. Call it without holding the lock."""
+        for name, vram in evicted:
+            try:
+                ollama_client().generate(model=name, keep_alive=0)
+            except Exception as e:
+                print(f"Could not unload {name}: {e}")
+                with self._lock:
+                    # Still loaded, so it counts towards the budget again (as least recently used)
+                    if name not in self._resident:
+                        self._resident[name] = vram
+                        self._resident.move_to_end(name, last=False)
+                continue
+            with self._lock:
+                self.unloads[name] = self.unloads.get(name, 0) + 1
+            print(f"Unloaded {name} to free VRAM")
+
+    def _admit(self, model):
+        """Marks `model` resident and most recently used. Returns the models to unload for it."""
+        if model.name in self._resident:
+            self._resident.move_to_end(model.name)
+            return []
+        evicted = self._make_room(model)
+        self._resident[model.name] = model.vram
+        return evicted
+
+    def _acquire(self, model):
+        """The bookkeeping half of a lease: returns the keep_alive to pass and the models to unload."""
+        with self._lock:
+            evicted = self._admit(model)
+            self._in_use[model.name] = self._in_use.get(model.name, 0) + 1
+            return self._keep_alive(model.name), evicted
+
+    def _release(self, model):
+        with self._lock:
+            self._in_use[model.name] -= 1
+
+    @contextmanager
+    def lease(self, model):
+        """Makes room for `model` if needed and keeps it from being unloaded during the call."""
+        if not self.manages(model):
+            yield ModelLease(self, model, None)
+            return
+
+        if not self._synced:
+            self.sync()
+        keep_alive, evicted = self._acquire(model)
+        try:
+            self._unload(evicted)
+            yield ModelLease(self, model, keep_alive)
+        finally:
+            self._release(model)
+
+    @asynccontextmanager
+    async def alease(self, model):
+        """lease() for coroutines: the Ollama requests it makes run in a worker thread."""
+        if not self.manages(model):
+            yield ModelLease(self, model, None)
+            return
+
+        if not self._synced:
+            await asyncio.to_thread(self.sync)
+        keep_alive, evicted = self._acquire(model)
+        try:
+            if evicted:
+                await asyncio.to_thread(self._unload, evicted)
+            yield ModelLease(self, model, keep_alive)
+        finally:
+            self._release(model)
+
+    def _record_load(self, name, seconds):
+        if seconds < COLD_LOAD_SECONDS:
+            return
+        with self._lock:
+            self.loads[name] = self.loads.get(name, 0) + 1
+            self.cold_start_seconds.setdefault(name, []).append(seconds)
+        print(f"Cold-loaded {name} in {seconds:.2f}s")
+
+    def preload(self, model):
+        """Loads `model` in a background thread, if it fits without unloading a model in use."""
+        if not self.manages(model):
+            return None
+        with self._lock:
+            if model.name in self._resident:
+                self._resident.move_to_end(model.name)
+                return None
+
+        thread = threading.Thread(target=self._warm, args=(model,), daemon=True)
+        thread.start()
+        return thread
+
+    def _warm(self, model):
+        if not self._synced:
+            self.sync()
+        with self._lock:
+            if not self._could_fit(model):
+                print(f"Not preloading {model.name}: it doesn't fit next to the models in use")
+                return
+            evicted = self._admit(model)
+            self.preloads[model.name] = self.preloads.get(model.name, 0) + 1
+            keep_alive = self._keep_alive(model.name)
+        self._unload(evicted)
+
+        start = time.perf_counter()
+        try:
+            # A request with no prompt just loads the model
+            response = call_with_retry("ollama", ollama_client().generate, model=model.name, keep_alive=keep_alive)
+        except Exception as e:
+            print(f"Could not preload {model.name}: {e}")
+            with self._lock:
+                self._resident.pop(model.name, None)
+            return
+        ModelLease(self, model, keep_alive).record_load(response.load_duration)
+        print(f"Preloaded {model.name} in {time.perf_counter() - start:.2f}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": list(self._resident),
+                "pinned": sorted(self._pinned),
+                "vram_used_gb": self.vram_used_gb(),
+                "loads": dict(self.loads),
+                "unloads": dict(self.unloads),
+                "preloads": dict(self.preloads),
+                "cold_start_s": {name: round(sum(seconds) / len(seconds), 2)
+                                 for name, seconds in self.cold_start_seconds.items()},
+            }
+
+
+# Shared by every LocalModel
+residency_manager = ResidencyManager()
+
+
+if __name__ == '__main__':
+    residency_manager.sync()
+    print(residency_manager.stats())
@@ -0,0 +1,187 @@
+"""
+Turns a classified prompt into an answer.
+
+Modes (set with the RESPONSE_PIPELINE_MODE environment variable or per pipeline):
+- "refine":    the base model drafts an answer and the best model rewrites it (the original flow).
+- "skip_easy": like "refine", but prompts the LLM classifier rated difficulty 1 are answered by the
+               draft alone, skipping the second model call. The fast local classifier's difficulty
+               is only a keyword guess and never skips refinement.
+- "race":      the base model's draft and the best model's direct answer run at the same time and
+               whichever finishes first is used.
+
+Every run records how long each stage took. While the base model drafts, the refinement model is
+preloaded if it runs locally, so its weights are in memory by the time the draft is done.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from ResidencyManager import residency_manager
+
+PIPELINE_MODES = ("refine", "skip_easy", "race")
+DEFAULT_MODE = os.getenv("RESPONSE_PIPELINE_MODE", "refine")
+
+REFINE_SYSTEM_MESSAGE = "YOU ARE AN AI THAT ANALYZES OUTPUTS FROM OTHER AI. Only output the improved response. Keep the response to a maximum of three sentences"
+
+
+def refine_prompt(prompt, response):
+    return "Below is the original prompt" + prompt + "Below is the old models response" + response
+
+
+class StageTimings:
+    """Wall-clock time per stage of one turn, in the order the stages ran."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return sum(self.stages.values())
+
+    def __str__(self):
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.stages.items()]
+        return " | ".join(parts + [f"total {self.total():.2f}s"])
+
+    def report(self):
+        print(f"Stage timings: {self}")
+
+
+class ResponsePipeline:
+    def __init__(self, base_model, mode=DEFAULT_MODE, refine_system_message=REFINE_SYSTEM_MESSAGE):
+        if mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode {mode!r}. Choose from {PIPELINE_MODES}")
+        self.base_model = base_model
+        self.mode = mode
+        self.refine_system_message = refine_system_message
+
+    def _skips_refinement(self, prompt_classification):
+        return (self.mode == "skip_easy" and prompt_classification.difficulty == 1
+                and not prompt_classification.estimated_difficulty)
+
+    def _preload_refinement(self, model, prompt_classification):
+        if model is not self.base_model and not self._skips_refinement(prompt_classification):
+            residency_manager.preload(model)
+
+    def run(self, prompt, prompt_classification, best_models, timings=None):
+        """Returns (response text, model that produced it, StageTimings)."""
+        timings = timings if timings is not None else StageTimings()
+        model = best_models[0]
+
+        if self.mode == "race":
+            return self._race(prompt, model, timings) + (timings,)
+
+        self._preload_refinement(model, prompt_classification)
+        with timings.stage("draft"):
+            draft = self.base_model.chat(prompt=prompt)
+
+        if self._skips_refinement(prompt_classification):
+            return draft, self.base_model, timings
+
+        with timings.stage("refine"):
+            response = model.chat(prompt=refine_prompt(prompt, draft), system_message=self.refine_system_message)
+        return response, model, timings
+
+    def _race(self, prompt, model, timings):
+        executor = ThreadPoolExecutor(max_workers=2)
+        with timings.stage("race"):
+            contenders = {
+                executor.submit(self.base_model.chat, prompt=prompt): self.base_model,
+                executor.submit(model.chat, prompt=prompt): model,
+            }
+            # A contender that fails doesn't win; wait for the other one instead
+            pending, failed, winner = set(contenders), [], None
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                winner = next((future for future in done if future.exception() is None), None)
+                failed += [future for future in done if future.exception() is not None]
+        # The slower request can't be interrupted; let it finish in the background
+        executor.shutdown(wait=False)
+
+        for future in failed:
+            print(f"Race: {contenders[future]} failed ({future.exception()})")
+        if winner is None:
+            raise failed[0].exception()
+        print(f"Race won by {contenders[winner]}")
+        return winner.result(), contenders[winner]
+
+    async def arun(self, prompt, prompt_classification, best_models, timings=None):
+        """Async version of run() for the ASGI chat views."""
+        timings = timings if timings is not None else StageTimings()
+        model = best_models[0]
+
+        if self.mode == "race":
+            with timings.stage("race"):
+                response, winner = await self._arace(prompt, model)
+            return response, winner, timings
+
+        self._preload_refinement(model, prompt_classification)
+        with timings.stage("draft"):
+            draft = await self.base_model.achat(prompt=prompt)
+
+        if self._skips_refinement(prompt_classification):
+            return draft, self.base_model, timings
+
+        with timings.stage("refine"):
+            response = await model.achat(prompt=refine_prompt(prompt, draft), system_message=self.refine_system_message)
+        return response, model, timings
+
+    async def _arace(self, prompt, model):
+        contenders = {
+            asyncio.ensure_future(self.base_model.achat(prompt=prompt)): self.base_model,
+            asyncio.ensure_future(model.achat(prompt=prompt)): model,
+        }
+        # A contender that fails doesn't win; wait for the other one instead
+        pending, failed, winner = set(contenders), [], None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            failed += [task for task in done if task.exception() is not None]
+        for task in pending:
+            task.cancel()
+
+        for task in failed:
+            print(f"Race: {contenders[task]} failed ({task.exception()})")
+        if winner is None:
+            raise failed[0].exception()
+        print(f"Race won by {contenders[winner]}")
+        return winner.result(), contenders[winner]
+
+    async def astream(self, prompt, prompt_classification, best_models, timings=None):
+        """
+        Streams the answer. Yields ("model", name) once the answering model is known,
+        then ("token", text) for each chunk.
+        """
+        timings = timings if timings is not None else StageTimings()
+        model = best_models[0]
+
+        if self.mode == "race":
+            with timings.stage("race"):
+                response, winner = await self._arace(prompt, model)
+            yield "model", winner.name
+            yield "token", response
+            return
+
+        if self._skips_refinement(prompt_classification):
+            yield "model", self.base_model.name
+            with timings.stage("draft"):
+                async for chunk in self.base_model.achat_stream(prompt=prompt):
+                    yield "token", chunk
+            return
+
+        yield "model", model.name
+        self._preload_refinement(model, prompt_classification)
+        with timings.stage("draft"):
+            draft = await self.base_model.achat(prompt=prompt)
+
+        with timings.stage("refine"):
+            async for chunk in model.achat_stream(prompt=refine_prompt(prompt, draft), system_message=self.refine_system_message):
+                yield "token", chunk
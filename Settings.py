@@ -3,17 +3,14 @@ import os
 import re
 
 import psutil
-import GPUtil
-import whisper
 from word2number import w2n
 
 from TextToSpeech import play_tts
-from AudioRecording import record_audio
-from SpeechToText import transcribe_audio
+from SpeechToText import transcribe_streaming
+from WhisperRegistry import get_whisper_model
 
 
 SETTINGS_FILE = "settings.json"
-whisper_model = whisper.load_model("small")  # Preload the Whisper model
 
 class Settings:
     def __init__(self, user_vram=None, use_internet=None, api_cost_tolerance=None):
@@ -28,6 +25,7 @@ class Settings:
 def detect_system_vram():
     """Automatically detects the system's VRAM."""
     try:
+        import GPUtil
         gpus = GPUtil.getGPUs()
         if gpus:
             # TODO: Rounding weirdness. Maybe a more accurate way to handle this
@@ -57,10 +55,8 @@ def normalize_response(text):
 def ask_yes_no(question):
     """Asks a Yes/No question and returns True for 'Yes' and False for 'No'."""
     while True:
-        play_tts(question, speaker="p251", speed=1, pitch=0)  # Ask via TTS
-        temp_filename = "tmp/temp_response.wav"
-        record_audio(temp_filename)  # Now stops recording automatically
-        response_text = transcribe_audio(temp_filename)
+        play_tts(question, speaker="p251", speed=1, pitch=0, cache_phrase=True)  # Ask via TTS
+        response_text = transcribe_streaming()  # Stops automatically and transcribes while recording
 
         print(f"Raw Transcribed Response: {response_text}")
         response_text = normalize_response(response_text)
@@ -70,15 +66,13 @@ def ask_yes_no(question):
         elif response_text == "no":
             return False
         else:
-            play_tts("Please say yes or no.", speaker="p251", speed=1, pitch=0)
+            play_tts("Please say yes or no.", speaker="p251", speed=1, pitch=0, cache_phrase=True)
 
 def ask_number(question, min_val, max_val):
     """Asks for a number within a range and ensures valid input."""
     while True:
-        play_tts(question, speaker="p251", speed=1, pitch=0)
-        temp_filename = "tmp/temp_response.wav"
-        record_audio(temp_filename)  # Now stops recording automatically
-        response_text = transcribe_audio(temp_filename)
+        play_tts(question, speaker="p251", speed=1, pitch=0, cache_phrase=True)
+        response_text = transcribe_streaming()  # Stops automatically and transcribes while recording
 
         print(f"Raw Transcribed Response: {response_text}")
         response_text = normalize_response(response_text)
@@ -88,12 +82,20 @@ def ask_number(question, min_val, max_val):
             if min_val <= value <= max_val:
                 return value
             else:
-                play_tts(f"Please enter a number between {min_val} and {max_val}.", speaker="p251", speed=1, pitch=0)
+                play_tts(f"Please enter a number between {min_val} and {max_val}.", speaker="p251", speed=1, pitch=0, cache_phrase=True)
         except ValueError:
-            play_tts("Please say a valid number.", speaker="p251", speed=1, pitch=0)
+            play_tts("Please say a valid number.", speaker="p251", speed=1, pitch=0, cache_phrase=True)
 
-def load_settings():
-    """Loads settings.json using regex, ensures correct data types, and returns a Settings object."""
+class SettingsMissingError(RuntimeError):
+    """settings.json is missing or unreadable and the caller can't run the spoken setup."""
+
+
+def load_settings(interactive=True):
+    """
+    Loads settings.json using regex, ensures correct data types, and returns a Settings object.
+    Without the file, the setup wizard asks for the settings, or with `interactive=False`
+    a SettingsMissingError is raised instead.
+    """
     if os.path.exists(SETTINGS_FILE):
         try:
             with open(SETTINGS_FILE, "r") as file:
@@ -117,19 +119,28 @@ def load_settings():
                     api_cost_tolerance=int(settings_dict.get("api_cost_tolerance", 0))  # Ensure it's an int
                 )
             except (json.JSONDecodeError, ValueError):
+                if not interactive:
+                    raise SettingsMissingError(f"Could not parse {SETTINGS_FILE}. Run the setup (python Settings.py) again.")
                 print("Error: Could not parse JSON. Using default values.")
                 return ask_user_for_settings()
 
         except FileNotFoundError:
+            if not interactive:
+                raise SettingsMissingError(f"No {SETTINGS_FILE} found. Run the setup (python Settings.py) first.")
             print("settings.json not found. Running initial setup.")
             return ask_user_for_settings()
 
     else:
+        if not interactive:
+            raise SettingsMissingError(f"No {SETTINGS_FILE} found. Run the setup (python Settings.py) first.")
         print("\n No settings file found. Running initial setup...")
         return ask_user_for_settings()
 
 def ask_user_for_settings():
     """Asks user for settings and saves them to a file."""
+    # Load the shared Whisper model once up front; every answer below reuses it
+    get_whisper_model()
+
     # First question (use a valid string to pass to the TTS function)
     question = "Would you like to use internet-based models? (Yes/No): "
     use_internet = ask_yes_no(question)  # Pass the actual question
@@ -154,7 +165,23 @@ def save_settings(settings):
             "api_cost_tolerance": settings.api_cost_tolerance
         }, file, indent=4)  # TODO: Fix warning
     print(f"\n Settings saved to {SETTINGS_FILE}")
-    play_tts("Awesome, I have saved your settings", speaker="p251", speed=1, pitch=0)
+    play_tts("Awesome, I have saved your settings", speaker="p251", speed=1, pitch=0, cache_phrase=True)
+
+_user_settings = None
+
+
+def get_user_settings(interactive=True):
+    """
+    Loads the settings the first time they are needed and reuses them afterwards.
+    Modules call this instead of load_settings() at import time, so importing them
+    never starts the setup wizard. Servers pass `interactive=False` (see load_settings).
+    """
+    global _user_settings
+    if _user_settings is None:
+        _user_settings = load_settings(interactive)
+        print(f"Using settings: user_vram={_user_settings.user_vram}, use_internet={_user_settings.use_internet}, api_cost_tolerance={_user_settings.api_cost_tolerance}")
+    return _user_settings
+
 
 def format_settings_for_model_picker():
     """Formats settings into a ModelPicker-compatible string."""
@@ -162,7 +189,7 @@ def format_settings_for_model_picker():
     settings_string = f"user_settings = Settings(user_vram={settings.user_vram}, use_internet={settings.use_internet}, api_cost_tolerance={settings.api_cost_tolerance})"
     print(settings_string)
 
-    play_tts("Hold on for one second, .. I am loading your settings", speaker="p251", speed=1, pitch=0)
+    play_tts("Hold on for one second, .. I am loading your settings", speaker="p251", speed=1, pitch=0, cache_phrase=True)
 
     return settings_string  # Can be written to a file if needed
 
@@ -1,18 +1,171 @@
-import whisper
+import threading
+
+import numpy as np
+
 from AudioRecording import record_audio
+from WhisperRegistry import get_whisper_model, whisper_registry
+
+WHISPER_SAMPLE_RATE = 16000
 
 
 def transcribe_audio(file_path: str, model: str = "small"):
-    model = whisper.load_model(model)
-    result = model.transcribe(file_path)
+    whisper_model = get_whisper_model(model)
+    result = whisper_model.transcribe(file_path)
 
     return result["text"]
 
 
+def resample(audio, orig_sr, target_sr=WHISPER_SAMPLE_RATE):
+    """Resamples mono audio with linear interpolation. Good enough for speech going into Whisper."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio
+
+    target_length = int(round(len(audio) * target_sr / orig_sr))
+    old_positions = np.arange(len(audio)) / orig_sr
+    new_positions = np.arange(target_length) / target_sr
+    return np.interp(new_positions, old_positions, audio).astype(np.float32)
+
+
+class StreamingTranscriber:
+    """
+    Transcribes audio while it is still being recorded.
+
+    Chunks from the `sd.InputStream` callback are passed to `feed()`. A worker thread
+    re-transcribes the uncommitted part of the buffer every `partial_interval` seconds and
+    reports the partial hypothesis through `on_partial`. Segments that end more than
+    `commit_margin` seconds before the end of the buffer are treated as stable: their text is
+    committed and their audio dropped, so `finish()` only has to decode the last few seconds.
+    """
+
+    def __init__(self, samplerate=44100, model="small", partial_interval=1.0, commit_margin=1.0,
+                 min_audio_duration=0.5, on_partial=None):
+        self.samplerate = samplerate
+        self.model_name = model
+        self.partial_interval = partial_interval
+        self.commit_margin = commit_margin
+        self.min_audio_duration = min_audio_duration
+        self.on_partial = on_partial
+
+        self.partial_text = ""
+        self.decode_count = 0
+
+        self._model = None
+        self._pending = []  # raw chunks from the audio thread
+        self._pending_lock = threading.Lock()
+        self._audio = np.zeros(0, dtype=np.float32)  # uncommitted 16 kHz audio
+        self._committed = []  # text of stable segments
+        self._decoded_length = 0
+        self._stop = threading.Event()
+        self._worker = None
+
+    def start(self):
+        self._model = get_whisper_model(self.model_name)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        return self
+
+    def feed(self, chunk):
+        """Queues a block of recorded audio. Safe to call from the audio callback."""
+        with self._pending_lock:
+            self._pending.append(chunk)
+
+    def _drain(self):
+        with self._pending_lock:
+            chunks, self._pending = self._pending, []
+        if not chunks:
+            return
+
+        audio = np.concatenate(chunks, axis=0)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        self._audio = np.concatenate([self._audio, resample(audio, self.samplerate)])
+
+    def _decode(self, audio):
+        self.decode_count += 1
+        return self._model.transcribe(
+            audio,
+            fp16=self._model.device.type == "cuda",
+            condition_on_previous_text=False,
+            initial_prompt=" ".join(self._committed)[-200:] or None,
+        )
+
+    def _run(self):
+        while not self._stop.wait(self.partial_interval):
+            self._drain()
+
+            duration = len(self._audio) / WHISPER_SAMPLE_RATE
+            if duration < self.min_audio_duration or len(self._audio) == self._decoded_length:
+                continue
+
+            result = self._decode(self._audio)
+            self._decoded_length = len(self._audio)
+
+            # Commit every segment that finished well before the end of the buffer
+            stable_end = 0.0
+            pending_text = []
+            for segment in result["segments"]:
+                if segment["end"] < duration - self.commit_margin:
+                    self._committed.append(segment["text"].strip())
+                    stable_end = segment["end"]
+                else:
+                    pending_text.append(segment["text"].strip())
+
+            if stable_end > 0:
+                self._audio = self._audio[int(stable_end * WHISPER_SAMPLE_RATE):]
+                self._decoded_length = len(self._audio)
+
+            self.partial_text = " ".join(self._committed + pending_text)
+            if self.on_partial is not None:
+                self.on_partial(self.partial_text)
+
+    def finish(self, trim_tail=0.0):
+        """
+        Stops the worker and returns the final transcript.
+
+        `trim_tail` drops that many seconds from the end of the buffer before the last decode,
+        e.g. the silence the recorder waited through before it stopped.
+        """
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
+        self._drain()
+
+        tail = self._audio
+        if trim_tail > 0:
+            tail = tail[:max(0, len(tail) - int(trim_tail * WHISPER_SAMPLE_RATE))]
+
+        text_parts = list(self._committed)
+        if len(tail) / WHISPER_SAMPLE_RATE >= self.min_audio_duration:
+            text_parts.append(self._decode(tail)["text"].strip())
+
+        self.partial_text = " ".join(part for part in text_parts if part)
+        return self.partial_text
+
+
+def transcribe_streaming(model: str = "small", on_partial=None, samplerate=44100, long_silence_duration=2.5, **record_kwargs):
+    """
+    Records from the microphone and transcribes at the same time.
+
+    Partial hypotheses are passed to `on_partial` while the user is talking, and the final
+    transcript is returned as soon as the silence detector stops the recording. Nothing is
+    written to disk.
+    """
+    transcriber = StreamingTranscriber(samplerate=samplerate, model=model, on_partial=on_partial).start()
+    record_audio(filename=None, samplerate=samplerate, long_silence_duration=long_silence_duration,
+                 on_chunk=transcriber.feed, **record_kwargs)
+
+    # Keep half a second of the trailing silence so the last word isn't clipped
+    return transcriber.finish(trim_tail=max(0.0, long_silence_duration - 0.5))
+
+
+def print_partial(text):
+    print(f"\n... {text}", end="\r")
+
 
 if __name__ == '__main__':
 
-    record_audio()
-    print(transcribe_audio("output.mp3"))
+    print(transcribe_streaming(on_partial=print_partial))
+    print(whisper_registry.stats())
 
 
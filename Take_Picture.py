@@ -1,30 +1,8 @@
-import time
-import cv2
+from CaptureService import get_capture_service
 
 def capture_image(save_path="captured_image.jpg"):
-    # Initialize the webcam (webcam ID=0 is typically the default device)
-    cap = cv2.VideoCapture(0)
-
-    # Check if the camera opened successfully
-    if not cap.isOpened():
-        print("Error: Could not open webcam.")
-        return
-
-    # Give the camera a moment to warm up (optional)
-    time.sleep(2)
-
-    # Read a frame from the camera
-    ret, frame = cap.read()
-
-    if ret:
-        # Save the captured frame to a file
-        cv2.imwrite(save_path, frame)
-        print(f"Image saved as {save_path}")
-    else:
-        print("Failed to capture image")
-
-    # Release the camera
-    cap.release()
+    # The capture service keeps the webcam open, so this returns as soon as there's a good frame
+    return get_capture_service().capture(save_path)
 
 if __name__ == '__main__':
     capture_image()
@@ -0,0 +1,167 @@
+"""
+Measured model speed, so the picker knows how fast each model really is on this machine.
+
+Every model call records time-to-first-token, tokens per second and total latency. Each metric
+is kept as an exponentially weighted moving average per (model, hardware, call kind), so recent
+calls count most and one slow cold start fades out. The kinds are kept apart because they take
+very different times: "chat" is a full answer, "complete" a short structured reply such as a
+classification. Local models are keyed on this machine's CPU and GPU; API models share the "api"
+key. The averages are saved to TELEMETRY_PATH and loaded on first use, so they survive restarts.
+
+Models that haven't been measured yet are estimated from their catalogue speed score
+(catalogue_latency), so the picker always compares seconds with seconds.
+
+Show what has been measured with:
+    python Telemetry.py
+"""
+import atexit
+import json
+import os
+import platform
+import threading
+import time
+from functools import lru_cache
+
+TELEMETRY_PATH = "tmp/model_telemetry.json"
+EWMA_ALPHA = 0.2  # Weight of the newest sample
+SAVE_INTERVAL = 5.0  # Seconds between writes to disk
+
+API_HARDWARE = "api"
+METRICS = ("ttft", "tokens_per_second", "latency")
+CALL_KINDS = ("chat", "complete")
+
+# Seconds per full answer assumed for the catalogue's response_speed scores, which grow with how
+# long a model takes: 0 (API models) to 10 (deepseek-r1:671b)
+FASTEST_ANSWER_SECONDS = 1.5
+SLOWEST_ANSWER_SECONDS = 30.0
+
+
+@lru_cache(maxsize=None)
+def local_hardware():
+    """Identifies the hardware local models run on, e.g. "x86_64|NVIDIA GeForce RTX 3080"."""
+    try:
+        import GPUtil
+        gpus = GPUtil.getGPUs()
+        accelerator = gpus[0].name if gpus else "cpu"
+    except Exception:
+        accelerator = "cpu"
+    return f"{platform.machine()}|{accelerator}"
+
+
+def catalogue_latency(speed):
+    """Rough seconds per full answer for a catalogue response_speed score (higher is slower), on a log scale."""
+    speed = min(max(speed, 0), 10)
+    return FASTEST_ANSWER_SECONDS * (SLOWEST_ANSWER_SECONDS / FASTEST_ANSWER_SECONDS) ** (speed / 10)
+
+
+class CallTimer:
+    """Times one model call. Call token() as chunks arrive (streaming) and finish() at the end."""
+
+    def __init__(self, telemetry, model_name, hardware, kind):
+        self.telemetry = telemetry
+        self.model_name = model_name
+        self.hardware = hardware
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.tokens = 0
+
+    def token(self, count=1):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.tokens += count
+
+    def finish(self, tokens=None):
+        latency = time.perf_counter() - self.start
+        tokens = self.tokens if tokens is None else tokens
+        # Without streaming the first token arrives with the rest of the response
+        ttft = self.first_token - self.start if self.first_token is not None else latency
+        generation_time = latency - ttft if self.first_token is not None else latency
+        tokens_per_second = tokens / generation_time if tokens and generation_time > 0 else None
+        self.telemetry.record(self.model_name, self.hardware, self.kind, ttft=ttft, latency=latency,
+                              tokens_per_second=tokens_per_second)
+
+
+class ModelTelemetry:
+    def __init__(self, path=TELEMETRY_PATH, alpha=EWMA_ALPHA):
+        self.path = path
+        self.alpha = alpha
+        self._stats = None  # Loaded on first use
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._dirty = False
+
+    @staticmethod
+    def _key(model_name, hardware, kind):
+        if kind not in CALL_KINDS:
+            raise ValueError(f"Unknown call kind {kind!r}. Choose from {CALL_KINDS}")
+        return f"{model_name}@{hardware}:{kind}"
+
+    def _load(self):
+        if self._stats is None:
+            try:
+                with open(self.path, encoding="utf-8") as file:
+                    self._stats = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._stats = {}
+        return self._stats
+
+    def timer(self, model_name, hardware, kind="chat"):
+        return CallTimer(self, model_name, hardware, kind)
+
+    def record(self, model_name, hardware, kind, **samples):
+        """Folds one call's samples (ttft, tokens_per_second, latency; None to skip) into the averages."""
+        key = self._key(model_name, hardware, kind)
+        with self._lock:
+            stats = self._load().setdefault(key, {"calls": 0})
+            stats["calls"] += 1
+            for metric, value in samples.items():
+                if value is None:
+                    continue
+                previous = stats.get(metric)
+                stats[metric] = value if previous is None else self.alpha * value + (1 - self.alpha) * previous
+            stats["updated"] = time.time()
+            self._dirty = True
+
+            if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                self._save()
+
+    def get(self, model_name, hardware, metric, kind="chat"):
+        """The moving average of `metric` for `kind` calls, or None if the model hasn't been measured here."""
+        key = self._key(model_name, hardware, kind)
+        with self._lock:
+            return self._load().get(key, {}).get(metric)
+
+    def _save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self._stats, file, indent=2)
+        os.replace(temporary_path, self.path)
+        self._last_save = time.monotonic()
+        self._dirty = False
+
+    def save(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def report(self):
+        with self._lock:
+            stats = dict(self._load())
+        if not stats:
+            print("No model calls measured yet")
+        for key, entry in sorted(stats.items()):
+            tokens_per_second = entry.get("tokens_per_second")
+            print(f"{key}: {entry['calls']} calls, latency {entry.get('latency', 0):.2f}s, "
+                  f"first token {entry.get('ttft', 0):.2f}s, "
+                  f"{f'{tokens_per_second:.1f} tokens/s' if tokens_per_second else 'tokens/s unknown'}")
+
+
+model_telemetry = ModelTelemetry()
+atexit.register(model_telemetry.save)
+
+
+if __name__ == '__main__':
+    model_telemetry.report()
@@ -1,18 +1,31 @@
-import torch
-import librosa
-import sounddevice as sd
+import queue
+import re
+import threading
+import time
+from collections import deque
+
 import numpy as np
-from TTS.api import TTS
 
-# Select device (use GPU if available)
-device = "cuda" if torch.cuda.is_available() else "cpu"
+from AudioEffects import shift_pitch, DEFAULT_MODE
+from PhraseCache import phrase_cache
 
-# Load VITS (VCTK) locally for multi-speaker support
-tts = TTS("tts_models/en/vctk/vits").to(device)
+# VITS (VCTK) runs locally for multi-speaker support
+TTS_MODEL_NAME = "tts_models/en/vctk/vits"
 
+_tts = None
+_tts_lock = threading.Lock()
+
+SAMPLE_RATE = 22050
+
+# "balanced" (WSOLA) or "quality" (librosa). See AudioEffects.
+PITCH_SHIFT_MODE = DEFAULT_MODE
+
+# Cached audio depends on the pitch shift implementation as well as the TTS model
+CACHE_VOICE_ID = f"{TTS_MODEL_NAME}|pitch:{PITCH_SHIFT_MODE}"
+
+# Seconds from play_tts being called until the first sample reaches the sound card
+time_to_first_audio = deque(maxlen=100)
 
-import numpy as np
-import sounddevice as sd
 
 # def play_tts(text, speaker="p251", speed=1, pitch=0):
 #     wav = some_tts_function(text, speaker, speed, pitch)  # Your TTS model output
@@ -26,21 +39,136 @@ import sounddevice as sd
 #     sd.play(wav, samplerate=22050)
 #     sd.wait()
 
-def play_tts(text, speaker="p227", speed=1.0, pitch=-1):
-    print(f"Generating speech... Speaker: {speaker}, Speed: {speed}, Pitch: {pitch}")
+def get_tts():
+    """Loads the VITS model on first use (on the GPU if available) and reuses it afterwards."""
+    global _tts
+    with _tts_lock:
+        if _tts is None:
+            import torch
+            from TTS.api import TTS
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            _tts = TTS(TTS_MODEL_NAME).to(device)
+    return _tts
+
 
+def split_sentences(text):
+    """Splits text into sentences so each one can be synthesized and played separately."""
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return [sentence for sentence in sentences if re.search(r"\w", sentence)]
+
+
+def synthesize(text, speaker="p227", speed=1.0, pitch=-1):
+    """Synthesizes one piece of text and returns it as a float32 NumPy array."""
     # Generate speech with VITS
-    wav = tts.tts(text=text, speaker=speaker, speed=speed)
+    wav = get_tts().tts(text=text, speaker=speaker, speed=speed)
 
     # Convert to NumPy array
     wav_np = np.array(wav, dtype=np.float32)
 
-    # Apply pitch shift using librosa
-    wav_shifted = librosa.effects.pitch_shift(wav_np, sr=22050, n_steps=pitch)
+    # Apply pitch shift (returns the audio untouched when pitch is 0)
+    return shift_pitch(wav_np, SAMPLE_RATE, pitch, mode=PITCH_SHIFT_MODE)
+
+
+def render(text, speaker="p227", speed=1.0, pitch=-1):
+    """Synthesizes all of `text` the same way play_tts would and returns the audio."""
+    chunks = [synthesize(sentence, speaker=speaker, speed=speed, pitch=pitch) for sentence in split_sentences(text)]
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+
+
+def play_cached(wav, start):
+    """Plays a cached (memory-mapped) phrase straight from disk."""
+    import sounddevice as sd
+
+    with sd.OutputStream(samplerate=SAMPLE_RATE, channels=1, dtype="float32") as stream:
+        time_to_first_audio.append(time.perf_counter() - start)
+        print(f"Time to first audio: {time_to_first_audio[-1]:.2f}s (cached)")
+        stream.write(wav.reshape(-1, 1))
+
+
+def play_tts(text, speaker="p227", speed=1.0, pitch=-1, cache_phrase=False):
+    """
+    Speaks `text` sentence by sentence.
+
+    A worker thread synthesizes the next sentence while the current one is playing through a
+    single continuous output stream, so the user hears the first sentence as soon as it is ready.
+    Phrases in the on-disk phrase cache are played from it. Only fixed phrases should be saved to
+    it (`cache_phrase=True`); one-off model answers would push them out.
+    """
+    import sounddevice as sd
+
+    start = time.perf_counter()
+
+    cached = phrase_cache.get(text, speaker, speed, pitch, CACHE_VOICE_ID)
+    if cached is not None:
+        play_cached(cached, start)
+        return
+
+    print(f"Generating speech... Speaker: {speaker}, Speed: {speed}, Pitch: {pitch}")
+    sentences = split_sentences(text)
+    if not sentences:
+        return
+
+    chunks = queue.Queue(maxsize=2)  # Stay at most a couple of sentences ahead of playback
+    stop = threading.Event()  # Set when playback ends early, so the worker doesn't wait on a full queue
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for sentence in sentences:
+                if stop.is_set() or not put(synthesize(sentence, speaker=speaker, speed=speed, pitch=pitch)):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+
+    played = []
+    try:
+        with sd.OutputStream(samplerate=SAMPLE_RATE, channels=1, dtype="float32") as stream:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                if not played:
+                    time_to_first_audio.append(time.perf_counter() - start)
+                    print(f"Time to first audio: {time_to_first_audio[-1]:.2f}s ({len(sentences)} sentences)")
+
+                stream.write(chunk.reshape(-1, 1))
+                played.append(chunk)
+    finally:
+        stop.set()
+
+    worker.join()
+
+    if cache_phrase:
+        phrase_cache.put(text, speaker, speed, pitch, CACHE_VOICE_ID, np.concatenate(played))
+
 
-    # Play the modified audio
-    sd.play(wav_shifted, samplerate=22050)
-    sd.wait()
+def tts_stats():
+    """Returns time-to-first-audio metrics for recent play_tts calls."""
+    if not time_to_first_audio:
+        return {"calls": 0}
+    return {
+        "calls": len(time_to_first_audio),
+        "last_time_to_first_audio_s": round(time_to_first_audio[-1], 3),
+        "mean_time_to_first_audio_s": round(float(np.mean(time_to_first_audio)), 3),
+        "phrase_cache": phrase_cache.stats(),
+    }
 
    # play_tts("speak_text", speaker="p251", speed=1, pitch=0)
 # Test robotic deep voice
@@ -1,66 +1,70 @@
-import base64
-import openai
-import os
+from dataclasses import replace
 
-
-from Model import Model, LocalModel, _available_models, OnlineModel, deepseek_r1_1_5, gpt4_vision, o3mini, gptturbo
+from CaptureService import get_capture_service
+from ImagePipeline import LOCAL_MAX_SIDE, image_stats, prepare_image
+from Model import (Model, LocalModel, _available_models, _vision_only_models, OnlineModel, deepseek_r1_1_5, gpt4_vision, o3mini,
+                   gptturbo, gpt4o, llama3_2_vision)
 from ModelPicker import pick_model
-from Take_Picture import capture_image
-from dotenv import load_dotenv
-
-
-
-
-# Function to encode the image
-def UseVision(prompt, prompt_classification):
-
-    # Function to encode the image
-    capture_image()
-
-
-    # Now you can proceed with the OpenAI API client initialization
-    client = openai.OpenAI()
-    print(client)
-
-
-    load_dotenv("secrets.env")
-
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-
-
-
-
-    def encode_image(image_path):
-        """Encodes an image to base64 format."""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
-
-
-    # Prepare the image
-    image_path = 'C:/Users/liamt/PycharmProjects/CapstoneProject/captured_image.jpg'
-    base64_image = encode_image(image_path)
-
-    # Call the vision model
-    response = client.chat.completions.create(
-        model="gpt-4o",  # Ensure this matches your vision model
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ],
-            }
-        ],
-        max_tokens=300
-    )
-
-    print(response.choices[0].message.content)
-
-
-    # vision_model = pick_model(available_models=_available_models, prompt_classification=prompt_classification)[0]
\ No newline at end of file
+from Settings import get_user_settings
+
+VISION_MAX_TOKENS = 300
+VISION_CATALOGUE = _available_models + _vision_only_models
+
+# Used when no vision model fits the settings: the local one (Ollama runs what doesn't fit in VRAM
+# on the CPU, slowly) when offline, else gpt-4o, which UseVision always called before it used pick_model
+OFFLINE_VISION_FALLBACK = llama3_2_vision
+ONLINE_VISION_FALLBACK = gpt4o
+
+
+def pick_vision_model(prompt_classification):
+    """
+    The vision model pick_model chooses within the user's settings. If none fits them, the
+    fallback for the user's internet setting, so a photo is never sent to a text-only model.
+    """
+    prompt_classification = replace(prompt_classification, requires_vision=True)
+    best_models = pick_model(available_models=VISION_CATALOGUE, prompt_classification=prompt_classification)
+    vision_models = [model for model in best_models if model.vision_model]
+    if vision_models:
+        return vision_models[0]
+
+    fallback = ONLINE_VISION_FALLBACK if get_user_settings().use_internet else OFFLINE_VISION_FALLBACK
+    print(f"No vision model fits the current settings, using {fallback}")
+    return fallback
+
+
+def prepare_for_model(frame, model, detail="high"):
+    """Encodes a frame at the size `model` will actually use."""
+    if isinstance(model, LocalModel):
+        return prepare_image(frame, max_long_side=LOCAL_MAX_SIDE, max_short_side=LOCAL_MAX_SIDE)
+    return prepare_image(frame, detail=detail)
+
+
+def UseVision(prompt, prompt_classification, detail="high", model=None):
+    """
+    Takes a picture and asks a vision model about it. The model is picked like any other
+    (local when offline, the strongest one within the API cost tolerance when online, see
+    pick_vision_model for when none fits) unless one is passed in. The frame goes straight from the capture service to the upload, resized
+    and encoded once in memory, without a round trip through disk.
+    """
+    if model is None:
+        model = pick_vision_model(prompt_classification)
+
+    try:
+        frame = get_capture_service().best_frame()
+    except RuntimeError as e:  # No camera could be opened
+        print(f"Error: {e}")
+        frame = None
+    if frame is None:
+        print("Error: Could not capture an image.")
+        return None
+
+    image = prepare_for_model(frame.image, model, detail)
+    print(f"Sending {image.width}x{image.height} {image.mime_type}, {len(image.data) / 1024:.0f}KB to {model}, "
+          f"encoded in {image.encode_seconds * 1000:.1f}ms")
+
+    completion = model.complete(prompt, image=image, max_tokens=VISION_MAX_TOKENS)
+
+    print(completion.text)
+    print(f"Prompt tokens: {completion.prompt_tokens}, {image_stats}")
+
+    return completion.text
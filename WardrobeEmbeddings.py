@@ -0,0 +1,356 @@
+"""
+Local embedding index over the wardrobe: similar items, duplicate detection and outfit candidates
+without an API call.
+
+Each item gets one vector made of two unit-length parts:
+- text: signed feature hashing of the description's words and word pairs (TEXT_DIM),
+- image: a smoothed hue/saturation histogram, a brightness histogram and a tiny greyscale layout
+  thumbnail (IMAGE_DIM),
+weighted by TEXT_WEIGHT and IMAGE_WEIGHT so the whole vector is unit length too. Scores are cosine
+similarities; a query with only an image (or only text) part compares just that part.
+
+Two items are taken for duplicates only when both parts agree (find_duplicates): pictures alone
+can't tell a black shirt from a grey one in the same pose, or two different red t-shirts apart.
+
+These encoders need nothing beyond numpy and OpenCV and run in about a millisecond on a CPU.
+They recognise the same garment photographed twice and descriptions that share vocabulary, not
+semantics the way a neural encoder would.
+
+Vectors live in a memory-mapped array next to the database (fashion.db.vectors, as float32 or
+int8 with VECTOR_DTYPE), with the item IDs in fashion.db.ids and the row count in
+fashion.db.vectors.json. Search is a flat scan, or an IVF index (spherical k-means lists, NPROBE
+of them scanned per query) once there are IVF_MIN_ITEMS items. Rows added after the IVF index was
+trained are scanned flat until it's retrained.
+
+Usage (from the repository root):
+    python WardrobeEmbeddings.py rebuild | stats
+"""
+import json
+import os
+import sys
+import zlib
+
+import cv2
+import numpy as np
+
+from FastClassifier import tokenize
+from ImageStore import THUMB_SIDE, get_image_store
+
+EMBEDDING_VERSION = 2  # Bump when the encoders change; stored vectors are then rebuilt
+
+TEXT_DIM = 256
+HISTOGRAM_BINS = (16, 8)  # Hue and saturation
+NEUTRAL_SATURATION = 16  # Below this a pixel is grey/black/white and its (noisy) hue is ignored
+BRIGHTNESS_BINS = 16
+LAYOUT_SIDE = 8
+IMAGE_DIM = int(np.prod(HISTOGRAM_BINS)) + BRIGHTNESS_BINS + LAYOUT_SIDE * LAYOUT_SIDE
+DIM = TEXT_DIM + IMAGE_DIM
+
+TEXT_WEIGHT = 0.6
+IMAGE_WEIGHT = 0.8  # TEXT_WEIGHT ** 2 + IMAGE_WEIGHT ** 2 == 1
+# Within the image part; the squares (each part's share of the image similarity) add up to 1
+COLOUR_WEIGHT = 0.67
+BRIGHTNESS_WEIGHT = 0.55
+LAYOUT_WEIGHT = 0.5
+
+VECTOR_DTYPE = os.getenv("WARDROBE_VECTOR_DTYPE", "float32")  # "float32" or "int8" (4x smaller)
+INT8_SCALE = 127.0
+
+DUPLICATE_THRESHOLD = 0.95  # Image similarity above which two pictures may be of the same item
+TEXT_DUPLICATE_THRESHOLD = 0.4  # Description similarity needed as well; rewordings of one garment score 0.45-0.65
+IVF_MIN_ITEMS = 20000
+NPROBE = 32  # Lists scanned per query, out of about sqrt(items)
+SCAN_CHUNK = 16384  # Rows converted and scored at a time, to bound memory on big int8 stores
+
+
+def _normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_text(text):
+    """Unit-length TEXT_DIM vector of the hashed words and word pairs in `text`."""
+    vector = np.zeros(TEXT_DIM, np.float32)
+    tokens = tokenize(text or "")
+    for feature in tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]:
+        hashed = zlib.crc32(feature.encode())
+        # The sign bit keeps colliding features from always adding up
+        vector[hashed % TEXT_DIM] += 1.0 if hashed & 0x80000000 else -1.0
+    return _normalize(vector)
+
+
+def embed_image(image):
+    """Unit-length IMAGE_DIM vector of a BGR image or image path (read from its thumbnail); zeros if it can't be read."""
+    if isinstance(image, str):
+        image = get_image_store().load(image, THUMB_SIDE)
+    if image is None:
+        return np.zeros(IMAGE_DIM, np.float32)
+
+    small = cv2.resize(image, (64, 64), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hsv[:, :, 0][hsv[:, :, 1] < NEUTRAL_SATURATION] = 0  # All greys in one hue, so they match each other
+    histogram = cv2.calcHist([hsv], [0, 1], None, list(HISTOGRAM_BINS), [0, 180, 0, 256])
+    # Spread each count into the neighbouring bins, so a small colour shift doesn't jump a bin edge
+    histogram = cv2.GaussianBlur(histogram, (3, 3), 0).ravel()
+    histogram = _normalize(np.sqrt(histogram))  # Square root so one dominant colour doesn't swamp the rest
+
+    # Brightness relative to the brightest part of the picture, so a darker exposure of the same
+    # scene still matches while a black garment and a grey one on the same background don't
+    value = hsv[:, :, 2].astype(np.float32)
+    value = np.clip(value * (255 / max(float(np.percentile(value, 95)), 1.0)), 0, 255)
+    brightness = cv2.calcHist([value], [0], None, [BRIGHTNESS_BINS], [0, 256])
+    brightness = _normalize(np.sqrt(cv2.GaussianBlur(brightness, (1, 5), 0).ravel()))
+
+    grey = cv2.resize(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (LAYOUT_SIDE, LAYOUT_SIDE),
+                      interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    layout = _normalize(grey - grey.mean())
+
+    return _normalize(np.concatenate([histogram * COLOUR_WEIGHT, brightness * BRIGHTNESS_WEIGHT,
+                                      layout * LAYOUT_WEIGHT])).astype(np.float32)
+
+
+def part_similarities(vector, other):
+    """(image, text) cosine similarities of two full item vectors."""
+    return (float(vector[TEXT_DIM:] @ other[TEXT_DIM:]) / IMAGE_WEIGHT ** 2,
+            float(vector[:TEXT_DIM] @ other[:TEXT_DIM]) / TEXT_WEIGHT ** 2)
+
+
+def combine(text_vector=None, image_vector=None):
+    """A full DIM vector from either or both parts."""
+    text_vector = np.zeros(TEXT_DIM, np.float32) if text_vector is None else text_vector
+    image_vector = np.zeros(IMAGE_DIM, np.float32) if image_vector is None else image_vector
+    return np.concatenate([text_vector * TEXT_WEIGHT, image_vector * IMAGE_WEIGHT]).astype(np.float32)
+
+
+def embed_item(image, description, details=""):
+    return combine(embed_text(f"{description or ''} {details or ''}"), embed_image(image))
+
+
+def _top_k(rows, scores, k):
+    if len(scores) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best])]
+    return [(rows[i], float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+
+class IVFIndex:
+    """Inverted lists over the first `size` rows: each row is filed under its nearest centroid."""
+
+    def __init__(self, vectors, size, nlist=None, iterations=8, sample_size=50000, seed=0):
+        self.size = size
+        nlist = nlist or max(1, int(np.sqrt(size)))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(size, min(size, sample_size), replace=False))], np.float32)
+
+        # Spherical k-means: centroids are renormalized means, assignment is by highest dot product
+        self.centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ self.centroids.T, axis=1)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            self.centroids = np.where(empty[:, None], self.centroids, sums / np.where(norms == 0, 1, norms))
+
+        assignment = np.concatenate([np.argmax(np.asarray(vectors[start:min(start + SCAN_CHUNK, size)], np.float32)
+                                               @ self.centroids.T, axis=1)
+                                     for start in range(0, size, SCAN_CHUNK)])
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+
+    def candidates(self, query, nprobe=NPROBE):
+        nearest = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.concatenate([self.lists[i] for i in nearest])
+
+
+class WardrobeEmbeddings:
+    def __init__(self, db_path="fashion.db", dtype=VECTOR_DTYPE, index="auto"):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unknown vector dtype {dtype!r}. Choose from ('float32', 'int8')")
+        if index not in ("auto", "flat", "ivf"):
+            raise ValueError(f"Unknown index {index!r}. Choose from ('auto', 'flat', 'ivf')")
+        self.vectors_path = f"{db_path}.vectors"
+        self.ids_path = f"{db_path}.ids"
+        self.meta_path = f"{db_path}.vectors.json"
+        self.dtype = dtype
+        self.index = index
+        self.count = 0
+        self._ivf = None
+
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        if meta.get("version") == EMBEDDING_VERSION and meta.get("dim") == DIM and meta.get("dtype") == dtype:
+            self.count = meta["count"]
+            self._open(max(meta["capacity"], 1))
+        else:
+            if meta:
+                print("Stored wardrobe vectors are from another encoder or dtype; run a rebuild")
+            self._open(1024, reset=True)
+        self._rows = {int(item_id): row for row, item_id in enumerate(self.ids[:self.count]) if item_id >= 0}
+
+    def _open(self, capacity, reset=False):
+        for path, row_bytes in ((self.vectors_path, DIM * np.dtype(self.dtype).itemsize), (self.ids_path, 8)):
+            with open(path, "wb" if reset or not os.path.exists(path) else "r+b") as f:
+                f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vectors_path, self.dtype, "r+", shape=(capacity, DIM))
+        self.ids = np.memmap(self.ids_path, np.int64, "r+", shape=(capacity,))
+        if reset:
+            self.count = 0
+            self._write_meta()
+
+    def _write_meta(self):
+        with open(self.meta_path, "w") as f:
+            json.dump({"version": EMBEDDING_VERSION, "dim": DIM, "dtype": self.dtype, "count": self.count,
+                       "capacity": self.capacity}, f)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    def flush(self):
+        self.vectors.flush()
+        self.ids.flush()
+        self._write_meta()
+
+    def _encode(self, vectors):
+        if self.dtype == "int8":
+            return np.clip(np.round(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors
+
+    def _decode(self, stored):
+        stored = np.asarray(stored, np.float32)
+        return stored / INT8_SCALE if self.dtype == "int8" else stored
+
+    def add_many(self, item_ids, vectors):
+        """Stores vectors for the items (replacing any they had). Call flush() to persist the row count."""
+        for item_id in item_ids:
+            self.remove(item_id)
+        needed = self.count + len(item_ids)
+        if needed > self.capacity:
+            del self.vectors, self.ids
+            self._open(max(needed, self.capacity * 2))
+
+        self.vectors[self.count:needed] = self._encode(np.asarray(vectors, np.float32).reshape(-1, DIM))
+        self.ids[self.count:needed] = item_ids
+        for offset, item_id in enumerate(item_ids):
+            self._rows[int(item_id)] = self.count + offset
+        self.count = needed
+
+    def add(self, item_id, vector):
+        self.add_many([item_id], [vector])
+        self.flush()
+
+    def remove(self, item_id):
+        row = self._rows.pop(item_id, None)
+        if row is not None:
+            self.ids[row] = -1  # Left as a hole until the next rebuild
+
+    def vector(self, item_id):
+        row = self._rows.get(item_id)
+        return None if row is None else self._decode(self.vectors[row])
+
+    def _use_ivf(self):
+        if self.index == "flat" or (self.index == "auto" and len(self) < IVF_MIN_ITEMS):
+            return False
+        # Retrain once the untrained tail is half the size of what the lists cover
+        if self._ivf is None or self.count - self._ivf.size > self._ivf.size // 2:
+            self._ivf = IVFIndex(self.vectors, self.count)
+        return True
+
+    def _score_rows(self, rows, query):
+        scores = np.empty(len(rows), np.float32)
+        for start in range(0, len(rows), SCAN_CHUNK):
+            chunk = rows[start:start + SCAN_CHUNK]
+            block = self.vectors[chunk[0]:chunk[-1] + 1] if chunk[-1] - chunk[0] + 1 == len(chunk) else self.vectors[chunk]
+            scores[start:start + len(chunk)] = np.asarray(block, np.float32) @ query
+        if self.dtype == "int8":
+            scores /= INT8_SCALE  # Once on the scores rather than on every stored value
+        scores[self.ids[rows] < 0] = -np.inf
+        return scores
+
+    def search(self, query, k=10, exclude=()):
+        """[(item_id, similarity)] of the `k` most similar items, most similar first."""
+        if not self._rows:
+            return []
+        query = np.asarray(query, np.float32)
+        if self._use_ivf():
+            rows = np.concatenate([self._ivf.candidates(query), np.arange(self._ivf.size, self.count)])
+        else:
+            rows = np.arange(self.count)
+        scores = self._score_rows(rows, query)
+        for item_id in exclude:
+            scores[rows == self._rows.get(item_id, -1)] = -np.inf
+        return [(int(self.ids[row]), score) for row, score in _top_k(rows, scores, k)]
+
+    def find_duplicates(self, vector, threshold=DUPLICATE_THRESHOLD, text_threshold=TEXT_DUPLICATE_THRESHOLD, k=5):
+        """
+        Items that may be the same garment as the item with the full vector `vector` (embed_item):
+        their picture scores at least `threshold` and their description at least `text_threshold`.
+        Returns [(item_id, image similarity, text similarity)], most similar picture first.
+        """
+        if not vector[TEXT_DIM:].any() or not vector[:TEXT_DIM].any():
+            return []  # An unreadable picture or an empty description can't vouch for anything
+        # The stored image part is scaled by IMAGE_WEIGHT, so undo it to get the image similarity
+        matches = self.search(combine(image_vector=vector[TEXT_DIM:] / IMAGE_WEIGHT) / IMAGE_WEIGHT ** 2, k=k)
+        duplicates = []
+        for item_id, image_similarity in matches:
+            if image_similarity < threshold:
+                break
+            text_similarity = part_similarities(vector, self.vector(item_id))[1]
+            if text_similarity >= text_threshold:
+                duplicates.append((item_id, image_similarity, text_similarity))
+        return duplicates
+
+    def similar_items(self, item_id, k=5):
+        vector = self.vector(item_id)
+        return [] if vector is None else self.search(vector, k=k, exclude=(item_id,))
+
+    def search_text(self, text, k=10):
+        return self.search(combine(text_vector=embed_text(text)), k=k)
+
+    def rebuild(self, conn):
+        """Re-embeds every clothing item in the database into a fresh, hole-free store."""
+        rows = conn.execute("SELECT id, image_path, description, details FROM clothing ORDER BY id").fetchall()
+        del self.vectors, self.ids
+        self._open(max(len(rows), 1024), reset=True)
+        self._rows, self._ivf = {}, None
+        for start in range(0, len(rows), 1000):
+            batch = rows[start:start + 1000]
+            self.add_many([row[0] for row in batch], [embed_item(row[1], row[2], row[3]) for row in batch])
+        self.flush()
+        return len(rows)
+
+    def stats(self):
+        return {"items": len(self), "rows": self.count, "capacity": self.capacity, "dtype": self.dtype,
+                "bytes": os.path.getsize(self.vectors_path), "index": "ivf" if self._use_ivf() else "flat"}
+
+
+_embeddings = {}
+
+
+def get_wardrobe_embeddings(db_path="fashion.db"):
+    """The embedding store next to `db_path`, opened once per process."""
+    if db_path not in _embeddings:
+        _embeddings[db_path] = WardrobeEmbeddings(db_path)
+    return _embeddings[db_path]
+
+
+if __name__ == '__main__':
+    import sqlite3
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    db = sys.argv[2] if len(sys.argv) > 2 else "fashion.db"
+    if command == "rebuild":
+        connection = sqlite3.connect(db)
+        print(f"Embedded {get_wardrobe_embeddings(db).rebuild(connection)} items")
+        connection.close()
+    else:
+        print(get_wardrobe_embeddings(db).stats())
@@ -0,0 +1,189 @@
+"""
+Local retrieval stage for outfit suggestions, so the model sees a short list instead of the whole wardrobe.
+
+Each clothing item is put in a category (top, bottom, shoes) from keywords in its description,
+and the descriptions are indexed for BM25 search. For an outfit prompt the TOP_K best matching
+items of each category are kept (items whose category isn't clear compete in every category),
+and each is sent as a one-line summary instead of its full description.
+
+Prompt size then stays roughly constant as the wardrobe grows; estimate_tokens() gives the
+rough count (about four characters per token) used for reporting. The index is rebuilt only
+when the wardrobe changes (get_wardrobe_index).
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from FastClassifier import tokenize
+
+CATEGORIES = ("top", "bottom", "shoes")
+TOP_K = 8  # Candidates per category sent to the model
+SUMMARY_WORDS = 14
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+CATEGORY_KEYWORDS = {
+    "top": [r"\bt-?shirts?\b", r"\bshirts?\b", r"\btee\b", r"\bblouses?\b", r"\bsweaters?\b", r"\bjumpers?\b",
+            r"\bhoodies?\b", r"\bsweatshirts?\b", r"\bjackets?\b", r"\bcoats?\b", r"\bblazers?\b", r"\bcardigans?\b",
+            r"\bpolos?\b", r"\btank tops?\b", r"\btops?\b", r"\bvests?\b"],
+    "bottom": [r"\bjeans\b", r"\btrousers\b", r"\bpants\b", r"\bshorts\b", r"\bskirts?\b", r"\bchinos\b",
+               r"\bleggings\b", r"\bjoggers\b", r"\bsweatpants\b", r"\bbottoms?\b"],
+    "shoes": [r"\bshoes?\b", r"\bsneakers?\b", r"\btrainers?\b", r"\bboots?\b", r"\bsandals?\b", r"\bloafers?\b",
+              r"\bheels\b", r"\bslippers?\b", r"\bfootwear\b", r"\bflats\b"],
+}
+
+COLOURS = ["light blue", "dark blue", "navy", "blue", "black", "white", "grey", "gray", "charcoal", "red", "burgundy",
+           "maroon", "pink", "purple", "green", "olive", "khaki", "yellow", "mustard", "orange", "brown", "tan",
+           "beige", "cream", "ivory", "gold", "silver", "multicolou?red"]
+_COLOUR_PATTERN = re.compile(r"\b(" + "|".join(COLOURS) + r")\b")
+
+SEASON_KEYWORDS = {
+    "summer": [r"\bsummer\b", r"\blinen\b", r"\bshorts\b", r"\bsandals?\b", r"\bshort[- ]sleeved?\b"],
+    "winter": [r"\bwinter\b", r"\bwool(len)?\b", r"\bfleece\b", r"\bpuffer\b", r"\bthermal\b"],
+    "autumn": [r"\bautumn\b", r"\bfall\b", r"\bcorduroy\b", r"\bflannel\b"],
+    "spring": [r"\bspring\b"],
+    "all-season": [r"\ball[- ]season\b", r"\byear[- ]round\b"],
+}
+FORMALITY_KEYWORDS = {
+    "formal": [r"\bformal\b", r"\bsuit\b", r"\btuxedo\b", r"\bdress shoes\b", r"\boxfords?\b", r"\bbusiness\b"],
+    "smart_casual": [r"\bsmart[- ]casual\b", r"\bblazers?\b", r"\bchinos\b", r"\bloafers?\b", r"\btailored\b",
+                     r"\bpolo\b"],
+    "sporty": [r"\bsport(s|y)?\b", r"\bathletic\b", r"\brunning\b", r"\bgym\b", r"\bjoggers\b", r"\btrainers?\b"],
+    "casual": [r"\bcasual\b", r"\bt-?shirts?\b", r"\bhoodies?\b", r"\bjeans\b", r"\bsneakers?\b", r"\brelaxed\b"],
+}
+
+
+def _first_match_pattern(keywords):
+    """One alternation with a named group per key, so finding the first keyword is a single search."""
+    return re.compile("|".join(f"(?P<{name.replace('-', '_')}>{'|'.join(patterns)})"
+                               for name, patterns in keywords.items()))
+
+
+_CATEGORY_PATTERN = _first_match_pattern(CATEGORY_KEYWORDS)
+_SEASON_PATTERN = _first_match_pattern(SEASON_KEYWORDS)
+_FORMALITY_PATTERN = _first_match_pattern(FORMALITY_KEYWORDS)
+
+# Words that make descriptions longer without telling the model anything
+FILLER = {"this", "is", "a", "an", "the", "image", "shows", "picture", "photo", "clothing", "item", "features",
+          "appears", "to", "be", "it", "has", "of", "with", "that", "which", "and", "piece", "category", "key",
+          "details", "include", "includes", "made"}
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / 4)
+
+
+def categorize(text):
+    """The category whose keywords appear first in the text, or None if none do."""
+    match = _CATEGORY_PATTERN.search(text.lower())
+    return match.lastgroup if match else None
+
+
+def extract_attributes(text):
+    """
+    (category, colour, season, formality) named in a description, each None when it says nothing
+    about it. The first keyword in the text wins, since descriptions lead with the garment.
+    """
+    text = text.lower()
+    colour = _COLOUR_PATTERN.search(text)
+    season = _SEASON_PATTERN.search(text)
+    formality = _FORMALITY_PATTERN.search(text)
+    return (categorize(text),
+            colour.group(1).replace("gray", "grey") if colour else None,
+            season.lastgroup.replace("_", "-") if season else None,
+            formality.lastgroup if formality else None)
+
+
+def compact_summary(description, details="", max_words=SUMMARY_WORDS):
+    """The description and details without filler words, cut to `max_words`."""
+    words = [word for word in re.findall(r"[\w'-]+", f"{description} {details}") if word.lower() not in FILLER]
+    return " ".join(words[:max_words])
+
+
+class WardrobeIndex:
+    """
+    BM25 index over clothing rows (id, image_path, description, details, ...), for databases
+    without FTS5 and for benchmarking.
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.categories = []
+        self.lengths = []
+        self.postings = defaultdict(list)  # term -> [(position in self.items, term frequency)]
+
+        for position, item in enumerate(self.items):
+            text = f"{item[2] or ''} {item[3] or ''}"
+            self.categories.append(categorize(text))
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self.postings[term].append((position, count))
+
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        total = len(self.items)
+        self.idf = {term: math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for term, posting in self.postings.items()}
+
+    def __len__(self):
+        return len(self.items)
+
+    def scores(self, query):
+        """BM25 score of every item that shares a term with `query`, by position."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self.postings[term]:
+                norm = K1 * (1 - B + B * self.lengths[position] / self.average_length)
+                scores[position] += idf * frequency * (K1 + 1) / (frequency + norm)
+        return scores
+
+    def candidates(self, query, k=TOP_K):
+        """
+        Up to `k` items per category, best match first. Items with equal scores (including no
+        match at all) are in newest-first order, so a vague prompt still gets a varied list.
+        """
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.items)), key=lambda position: (-scores.get(position, 0.0), -position))
+        picked = {category: [] for category in CATEGORIES}
+        for position in ranked:
+            category = self.categories[position]
+            for name in (CATEGORIES if category is None else (category,)):
+                if len(picked[name]) < k:
+                    picked[name].append(self.items[position])
+            if all(len(items) == k for items in picked.values()):
+                break
+        return picked
+
+
+def candidate_lines(candidates):
+    """One 'ID {id}: {category} | {summary}' line per candidate, each item listed once."""
+    lines, seen = [], set()
+    for items in candidates.values():
+        for item in items:
+            if item[0] in seen:
+                continue
+            seen.add(item[0])
+            # Rows from the database carry their category (item[4]); bare rows are categorized here
+            category = (item[4] if len(item) > 4 else categorize(f"{item[2] or ''} {item[3] or ''}")) or "unknown"
+            lines.append(f"ID {item[0]}: {category} | {compact_summary(item[2] or '', item[3] or '')}")
+    return lines
+
+
+_cached_index = None
+
+
+def get_wardrobe_index(items):
+    """
+    The index for these items, reused while the wardrobe is unchanged. Items are only ever
+    added or deleted, never edited, so their IDs identify the wardrobe's contents.
+    """
+    global _cached_index
+    key = tuple(item[0] for item in items)
+    if _cached_index is None or _cached_index[0] != key:
+        _cached_index = (key, WardrobeIndex(items))
+    return _cached_index[1]
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Approximate fp32 weight footprint of each Whisper checkpoint in MB, used to plan
+# evictions before a model is loaded. The real size is measured once it is in memory.
+ESTIMATED_MODEL_MB = {
+    "tiny": 150,
+    "tiny.en": 150,
+    "base": 290,
+    "base.en": 290,
+    "small": 970,
+    "small.en": 970,
+    "medium": 3060,
+    "medium.en": 3060,
+    "large": 6170,
+    "large-v1": 6170,
+    "large-v2": 6170,
+    "large-v3": 6170,
+    "turbo": 3240,
+}
+
+
+def default_device():
+    """Returns "cuda" when a GPU is available, otherwise "cpu"."""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class WhisperRegistry:
+    """
+    Process-wide cache of loaded Whisper models.
+
+    Models are loaded lazily on first use and keyed by (size, device, precision).
+    When loading a model would exceed `memory_budget_mb`, the least recently used
+    models are evicted first.
+    """
+
+    def __init__(self, memory_budget_mb=4096):
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()  # key -> (model, size_mb)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_times = {}  # key -> seconds spent in whisper.load_model
+
+    def get(self, size="small", device=None, precision=None):
+        """Returns a loaded Whisper model, loading it if it is not cached yet."""
+        if device is None:
+            device = default_device()
+        if precision is None:
+            precision = "fp16" if device == "cuda" else "fp32"
+        key = (size, device, precision)
+
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0]
+
+            self.misses += 1
+            self._make_room(ESTIMATED_MODEL_MB.get(size, 0))
+
+            model, size_mb, load_time = self._load(size, device, precision)
+            self.load_times[key] = load_time
+            self._models[key] = (model, size_mb)
+            print(f"Loaded Whisper model {key} in {load_time:.2f}s ({size_mb:.0f}MB)")
+            return model
+
+    def _load(self, size, device, precision):
+        import whisper
+
+        start = time.perf_counter()
+        model = whisper.load_model(size, device=device)
+        if precision == "fp16" and device != "cpu":
+            model = model.half()
+        load_time = time.perf_counter() - start
+
+        size_mb = sum(p.numel() * p.element_size() for p in model.parameters()) / (1024 ** 2)
+        return model, size_mb, load_time
+
+    def _make_room(self, needed_mb):
+        """Evicts least recently used models until `needed_mb` fits in the budget."""
+        evicted = False
+        while self._models and self.memory_used_mb() + needed_mb > self.memory_budget_mb:
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            evicted = True
+            print(f"Evicted Whisper model {key}")
+
+        if evicted:
+            # Give the freed GPU memory back before loading the next model
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+
+    def memory_used_mb(self):
+        return sum(size_mb for _, size_mb in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        """Returns load-time and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "loaded": [key for key in self._models],
+            "memory_used_mb": round(self.memory_used_mb(), 1),
+            "load_time_s": {"/".join(key): round(seconds, 3) for key, seconds in self.load_times.items()},
+            "total_load_time_s": round(sum(self.load_times.values()), 3),
+        }
+
+
+# Shared registry used by SpeechToText and the settings wizard
+whisper_registry = WhisperRegistry()
+
+
+def get_whisper_model(size="small", device=None, precision=None):
+    return whisper_registry.get(size, device=device, precision=precision)
@@ -0,0 +1,70 @@
+"""
+Time per picture: the old open / sleep 2s / read / release flow against CaptureService.
+
+Runs against synthetic frames by default (dark and blurry for the first 0.5s, like a webcam
+settling), or a video file or camera given on the command line. Also reports the quality
+scores of the frames each approach ended up with.
+
+Usage (from the repository root):
+    python -m benchmarks.capture_latency [synthetic | VIDEO_PATH | CAMERA_INDEX] [captures]
+"""
+import statistics
+import sys
+import time
+
+from CaptureService import CameraSource, CaptureService, SyntheticSource, VideoFileSource, score_frame
+
+CAPTURES = 5
+OLD_WARMUP_SLEEP = 2.0
+
+
+def make_source(name):
+    if name == "synthetic":
+        return SyntheticSource()
+    if name.isdigit():
+        return CameraSource(int(name))
+    return VideoFileSource(name)
+
+
+def old_capture(source):
+    """What Take_Picture.capture_image used to do."""
+    start = time.perf_counter()
+    source.open()
+    time.sleep(OLD_WARMUP_SLEEP)
+    ok, image = source.read()
+    source.release()
+    return time.perf_counter() - start, score_frame(image) if ok else None
+
+
+def service_captures(service, captures):
+    results = []
+    for _ in range(captures):
+        start = time.perf_counter()
+        frame = service.best_frame()
+        results.append((time.perf_counter() - start, (frame.sharpness, frame.brightness, frame.clipped)))
+        time.sleep(0.2)  # Give the buffer new frames, as a user would between pictures
+    return results
+
+
+def describe(score):
+    sharpness, brightness, clipped = score
+    return f"sharpness {sharpness:.0f}, brightness {brightness:.0f}, clipped {clipped:.0%}"
+
+
+def main(source_name="synthetic", captures=CAPTURES):
+    old = [old_capture(make_source(source_name)) for _ in range(captures)]
+    print(f"Old flow:  {statistics.mean(seconds for seconds, _ in old):.2f}s per picture "
+          f"({describe(old[-1][1])})")
+
+    service = CaptureService(make_source(source_name))
+    results = service_captures(service, captures)
+    service.stop()
+    first, rest = results[0], results[1:]
+    print(f"Service:   first picture {first[0]:.2f}s (opens the camera), "
+          f"then {statistics.mean(seconds for seconds, _ in rest) * 1000:.1f}ms per picture "
+          f"({describe(rest[-1][1])})")
+    print(f"Frames read by the grabber: {service.frames_read}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else "synthetic", int(sys.argv[2]) if len(sys.argv) > 2 else CAPTURES)
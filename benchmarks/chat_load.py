@@ -0,0 +1,110 @@
+"""
+Load test for the chat view: p50/p99 latency and throughput at increasing concurrency.
+
+Start the server first, e.g. the ASGI app:
+    uvicorn chatproj.asgi:application --workers 1
+and create a user with `python manage.py createsuperuser`. To measure the app rather than the
+models, run benchmarks/stub_server.py and point the app at it (see that file for the variables).
+
+Usage (from the repository root):
+    python -m benchmarks.chat_load USERNAME PASSWORD [base_url] [levels]
+    python -m benchmarks.chat_load alice secret http://127.0.0.1:8000 1,8,32,128
+"""
+import http.cookiejar
+import re
+import statistics
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+LEVELS = [1, 4, 16, 64, 256]
+REQUESTS_PER_CLIENT = 3
+MESSAGE = "What is the capital of France?"
+
+
+class Client:
+    """One logged-in browser session."""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+        page = self.opener.open(f"{self.base_url}/login/").read().decode()
+        self.post("/login/", {"username": username, "password": password}, page)
+        if not any(cookie.name == "sessionid" for cookie in self.cookies):
+            raise RuntimeError("Login failed, check the username and password")
+
+    def csrf_token(self, page):
+        match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page)
+        return match.group(1) if match else ""
+
+    def post(self, path, fields, page):
+        fields = dict(fields, csrfmiddlewaretoken=self.csrf_token(page))
+        request = urllib.request.Request(f"{self.base_url}{path}", data=urllib.parse.urlencode(fields).encode(),
+                                         headers={"Referer": f"{self.base_url}{path}"})
+        return self.opener.open(request, timeout=600).read().decode()
+
+    def chat(self, message):
+        """Sends one message and returns the seconds until the page came back."""
+        page = self.opener.open(f"{self.base_url}/").read().decode()
+        start = time.perf_counter()
+        self.post("/", {"message": message}, page)
+        return time.perf_counter() - start
+
+
+def run_level(clients, requests_per_client):
+    latencies = []
+    errors = 0
+
+    def session(client):
+        results = []
+        for _ in range(requests_per_client):
+            try:
+                results.append(client.chat(MESSAGE))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        for results in executor.map(session, clients):
+            for result in results:
+                if isinstance(result, Exception):
+                    errors += 1
+                else:
+                    latencies.append(result)
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(username, password, base_url="http://127.0.0.1:8000", levels=None):
+    levels = levels or LEVELS
+    print(f"{'clients':>8}{'requests':>10}{'errors':>8}{'p50 s':>9}{'p99 s':>9}{'req/s':>9}")
+
+    for level in levels:
+        clients = [Client(base_url, username, password) for _ in range(level)]
+        latencies, errors, elapsed = run_level(clients, REQUESTS_PER_CLIENT)
+        if not latencies:
+            print(f"{level:>8}{0:>10}{errors:>8}  all requests failed")
+            continue
+        print(f"{level:>8}{len(latencies):>10}{errors:>8}"
+              f"{statistics.median(latencies):>9.2f}{percentile(latencies, 0.99):>9.2f}"
+              f"{len(latencies) / elapsed:>9.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    arguments = sys.argv[1:4]
+    if len(sys.argv) > 4:
+        arguments.append([int(level) for level in sys.argv[4].split(",")])
+    main(*arguments)
@@ -0,0 +1,114 @@
+"""
+Evaluates the fast local classifier against the labels in classifier_eval.jsonl.
+
+The bundled labels were written by hand in the classifier's label scheme. Run with --relabel
+to replace them with the configured LLM classifier's own labels (and record its latency), or
+with --llm to compare against live LLM labels without saving them.
+
+--compare-output runs the LLM classifier over the set in both output modes (free-text JSON
+scraping and schema-constrained output) and reports parse failures, tokens and accuracy for each.
+
+Usage (from the repository root):
+    python -m benchmarks.classifier_eval [--llm | --relabel | --compare-output]
+"""
+import json
+import os
+import statistics
+import sys
+import time
+
+from FastClassifier import CONFIDENCE_THRESHOLD, fast_classify
+
+EVAL_SET = os.path.join(os.path.dirname(__file__), "classifier_eval.jsonl")
+
+
+def load(path=EVAL_SET):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def label_with_llm(rows):
+    """Adds the LLM classifier's labels and latency to every row."""
+    from Classifier import classify_with_llm
+
+    for row in rows:
+        start = time.perf_counter()
+        classification = classify_with_llm(row["prompt"])
+        row.update(subject=classification.subject, difficulty=classification.difficulty,
+                   requires_thinking=classification.requires_thinking,
+                   requires_vision=classification.requires_vision,
+                   llm_latency=round(time.perf_counter() - start, 3))
+    return rows
+
+
+def evaluate(rows):
+    covered = []
+    fast_latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        result = fast_classify(row["prompt"])
+        fast_latencies.append(time.perf_counter() - start)
+        row["fast"] = result
+        if result.confident:
+            covered.append(row)
+
+    def accuracy(items, key):
+        if not items:
+            return 0.0
+        return sum(getattr(item["fast"], key) == item[key] for item in items) / len(items)
+
+    print(f"Prompts: {len(rows)}, confidence threshold: {CONFIDENCE_THRESHOLD}")
+    print(f"Answered locally: {len(covered)} ({len(covered) / len(rows):.0%}), "
+          f"the rest fall through to the LLM")
+    print(f"Subject accuracy on answered prompts: {accuracy(covered, 'subject'):.0%}")
+    print(f"Subject accuracy if every prompt were answered locally: {accuracy(rows, 'subject'):.0%}")
+    print(f"Vision accuracy on answered prompts: {accuracy(covered, 'requires_vision'):.0%}")
+    print(f"Difficulty accuracy on answered prompts: {accuracy(covered, 'difficulty'):.0%}")
+    print(f"Fast path latency: median {statistics.median(fast_latencies) * 1000:.2f}ms, "
+          f"max {max(fast_latencies) * 1000:.2f}ms")
+
+    llm_latencies = [row["llm_latency"] for row in rows if "llm_latency" in row]
+    if llm_latencies:
+        saved = sum(row["llm_latency"] for row in covered if "llm_latency" in row)
+        print(f"LLM latency: median {statistics.median(llm_latencies):.2f}s; "
+              f"latency saved on this set: {saved:.1f}s of {sum(llm_latencies):.1f}s")
+
+    mistakes = [row for row in covered if row["fast"].subject != row["subject"]]
+    for row in mistakes:
+        print(f"  wrong: {row['prompt']!r} -> {row['fast'].subject} (expected {row['subject']}, "
+              f"{row['fast'].source} {row['fast'].confidence})")
+
+
+def compare_output_modes(rows):
+    from Classifier import CLASSIFIER_OUTPUT_MODES, classifier_stats, classify_with_llm
+
+    for mode in CLASSIFIER_OUTPUT_MODES:
+        correct = 0
+        start = time.perf_counter()
+        for row in rows:
+            correct += classify_with_llm(row["prompt"], mode=mode).subject == row["subject"]
+        elapsed = time.perf_counter() - start
+
+        summary = classifier_stats.output_summary(mode)
+        print(f"{mode}: parse failures {summary['parse_failure_rate']:.0%}, "
+              f"tokens per classification {summary['prompt_tokens']:.0f} in / {summary['completion_tokens']:.0f} out, "
+              f"subject accuracy {correct / len(rows):.0%}, {elapsed / len(rows):.2f}s per prompt")
+
+
+def main(arguments):
+    rows = load()
+    if "--compare-output" in arguments:
+        compare_output_modes(rows)
+        return
+    if "--llm" in arguments or "--relabel" in arguments:
+        rows = label_with_llm(rows)
+    if "--relabel" in arguments:
+        with open(EVAL_SET, "w", encoding="utf-8") as file:
+            for row in rows:
+                file.write(json.dumps(row) + "\n")
+        print(f"Saved LLM labels to {EVAL_SET}")
+    evaluate(rows)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
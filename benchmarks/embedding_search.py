@@ -0,0 +1,101 @@
+"""
+Build time, query latency and size of the wardrobe embedding index (WardrobeEmbeddings) at large
+wardrobe sizes: a flat float32 scan, a flat int8 scan and the IVF index, with the IVF index's
+recall@10 against the exact flat results.
+
+Text vectors come from synthetic descriptions (benchmarks/outfit_prompt.py); image vectors are
+random unit vectors, since embedding 100k pictures would only time OpenCV. Stores are written to
+a temporary folder.
+
+Usage (from the repository root):
+    python -m benchmarks.embedding_search [--sizes 10000 100000] [--queries 50]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.outfit_prompt import PROMPT, synthetic_wardrobe
+from WardrobeEmbeddings import IMAGE_DIM, WardrobeEmbeddings, combine, embed_text
+
+SIZES = [10000, 100000]
+K = 10
+QUERIES = [PROMPT, "navy wool sweater for winter", "white sneakers", "formal black dress shoes",
+           "relaxed linen shorts for summer", "vintage denim jacket"]
+
+
+def synthetic_vectors(size, seed=0):
+    """
+    Text vectors of the synthetic descriptions, and image vectors that are a shared look per
+    (colour, garment) plus per-picture noise, as pictures of similar clothes would be.
+    """
+    rng = np.random.default_rng(seed)
+    looks, vectors = {}, []
+    for item in synthetic_wardrobe(size, seed):
+        words = item[2].split()
+        look = (words[4], words[6])  # "This image shows a {colour} {material} {garment}..."
+        if look not in looks:
+            looks[look] = rng.standard_normal(IMAGE_DIM).astype(np.float32)
+        image = looks[look] + 0.7 * rng.standard_normal(IMAGE_DIM).astype(np.float32)
+        vectors.append(combine(embed_text(item[2]), image / np.linalg.norm(image)))
+    return np.stack(vectors)
+
+
+def build(directory, name, vectors, dtype, index):
+    store = WardrobeEmbeddings(os.path.join(directory, name), dtype=dtype, index=index)
+    start = time.perf_counter()
+    store.add_many(list(range(1, len(vectors) + 1)), vectors)
+    store.flush()
+    store.search_text(PROMPT)  # Trains the IVF index
+    return store, time.perf_counter() - start
+
+
+def time_queries(store, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([item_id for item_id, _ in store.search_text(query, k=K)])
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def recall(results, vectors, queries):
+    """
+    Share of the results that belong in the exact top K. Many synthetic descriptions tie, so an
+    item counts if it scores at least as high as the exact K-th item.
+    """
+    found = 0
+    for ids, query in zip(results, queries):
+        scores = vectors @ combine(text_vector=embed_text(query))
+        kth = np.partition(scores, -K)[-K]
+        found += sum(scores[item_id - 1] >= kth - 1e-4 for item_id in ids)
+    return found / (K * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--queries", type=int, default=50, help="Queries timed per store")
+    args = parser.parse_args()
+    queries = [QUERIES[i % len(QUERIES)] + ("" if i < len(QUERIES) else f" {i}") for i in range(args.queries)]
+
+    for size in args.sizes:
+        directory = tempfile.mkdtemp()
+        start = time.perf_counter()
+        vectors = synthetic_vectors(size)
+        print(f"{size} items (embedded in {time.perf_counter() - start:.1f}s)")
+
+        for name, dtype, index in (("flat float32", "float32", "flat"), ("flat int8", "int8", "flat"),
+                                   ("ivf float32", "float32", "ivf"), ("ivf int8", "int8", "ivf")):
+            store, seconds = build(directory, name.replace(" ", "_"), vectors, dtype, index)
+            latencies, results = time_queries(store, queries)
+            print(f"  {name:<13} build {seconds:.2f}s | median {statistics.median(latencies) * 1000:.1f}ms | "
+                  f"p95 {np.percentile(latencies, 95) * 1000:.1f}ms | {store.stats()['bytes'] / 2 ** 20:.0f}MB | "
+                  f"recall@{K} {recall(results, vectors, queries):.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Time to show or upload a wardrobe picture: decoding the full-size capture every time (the old
+path) against reading ImageStore's display and upload copies. Also times making the copies at
+capture time and the bulk rebuild, and reports the disk space they take.
+
+Uses synthetic camera frames saved as JPEGs in a temporary folder, with the store next to them,
+unless image files are given.
+
+Usage (from the repository root):
+    python -m benchmarks.image_store [image ...]
+"""
+import base64
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+
+from CaptureService import SyntheticSource
+from ImageStore import DISPLAY_SIDE, THUMB_SIDE, ImageStore
+
+RUNS = 20
+SIZES = [(1280, 720), (1920, 1080), (3840, 2160)]
+
+
+def make_images(directory):
+    paths = []
+    for width, height in SIZES:
+        source = SyntheticSource(width=width, height=height, warmup=0)
+        source.open()
+        _, frame = source.read()
+        path = os.path.join(directory, f"clothing_{width}x{height}.jpg")
+        cv2.imwrite(path, frame)
+        paths.append(path)
+    return paths
+
+
+def median_ms(function, *arguments):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function(*arguments)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def old_upload(path):
+    with open(path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+def main(paths):
+    directory = tempfile.mkdtemp()
+    paths = paths or make_images(directory)
+    store = ImageStore(os.path.join(directory, ".derivatives"))
+
+    for path in paths:
+        frame = cv2.imread(path)
+        height, width = frame.shape[:2]
+        generate = median_ms(lambda: store.generate(path, frame=frame, force=True))
+        copies = store.generate(path)
+        sizes = ", ".join(f"{variant} {os.path.getsize(copy) / 1024:.0f}KB" for variant, copy in copies.items())
+        print(f"{os.path.basename(path)} ({width}x{height}, {os.path.getsize(path) / 1024:.0f}KB): "
+              f"copies made in {generate:.1f}ms ({sizes})")
+        print(f"  show:   full-size imread {median_ms(cv2.imread, path):.1f}ms | "
+              f"display copy {median_ms(store.load, path, DISPLAY_SIDE):.1f}ms | "
+              f"thumbnail {median_ms(store.load, path, THUMB_SIDE):.1f}ms")
+        print(f"  upload: full file base64 {median_ms(old_upload, path):.1f}ms, {len(old_upload(path)) / 1024:.0f}KB | "
+              f"upload copy {median_ms(lambda: store.upload_image(path).base64()):.1f}ms, "
+              f"{len(store.upload_image(path).base64()) / 1024:.0f}KB")
+
+    shutil.rmtree(store.directory)
+    start = time.perf_counter()
+    result = store.rebuild(os.path.dirname(paths[0]))
+    print(f"Rebuild of {result['images']} images: {time.perf_counter() - start:.2f}s, {store.stats()}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+"""
+Startup benchmark based on `python -X importtime`.
+
+Imports each module in a fresh interpreter, reports the wall-clock import time and the slowest
+imports, and checks that none of the heavy model libraries were loaded as a side effect.
+
+Usage (from the repository root):
+    python -m benchmarks.import_time [module ...]
+"""
+import os
+import subprocess
+import sys
+import time
+
+MODULES = ["ModelPicker", "Classifier", "Model", "Settings", "chat.views"]
+
+# Importing any of these means a model, audio device or large SDK is being set up eagerly
+HEAVY_PACKAGES = ["torch", "whisper", "TTS", "librosa", "sounddevice", "soundfile", "openai", "ollama", "sympy", "cv2"]
+
+DJANGO_SETUP = "import django, os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chatproj.settings'); django.setup(); "
+
+
+def import_module(module):
+    """Imports `module` in a fresh interpreter. Returns (wall seconds, importtime rows)."""
+    code = f"import {module}"
+    if module.startswith("chat."):
+        code = DJANGO_SETUP + code
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=os.getcwd())
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return elapsed, rows
+
+
+def baseline():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - start
+
+
+def main(modules=None):
+    modules = modules or MODULES
+    interpreter_start = baseline()
+    print(f"Bare interpreter start: {interpreter_start * 1000:.0f}ms\n")
+
+    failed = False
+    for module in modules:
+        elapsed, rows = import_module(module)
+        loaded = {name.split(".")[0] for _, _, name in rows}
+        heavy = [package for package in HEAVY_PACKAGES if package in loaded]
+
+        print(f"import {module}: {(elapsed - interpreter_start) * 1000:.0f}ms "
+              f"({len(rows)} modules)")
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[:8]:
+            print(f"    {cumulative_us / 1000:8.1f}ms  {name}")
+        if heavy:
+            failed = True
+            print(f"    !! heavy packages imported: {', '.join(heavy)}")
+        print()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,94 @@
+"""
+Compares the old linear pick_model against CapabilityIndex on synthetic model catalogues.
+
+Each catalogue mimics pulling every tag of a large Ollama library: thousands of local models
+of assorted sizes and a sprinkling of API models, each with a handful of subject strengths.
+Both pickers get the same settings and prompts, and the results are checked to agree.
+
+Usage (from the repository root):
+    python -m benchmarks.model_picker [catalogue size ...]
+"""
+import random
+import statistics
+import sys
+import time
+
+from CapabilityIndex import CapabilityIndex, get_capability_index
+from FastClassifier import SUBJECTS
+from Model import LocalModel, OnlineModel, Strengths
+
+SIZES = [100, 1000, 5000, 20000]
+PICKS = 200
+
+# (user_vram, api_cost_tolerance, use_internet)
+SETTINGS = [(8, 0, False), (24, 0, False), (48, 10, False), (0, 5, True), (0, 50, True)]
+
+
+def synthetic_catalogue(size, seed=0):
+    rng = random.Random(seed)
+    families = ["llama3", "qwen2.5", "mistral", "gemma2", "phi3", "deepseek-r1", "codellama", "llava"]
+    catalogue = []
+    for i in range(size):
+        strengths = [Strengths(subject, rng.randint(1, 10)) for subject in rng.sample(SUBJECTS, rng.randint(2, 6))]
+        if rng.random() < 0.05:
+            catalogue.append(OnlineModel(name=f"api-model-{i}", vram=0, strengths=strengths, response_speed=0,
+                                         cost=rng.choice([1, 3, 5, 25, 300]), vision_model=rng.random() < 0.2))
+        else:
+            family = rng.choice(families)
+            catalogue.append(LocalModel(name=f"{family}:{i}", vram=rng.choice([1, 2, 4, 8, 16, 24, 48, 80]),
+                                        strengths=strengths, response_speed=0, cost=0,
+                                        vision_model=family == "llava"))
+        if catalogue[-1].vision_model:
+            strengths.append(Strengths("Vision", rng.randint(1, 10)))
+    return catalogue
+
+
+def linear_pick(available_models, subject, requires_vision, max_vram, max_cost, use_internet, limit=2):
+    """The pre-index pick_model algorithm (without its debug prints), with the exact subject match and vision routing."""
+    eligible = [model for model in available_models
+                if model.vram <= max_vram and model.cost <= max_cost
+                and type(model) == (OnlineModel if use_internet else LocalModel)]
+    if requires_vision and any(model.vision_model for model in eligible):
+        subject, eligible = "Vision", [model for model in eligible if model.vision_model]
+
+    subject_models = [model for model in eligible
+                      if any(strength.subject_strength == subject for strength in model.strengths)]
+    models_to_sort = subject_models if subject_models else eligible
+    return sorted(models_to_sort, key=lambda model: next(
+        (strength.strength_level for strength in model.strengths if strength.subject_strength == subject), 0),
+                  reverse=True)[:limit]
+
+
+def time_picks(pick, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(pick(query))
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), results
+
+
+def main(sizes):
+    rng = random.Random(1)
+    for size in sizes:
+        catalogue = synthetic_catalogue(size)
+        queries = [(rng.choice(SUBJECTS), rng.random() < 0.1, *rng.choice(SETTINGS)) for _ in range(PICKS)]
+
+        start = time.perf_counter()
+        index = CapabilityIndex(catalogue)
+        build = time.perf_counter() - start
+
+        linear, expected = time_picks(lambda query: linear_pick(catalogue, *query), queries)
+        indexed, actual = time_picks(lambda query: index.pick(*query), queries)
+        # pick_model goes through the cache, which hashes the catalogue on every call
+        cached, _ = time_picks(lambda query: get_capability_index(catalogue).pick(*query), queries)
+
+        mismatches = sum(a != b for a, b in zip(actual, expected))
+        print(f"{size:>6} models: build {build * 1000:.1f}ms | linear {linear * 1e6:.0f}µs | "
+              f"index {indexed * 1e6:.1f}µs ({linear / indexed:.0f}x) | via cache {cached * 1e6:.1f}µs | "
+              f"mismatches {mismatches}")
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,82 @@
+"""
+Hit rate and model time saved by the outfit suggestion cache (OutfitCache) on a repeated-prompt
+workload: REQUESTS outfit requests drawn from a handful of styles (some much more popular than
+others, and written with different case and punctuation), with an item added to the wardrobe
+every CHANGE_EVERY requests. A share of the requests (DIFFERENT_SHARE) asks for a different
+suggestion than the last one shown for that style, as the menu's "different suggestion" does.
+The same workload runs without the cache and with it.
+
+Uses a synthetic wardrobe (benchmarks/outfit_prompt.py) in a temporary database. The model calls
+go to whatever OPENAI_BASE_URL points at, so run it against benchmarks/stub_server.py, which picks
+a random listed item per category:
+
+    python -m benchmarks.stub_server --latency 0.5 &
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python -m benchmarks.outfit_cache [requests] [change every]
+"""
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import OutfitCache
+from benchmarks.outfit_prompt import synthetic_wardrobe
+from ClassificationCache import normalize_prompt
+from Fashion import ai_generate_full_outfit_with_openai, init_db, outfit_ids, save_ingested_items
+
+REQUESTS = 60
+CHANGE_EVERY = 20
+DIFFERENT_SHARE = 0.2
+WARDROBE_SIZE = 500
+STYLES = ["casual", "smart casual", "something for a dinner in autumn", "sporty", "formal",
+          "summer beach day", "rainy office day", "date night"]
+
+
+def workload(count, seed=0):
+    """[(prompt, wants a different suggestion)]"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(STYLES))]  # A few styles are asked for most
+    prompts = rng.choices(STYLES, weights=weights, k=count)
+    return [(rng.choice([prompt, prompt.title(), prompt + "!", f"  {prompt.upper()}  "]), rng.random() < DIFFERENT_SHARE)
+            for prompt in prompts]
+
+
+def run(requests, change_every, use_cache):
+    conn = init_db(os.path.join(tempfile.mkdtemp(), "wardrobe.db"))
+    save_ingested_items(conn, [item[1:] for item in synthetic_wardrobe(WARDROBE_SIZE)])
+    latencies, shown, repeats = [], {}, 0
+    for number, (prompt, different) in enumerate(requests, start=1):
+        style = normalize_prompt(prompt)
+        exclude = shown.get(style, []) if different else []
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # The function prints the model's answer
+            outfit = ai_generate_full_outfit_with_openai(conn, prompt, use_cache=use_cache, exclude=exclude)
+        latencies.append(time.perf_counter() - start)
+        repeats += outfit_ids(outfit) in exclude
+        shown.setdefault(style, []).append(outfit_ids(outfit))
+        if number % change_every == 0:
+            save_ingested_items(conn, [("images/new.jpg", "A new white cotton t-shirt", "")])
+            shown.clear()
+    conn.close()
+    return latencies, repeats
+
+
+def main(count=REQUESTS, change_every=CHANGE_EVERY):
+    requests = workload(count)
+    print(f"{count} requests over {len({prompt for prompt, _ in requests})} prompt spellings of {len(STYLES)} styles, "
+          f"{sum(different for _, different in requests)} asking for a different suggestion, "
+          f"wardrobe changed every {change_every} requests")
+
+    for name, use_cache in (("without cache", False), ("with cache", True)):
+        OutfitCache.outfit_cache_stats.__init__()
+        latencies, repeats = run(requests, change_every, use_cache)
+        print(f"  {name:<14} total {sum(latencies):.1f}s | median {statistics.median(latencies) * 1000:.0f}ms | "
+              f"mean {statistics.mean(latencies) * 1000:.0f}ms | {repeats} different requests got a repeat"
+              + (f" | {OutfitCache.outfit_cache_stats}" if use_cache else ""))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS, int(sys.argv[2]) if len(sys.argv) > 2 else CHANGE_EVERY)
@@ -0,0 +1,104 @@
+"""
+Outfit prompt size and latency as the wardrobe grows: every item in full (the old prompt) against
+the top-k compact summaries, picked in Python (WardrobeIndex) or by SQL (Fashion.outfit_candidates,
+FTS5 plus the category index, on a temporary database).
+
+Uses synthetic wardrobes with vision-model-style descriptions. Token counts are estimates (four
+characters per token); gpt-3.5-turbo's context window is CONTEXT_WINDOW tokens. With --call the
+prompts are also sent to the API at OPENAI_BASE_URL and the latency is timed; the old prompt is
+skipped once it no longer fits.
+
+Usage (from the repository root):
+    python -m benchmarks.outfit_prompt [--sizes 10 100 1000 10000] [--call]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from Clients import call_with_retry, openai_client
+from Fashion import init_db, outfit_candidates, save_ingested_items
+from WardrobeIndex import TOP_K, WardrobeIndex, candidate_lines, estimate_tokens
+
+SIZES = [10, 100, 1000, 10000]
+CONTEXT_WINDOW = 16385
+PROMPT = "something smart casual for a dinner in autumn"
+
+GARMENTS = {
+    "top": ["shirt", "t-shirt", "sweater", "hoodie", "blouse", "jacket", "cardigan", "polo shirt"],
+    "bottom": ["jeans", "chinos", "trousers", "shorts", "skirt", "joggers"],
+    "shoes": ["sneakers", "boots", "loafers", "sandals", "dress shoes"],
+}
+COLOURS = ["navy", "black", "white", "grey", "olive", "beige", "burgundy", "light blue", "brown", "mustard"]
+MATERIALS = ["cotton", "linen", "wool", "denim", "leather", "suede", "polyester blend", "knit"]
+STYLES = ["casual", "smart casual", "formal", "sporty", "relaxed", "tailored", "vintage", "minimalist"]
+SEASONS = ["summer", "winter", "autumn", "spring", "all-season"]
+
+
+def synthetic_wardrobe(size, seed=0):
+    rng = random.Random(seed)
+    items = []
+    for item_id in range(1, size + 1):
+        category = rng.choice(list(GARMENTS))
+        garment, colour, material = rng.choice(GARMENTS[category]), rng.choice(COLOURS), rng.choice(MATERIALS)
+        description = (
+            f"This image shows a {colour} {material} {garment}. The item has a {rng.choice(STYLES)} look and "
+            f"would suit {rng.choice(SEASONS)} weather. Key details include {rng.choice(['a slim fit', 'a loose fit', 'a regular fit'])}, "
+            f"{rng.choice(['visible stitching', 'a subtle texture', 'contrast buttons', 'a plain finish'])} and "
+            f"{rng.choice(['a small logo', 'no visible branding', 'a pattern of fine stripes', 'a solid colour'])}. "
+            f"Category: {category}."
+        )
+        items.append((item_id, f"images/clothing_{item_id}.jpg", description, ""))
+    return items
+
+
+def old_prompt(items):
+    return "Clothing Items:\n" + "\n".join(f"ID {item[0]}: {item[2]} - {item[3]}" for item in items)
+
+
+def call(prompt):
+    start = time.perf_counter()
+    call_with_retry("openai", openai_client().chat.completions.create, model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": prompt}], max_tokens=150)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--call", action="store_true", help="Also time the API call for each prompt")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        items = synthetic_wardrobe(size)
+        full = old_prompt(items)
+        full_tokens = estimate_tokens(full)
+
+        start = time.perf_counter()
+        index = WardrobeIndex(items)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        compact = "Clothing Items:\n" + "\n".join(candidate_lines(index.candidates(PROMPT, k=TOP_K)))
+        retrieval = time.perf_counter() - start
+        compact_tokens = estimate_tokens(compact)
+
+        conn = init_db(os.path.join(tempfile.mkdtemp(), "wardrobe.db"))
+        save_ingested_items(conn, [item[1:] for item in items])
+        start = time.perf_counter()
+        outfit_candidates(conn, PROMPT, k=TOP_K)
+        sql = time.perf_counter() - start
+        conn.close()
+
+        line = (f"{size:>6} items: all items ~{full_tokens} tokens"
+                f"{' (over the context window)' if full_tokens > CONTEXT_WINDOW else ''} | "
+                f"top-{TOP_K} ~{compact_tokens} tokens | "
+                f"index build {build * 1000:.1f}ms (once per wardrobe change), retrieval {retrieval * 1000:.1f}ms | SQL retrieval {sql * 1000:.1f}ms")
+        if args.call:
+            old_latency = f"{call(full):.2f}s" if full_tokens <= CONTEXT_WINDOW else "n/a"
+            line += f" | API latency: all items {old_latency}, top-{TOP_K} {call(compact):.2f}s"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of the pitch shift implementations on VCTK speaker outputs.
+
+Each speaker says the same sentence once; every pitch shift mode is then timed on that audio
+and compared against the librosa output with a log-spectral distance (lower = closer).
+
+First, every mode (and alias) shifts pure tones and the spectral peak is checked against the
+expected frequency; the benchmark stops with an error if any is off by more than PITCH_TOLERANCE.
+
+Usage (from the repository root):
+    python -m benchmarks.pitch_shift [repeats]
+"""
+import sys
+import time
+
+import numpy as np
+
+from AudioEffects import MODE_ALIASES, PITCH_SHIFT_MODES, shift_pitch
+from TextToSpeech import SAMPLE_RATE, get_tts
+
+SPEAKERS = ["p225", "p227", "p243", "p251", "p270"]
+SENTENCE = "Hold on for one second, I am loading your settings."
+STEPS = [-2, -1, 1, 2]
+TONES = [120, 200]  # Hz, around male and female speaking pitch
+PITCH_TOLERANCE = 0.01  # Relative error allowed on the shifted tone's peak
+
+
+def log_spectral_distance(a, b, frame_length=1024):
+    """Mean distance in dB between the magnitude spectra of two equally long signals."""
+    frame_count = min(len(a), len(b)) // frame_length
+    window = np.hanning(frame_length)
+    a = a[:frame_count * frame_length].reshape(frame_count, frame_length) * window
+    b = b[:frame_count * frame_length].reshape(frame_count, frame_length) * window
+    spectrum_a = 20 * np.log10(np.abs(np.fft.rfft(a, axis=1)) + 1e-6)
+    spectrum_b = 20 * np.log10(np.abs(np.fft.rfft(b, axis=1)) + 1e-6)
+    return float(np.sqrt(np.mean((spectrum_a - spectrum_b) ** 2)))
+
+
+def peak_frequency(wav, sr):
+    spectrum = np.abs(np.fft.rfft(wav * np.hanning(len(wav))))
+    return np.argmax(spectrum) * sr / len(wav)
+
+
+def pitch_check():
+    """Shifts one-second tones with every mode and returns the (mode, tone, steps, peak) that missed."""
+    failures = []
+    time_axis = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    for mode in PITCH_SHIFT_MODES + tuple(MODE_ALIASES):
+        try:
+            for tone in TONES:
+                wav = np.sin(2 * np.pi * tone * time_axis).astype(np.float32)
+                for steps in STEPS:
+                    peak = peak_frequency(shift_pitch(wav, SAMPLE_RATE, steps, mode=mode), SAMPLE_RATE)
+                    expected = tone * 2 ** (steps / 12)
+                    if abs(peak - expected) > PITCH_TOLERANCE * expected:
+                        failures.append((mode, tone, steps, peak))
+        except ImportError as e:
+            print(f"Pitch check: skipping {mode} ({e})")
+    return failures
+
+
+def time_call(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), result
+
+
+def main(repeats=5):
+    failures = pitch_check()
+    for mode, tone, steps, peak in failures:
+        print(f"Pitch check: {mode} shifted {tone}Hz by {steps:+d} semitones to {peak:.1f}Hz, "
+              f"expected {tone * 2 ** (steps / 12):.1f}Hz")
+    if failures:
+        sys.exit(1)
+    print(f"Pitch check: every mode shifts {TONES}Hz tones by {STEPS} semitones to within {PITCH_TOLERANCE:.0%}")
+
+    timings = {mode: [] for mode in PITCH_SHIFT_MODES}
+    distances = {mode: [] for mode in PITCH_SHIFT_MODES}
+    bypass = []
+
+    for speaker in SPEAKERS:
+        wav = np.array(get_tts().tts(text=SENTENCE, speaker=speaker), dtype=np.float32)
+        print(f"{speaker}: {len(wav) / SAMPLE_RATE:.2f}s of audio")
+
+        bypass.append(time_call(lambda: shift_pitch(wav, SAMPLE_RATE, 0), repeats)[0])
+
+        for steps in STEPS:
+            _, reference = time_call(lambda: shift_pitch(wav, SAMPLE_RATE, steps, mode="quality"), 1)
+            for mode in PITCH_SHIFT_MODES:
+                seconds, shifted = time_call(lambda: shift_pitch(wav, SAMPLE_RATE, steps, mode=mode), repeats)
+                timings[mode].append(seconds)
+                distances[mode].append(log_spectral_distance(shifted, reference))
+
+    print(f"\n{'mode':<10}{'median ms':>12}{'speedup':>10}{'dB from librosa':>18}")
+    librosa_time = np.median(timings["quality"])
+    for mode in PITCH_SHIFT_MODES:
+        median = np.median(timings[mode])
+        print(f"{mode:<10}{median * 1000:>12.1f}{librosa_time / median:>9.1f}x{np.mean(distances[mode]):>18.2f}")
+    print(f"{'pitch=0':<10}{np.median(bypass) * 1000:>12.4f}")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,90 @@
+"""
+Compares end-of-speech to final-text latency for the file-based and streaming transcription paths.
+
+A recorded utterance is replayed in real time (followed by the recorder's silence window) so
+both paths see audio arrive exactly as they would from the microphone.
+
+Usage (from the repository root):
+    python -m benchmarks.stt_streaming path/to/utterance.wav [model] [runs]
+"""
+import sys
+import time
+
+import numpy as np
+import soundfile as sf
+
+from SpeechToText import StreamingTranscriber, transcribe_audio
+from WhisperRegistry import get_whisper_model, whisper_registry
+
+BLOCK_SIZE = 1024  # Roughly what sd.InputStream hands the callback at 44.1 kHz
+LONG_SILENCE_DURATION = 2.5
+
+
+def replay(audio, samplerate, on_chunk):
+    """Feeds `audio` to `on_chunk` block by block at real-time speed, then the silence window."""
+    silence = np.zeros((int(LONG_SILENCE_DURATION * samplerate),) + audio.shape[1:], dtype=np.float32)
+    start = time.perf_counter()
+    speech_end = None
+
+    for position, block in enumerate(_blocks(np.concatenate([audio, silence]))):
+        if speech_end is None and position * BLOCK_SIZE >= len(audio):
+            speech_end = time.perf_counter()
+        on_chunk(block)
+        delay = start + (position + 1) * BLOCK_SIZE / samplerate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    return speech_end if speech_end is not None else time.perf_counter()
+
+
+def _blocks(audio):
+    for offset in range(0, len(audio), BLOCK_SIZE):
+        yield audio[offset:offset + BLOCK_SIZE]
+
+
+def run_file_based(audio, samplerate, model):
+    recording = []
+    speech_end = replay(audio, samplerate, recording.append)
+
+    sf.write("tmp/benchmark_response.wav", np.concatenate(recording, axis=0), samplerate)
+    text = transcribe_audio("tmp/benchmark_response.wav", model=model)
+    return time.perf_counter() - speech_end, text
+
+
+def run_streaming(audio, samplerate, model):
+    transcriber = StreamingTranscriber(samplerate=samplerate, model=model).start()
+    speech_end = replay(audio, samplerate, transcriber.feed)
+
+    text = transcriber.finish(trim_tail=LONG_SILENCE_DURATION - 0.5)
+    return time.perf_counter() - speech_end, text, transcriber.decode_count
+
+
+def main(path, model="small", runs=3):
+    audio, samplerate = sf.read(path, dtype="float32")
+    print(f"Utterance: {path} ({len(audio) / samplerate:.2f}s at {samplerate} Hz), model: {model}")
+
+    get_whisper_model(model)  # Load once so neither path pays for it
+
+    file_latencies = []
+    stream_latencies = []
+    for run in range(runs):
+        latency, text = run_file_based(audio, samplerate, model)
+        file_latencies.append(latency)
+        print(f"[file]      run {run + 1}: {latency:.2f}s  {text.strip()!r}")
+
+        latency, text, decodes = run_streaming(audio, samplerate, model)
+        stream_latencies.append(latency)
+        print(f"[streaming] run {run + 1}: {latency:.2f}s  {text.strip()!r} ({decodes} decodes)")
+
+    print("\nEnd of speech -> final text (includes the "
+          f"{LONG_SILENCE_DURATION}s silence window):")
+    print(f"  file-based: median {np.median(file_latencies):.2f}s")
+    print(f"  streaming:  median {np.median(stream_latencies):.2f}s")
+    print(whisper_registry.stats())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1], *(sys.argv[2:3]), *[int(arg) for arg in sys.argv[3:4]])
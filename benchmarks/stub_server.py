@@ -0,0 +1,203 @@
+"""
+Stand-in for the OpenAI and Ollama HTTP APIs, for load testing without GPUs or API costs.
+
+Answers the endpoints the app uses with canned text after a configurable delay:
+- POST /v1/chat/completions (plain, streamed and JSON / json_schema response formats)
+- POST /api/chat (plain, streamed and format=schema), POST /api/generate (model loads/unloads), GET /api/ps
+
+Requests with a JSON schema get the first allowed value for every field, so the classifier
+parses them. JSON requests listing wardrobe items ("ID 12: top | ...", as Fashion sends them) get
+a random listed item per category, so outfit suggestions vary like a real model's. --error-rate
+answers a share of requests with 503 to exercise the client retries.
+
+Usage (from the repository root):
+    python -m benchmarks.stub_server [--port 8765] [--latency 0.5] [--tokens 30] [--token-interval 0.01] [--error-rate 0]
+
+then run the app or a benchmark against it:
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub OLLAMA_HOST=http://127.0.0.1:8765 \\
+        uvicorn chatproj.asgi:application
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORD = "stub "
+
+
+def value_for(schema):
+    """A value that satisfies a (simple) JSON schema."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: value_for(prop) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    return {"string": "stub", "integer": 1, "number": 1.0, "boolean": False}.get(kind)
+
+
+def outfit_for(messages):
+    """{category: item_id} picked at random from the "ID {id}: {category} | ..." lines, or None if there are none."""
+    items = {}
+    for message in messages:
+        content = message.get("content")
+        for item_id, category in re.findall(r"^ID (\d+): (\w+)", content if isinstance(content, str) else "", re.MULTILINE):
+            items.setdefault(category, []).append(int(item_id))
+    return {category: random.choice(ids) for category, ids in items.items()} or None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive, like the real APIs
+    config = None
+    counter_lock = threading.Lock()
+    served = 0
+
+    def log_message(self, format, *args):
+        pass  # Thousands of requests per second would flood the terminal
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _count(self):
+        with StubHandler.counter_lock:
+            StubHandler.served += 1
+
+    def _fail(self):
+        """Simulates an overloaded backend for --error-rate of requests."""
+        if random.random() < self.config.error_rate:
+            self._send_json({"error": "stub overloaded"}, status=503)
+            return True
+        return False
+
+    def _answer(self, schema, outfit=None):
+        time.sleep(self.config.latency)
+        if outfit is not None:
+            return json.dumps(outfit)
+        if schema is not None:
+            return json.dumps(value_for(schema))
+        return WORD * self.config.tokens
+
+    def do_GET(self):
+        self._count()
+        if self.path == "/api/ps":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        self._count()
+        request = self._read_json()
+        if self._fail():
+            return
+
+        if self.path == "/v1/chat/completions":
+            self._openai_chat(request)
+        elif self.path == "/api/chat":
+            self._ollama_chat(request)
+        elif self.path == "/api/generate":
+            self._send_json({"model": request.get("model"), "response": "", "done": True, "load_duration": 0})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _openai_chat(self, request):
+        response_format = request.get("response_format") or {}
+        schema = None
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+        elif response_format.get("type") == "json_object":
+            schema = {"type": "object"}
+
+        created = int(time.time())
+        if not request.get("stream"):
+            outfit = outfit_for(request.get("messages", [])) if response_format.get("type") == "json_object" else None
+            text = self._answer(schema, outfit)
+            self._send_json({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": created, "model": request.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": self.config.tokens,
+                          "total_tokens": 10 + self.config.tokens},
+            })
+            return
+
+        time.sleep(self.config.latency)
+        self._start_chunked("text/event-stream")
+        for _ in range(self.config.tokens):
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                     "model": request.get("model"),
+                     "choices": [{"index": 0, "delta": {"content": WORD}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            time.sleep(self.config.token_interval)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+    def _ollama_chat(self, request):
+        schema = request.get("format")
+        schema = {"type": "object"} if schema == "json" else schema or None
+        done = {"model": request.get("model"), "created_at": "2024-01-01T00:00:00Z", "done": True,
+                "done_reason": "stop", "total_duration": 0, "load_duration": 0,
+                "prompt_eval_count": 10, "eval_count": self.config.tokens, "eval_duration": 0}
+
+        if request.get("stream") is False:
+            text = self._answer(schema)
+            self._send_json(dict(done, message={"role": "assistant", "content": text}))
+            return
+
+        time.sleep(self.config.latency)
+        self._start_chunked("application/x-ndjson")
+        for _ in range(self.config.tokens):
+            part = {"model": request.get("model"), "created_at": "2024-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": WORD}, "done": False}
+            self._write_chunk((json.dumps(part) + "\n").encode())
+            time.sleep(self.config.token_interval)
+        self._write_chunk((json.dumps(dict(done, message={"role": "assistant", "content": ""})) + "\n").encode())
+        self._end_chunked()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--tokens", type=int, default=30, help="Tokens per answer")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    StubHandler.config = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", StubHandler.config.port), StubHandler)
+    server.daemon_threads = True
+    print(f"Stub OpenAI/Ollama server on http://127.0.0.1:{StubHandler.config.port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Served {StubHandler.served} requests")
+
+
+if __name__ == '__main__':
+    main()
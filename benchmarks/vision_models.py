@@ -0,0 +1,110 @@
+"""
+Latency of a vision prompt on the local vision model against the API ones, on the same images.
+
+The test images are generated, so the benchmark needs no files: a clothing-like photo with a
+printed label, a colour chart and a page of text, each at webcam (640x480) and full HD size.
+Every model gets every image with the same prompt, prepared the way Vision.UseVision prepares
+it for that model. A model that fails (not pulled, no API key, server down) is reported and
+skipped. The local model's first call includes loading it, so it's reported separately.
+
+Usage (from the repository root):
+    python -m benchmarks.vision_models [--models llama3.2-vision gpt-4o-mini gpt-4o] [--images PATH ...] [--runs 2]
+
+Against benchmarks/stub_server.py this measures the app's own overhead rather than the models.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from Vision import VISION_CATALOGUE, VISION_MAX_TOKENS, prepare_for_model
+
+PROMPT = "Describe the main object in this picture and its colours in one sentence."
+DEFAULT_MODELS = ["llama3.2-vision", "gpt-4o-mini", "gpt-4o"]
+SIZES = [(640, 480), (1920, 1080)]
+
+
+def shirt_image(width, height):
+    image = np.full((height, width, 3), (200, 205, 210), np.uint8)
+    body = np.array([[0.35, 0.25], [0.65, 0.25], [0.8, 0.4], [0.7, 0.45], [0.68, 0.9], [0.32, 0.9],
+                     [0.3, 0.45], [0.2, 0.4]]) * (width, height)
+    cv2.fillPoly(image, [body.astype(np.int32)], (40, 40, 170))
+    cv2.putText(image, "SALE", (int(width * 0.41), int(height * 0.6)), cv2.FONT_HERSHEY_SIMPLEX,
+                width / 500, (255, 255, 255), max(1, width // 300))
+    return image
+
+
+def colour_chart(width, height):
+    colours = [(0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 255, 255), (255, 0, 255), (255, 255, 0),
+               (0, 0, 0), (128, 128, 128), (255, 255, 255), (0, 128, 255), (128, 0, 128), (42, 42, 165)]
+    image = np.zeros((height, width, 3), np.uint8)
+    for i, colour in enumerate(colours):
+        x, y = i % 4, i // 4
+        image[y * height // 3:(y + 1) * height // 3, x * width // 4:(x + 1) * width // 4] = colour
+    return image
+
+
+def text_page(width, height):
+    image = np.full((height, width, 3), 245, np.uint8)
+    scale = width / 1400
+    for line in range(8):
+        cv2.putText(image, f"Line {line + 1}: the quick brown fox jumps over the lazy dog",
+                    (int(width * 0.05), int(height * (line + 1) / 9)), cv2.FONT_HERSHEY_SIMPLEX, scale, (20, 20, 20),
+                    max(1, width // 600))
+    return image
+
+
+def test_images(paths):
+    if paths:
+        return [(os.path.basename(path), cv2.imread(path)) for path in paths]
+    return [(f"{make.__name__} {width}x{height}", make(width, height))
+            for make in (shirt_image, colour_chart, text_page) for width, height in SIZES]
+
+
+def run_model(model, images, runs):
+    """Returns (first call seconds, later call seconds, prompt tokens, upload bytes), or None on failure."""
+    latencies, tokens, sizes = [], [], []
+    for _ in range(runs):
+        for _, frame in images:
+            start = time.perf_counter()
+            image = prepare_for_model(frame, model)
+            try:
+                completion = model.complete(PROMPT, image=image, max_tokens=VISION_MAX_TOKENS)
+            except Exception as e:
+                print(f"  {model}: failed ({e}), skipping")
+                return None
+            latencies.append(time.perf_counter() - start)
+            tokens.append(completion.prompt_tokens)
+            sizes.append(len(image.data))
+    return latencies[0], latencies[1:] or latencies, tokens, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--images", nargs="+", default=None)
+    parser.add_argument("--runs", type=int, default=2, help="Passes over the image set per model")
+    args = parser.parse_args()
+
+    models = {model.name: model for model in VISION_CATALOGUE if model.vision_model}
+    images = test_images(args.images)
+    print(f"{len(images)} images x {args.runs} runs")
+
+    for name in args.models:
+        if name not in models:
+            print(f"  {name}: not a vision model in the catalogue, choose from {list(models)}")
+            continue
+        result = run_model(models[name], images, args.runs)
+        if result is None:
+            continue
+        first, rest, tokens, sizes = result
+        print(f"  {name:<16} first {first:.2f}s | median {statistics.median(rest):.2f}s | "
+              f"p90 {np.percentile(rest, 90):.2f}s | {statistics.mean(tokens):.0f} prompt tokens | "
+              f"{statistics.mean(sizes) / 1024:.0f}KB per image")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Payload size and preparation time for a vision upload: the old path against ImagePipeline.
+
+The old path wrote the full-resolution frame to captured_image.jpg with cv2.imwrite, read the
+file back and base64-encoded it. The new one resizes to what the API looks at and encodes once
+in memory. Both are timed from the frame in memory to the base64 string ready to send.
+
+Uses a synthetic 1920x1080 camera frame unless image files are given.
+
+Usage (from the repository root):
+    python -m benchmarks.vision_payload [image ...]
+"""
+import base64
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+
+from CaptureService import SyntheticSource
+from ImagePipeline import prepare_image, vision_tokens
+
+RUNS = 20
+
+
+def old_path(frame, path):
+    start = time.perf_counter()
+    cv2.imwrite(path, frame)
+    with open(path, "rb") as image_file:
+        payload = base64.b64encode(image_file.read()).decode("utf-8")
+    return time.perf_counter() - start, len(payload)
+
+
+def new_path(frame, **options):
+    start = time.perf_counter()
+    image = prepare_image(frame, **options)
+    payload = image.base64()
+    return time.perf_counter() - start, len(payload), image
+
+
+def frames(paths):
+    if paths:
+        return [(os.path.basename(path), cv2.imread(path)) for path in paths]
+    source = SyntheticSource(width=1920, height=1080, warmup=0)
+    source.open()
+    _, frame = source.read()
+    return [("synthetic 1920x1080", frame)]
+
+
+def main(paths):
+    path = os.path.join(tempfile.mkdtemp(), "captured_image.jpg")
+    variants = [("jpeg q85", {}), ("webp q80", {"image_format": "webp", "quality": 80}),
+                ("jpeg q85 low detail", {"detail": "low"})]
+
+    for name, frame in frames(paths):
+        height, width = frame.shape[:2]
+        old = [old_path(frame, path) for _ in range(RUNS)]
+        print(f"{name}:")
+        print(f"  old path          {old[0][1] / 1024:8.0f}KB {statistics.median(t for t, _ in old) * 1000:7.1f}ms "
+              f"~{vision_tokens(width, height)} tokens")
+        for label, options in variants:
+            new = [new_path(frame, **options) for _ in range(RUNS)]
+            image = new[0][2]
+            print(f"  {label:<18}{new[0][1] / 1024:8.0f}KB {statistics.median(t for t, _, _ in new) * 1000:7.1f}ms "
+                  f"~{image.tokens} tokens ({image.width}x{image.height})")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
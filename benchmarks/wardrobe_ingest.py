@@ -0,0 +1,70 @@
+"""
+Items per minute when adding a folder of clothing pictures: one at a time, as Fashion.main does,
+against Fashion.ingest_directory's worker pool and batched inserts.
+
+Generates the images in a temporary folder and uses a temporary database. The vision calls go to
+whatever OPENAI_BASE_URL points at, so run it against benchmarks/stub_server.py:
+
+    python -m benchmarks.stub_server --latency 0.5 &
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python -m benchmarks.wardrobe_ingest [images] [workers]
+
+A second ingest of the same folder is timed too, to check it resumes instead of redoing work. The
+generated images differ only a little in colour and the stub describes them all alike, so most
+are reported as possible duplicates; they're still saved, so the duplicate check is part of the
+timing.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+from benchmarks.vision_models import shirt_image
+from Fashion import describe_image, ingest_directory, init_db, save_clothing_item
+from ImageStore import get_image_store
+
+IMAGES = 40
+WORKERS = 8
+
+
+def make_images(directory, count):
+    for i in range(count):
+        image = shirt_image(640, 480)
+        image[:, :, i % 3] = (image[:, :, i % 3].astype(int) + i * 7 % 80).clip(0, 255)  # Vary the colours a bit
+        cv2.imwrite(os.path.join(directory, f"clothing_{i:04d}.jpg"), image)
+
+
+def one_at_a_time(conn, directory):
+    start = time.perf_counter()
+    for name in sorted(os.listdir(directory)):
+        image_path = os.path.join(directory, name)
+        description, details = describe_image(image_path)
+        save_clothing_item(conn, image_path, description, details)
+    return time.perf_counter() - start
+
+
+def main(count=IMAGES, workers=WORKERS):
+    directory = tempfile.mkdtemp()
+    make_images(directory, count)
+    get_image_store().directory = os.path.join(directory, ".derivatives")
+
+    conn = init_db(os.path.join(tempfile.mkdtemp(), "sequential.db"))
+    seconds = one_at_a_time(conn, directory)
+    conn.close()
+    print(f"One at a time: {seconds:.1f}s, {count / seconds * 60:.1f} items/min")
+
+    conn = init_db(os.path.join(tempfile.mkdtemp(), "ingest.db"))
+    summary = ingest_directory(conn, directory, workers=workers, requests_per_minute=6000)
+    print(f"Bulk ingest with {workers} workers: {summary['seconds']:.1f}s, {summary['items_per_minute']:.1f} items/min, "
+          f"{summary['possible_duplicates']} possible duplicates")
+
+    summary = ingest_directory(conn, directory, workers=workers, requests_per_minute=6000)
+    print(f"Second run: {summary['skipped']} skipped, {summary['saved']} described again, {summary['seconds']:.2f}s")
+    rows = conn.execute("SELECT COUNT(*) FROM clothing").fetchone()[0]
+    conn.close()
+    print(f"Items in the wardrobe: {rows}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else IMAGES, int(sys.argv[2]) if len(sys.argv) > 2 else WORKERS)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import ChatView
+from .views import ChatView, ChatStreamView
 from django.contrib.auth.decorators import login_required
 
 urlpatterns = [
     path('', login_required(ChatView.as_view()), name='chat'),
+    path('stream/', login_required(ChatStreamView.as_view()), name='chat_stream'),
 ]
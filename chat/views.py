@@ -1,62 +1,146 @@
-from django.views.generic import TemplateView
+import asyncio
+import json
+
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render
-from django.utils.safestring import mark_safe
+from django.views import View
 
 from Model import Model, LocalModel, _available_models, OnlineModel, deepseek_r1_1_5, gpt4_vision, o3mini, gptturbo
 
 
-from Classifier import classify_prompt
+from Classifier import aclassify_prompt
 from ModelPicker import pick_model
 
+from ResponsePipeline import ResponsePipeline, StageTimings
+from Settings import get_user_settings
 
-# Placeholder generate_response function
-def generate_response(message):
-    # TODO: Load settings
+pipeline = ResponsePipeline(base_model=gptturbo)
 
-    print(f"Prompt: {message}")
 
-    # Classify the prompt
-    prompt_classification = classify_prompt(prompt=message)
-    print("Using this classification: ", prompt_classification)
+async def load_web_settings():
+    """
+    Loads settings.json off the event loop. A web request can't answer the spoken setup wizard,
+    so a missing file raises SettingsMissingError instead; once loaded, the settings are reused.
+    """
+    return await asyncio.to_thread(get_user_settings, interactive=False)
+
 
+async def generate_response(message):
+    """
+    Classifies the message, drafts an answer with the base model and has the best model improve it.
+    Every model call is awaited, so the worker is free to serve other requests in the meantime.
+    """
+    await load_web_settings()
 
+    print(f"Prompt: {message}")
 
-    best_models = pick_model(available_models=_available_models, prompt_classification=prompt_classification)
-    base_model = gptturbo
-    model = best_models[0]
+    timings = StageTimings()
 
+    # Classify the prompt
+    with timings.stage("classify"):
+        prompt_classification = await aclassify_prompt(prompt=message)
+    print("Using this classification: ", prompt_classification)
 
-    response = base_model.chat(prompt=message)
+    with timings.stage("pick_model"):
+        best_models = await asyncio.to_thread(pick_model, available_models=_available_models,
+                                                  prompt_classification=prompt_classification)
 
-    output = model.chat(prompt=("Below is the original prompt" + message + "Below is the old models response" + response),
-               system_message="YOU ARE AN AI THAT ANALYZES OUTPUTS FROM OTHER AI. Only output the improved response. Keep the response to a maximum of three sentences")
+    output, model, timings = await pipeline.arun(message, prompt_classification, best_models, timings=timings)
+    timings.report()
 
     return f"{output}", model.name
 
-class ChatView(TemplateView):
+class ChatView(View):
+    """
+    Async chat page. Served through chatproj/asgi.py, one process can have many conversations
+    waiting on models at once instead of tying up a worker thread per request.
+    """
     template_name = 'chat/chat.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['messages'] = self.request.session.get('messages', [])
-        return context
+    async def get(self, request, *args, **kwargs):
+        messages = await request.session.aget('messages', [])
+        return render(request, self.template_name, {'messages': messages})
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         message = request.POST.get('message')
 
         print(f"Message received: {message}")
         if message:
-            messages = request.session.get('messages', [])
+            messages = await request.session.aget('messages', [])
             messages.append({'user': True, 'text': message})
 
             # Expecting generate_response to return (response_text, model_name)
-            response_text, model_name = generate_response(message)
+            response_text, model_name = await generate_response(message)
             messages.append({
                 'user': False,
                 'text': response_text,
                 'model': model_name
             })
 
-            request.session['messages'] = messages
-        return self.get(request, *args, **kwargs)
+            await request.session.aset('messages', messages)
+        return await self.get(request, *args, **kwargs)
+
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_response(request, message):
+    """
+    Runs the same pipeline as generate_response, but streams the answering model's output as
+    server-sent events and saves the finished exchange to the session at the end.
+    """
+    messages = await request.session.aget('messages', [])
+    messages.append({'user': True, 'text': message})
+
+    timings = StageTimings()
+    try:
+        await load_web_settings()
+
+        with timings.stage("classify"):
+            prompt_classification = await aclassify_prompt(prompt=message)
+        print("Using this classification: ", prompt_classification)
+
+        with timings.stage("pick_model"):
+            best_models = await asyncio.to_thread(pick_model, available_models=_available_models,
+                                                      prompt_classification=prompt_classification)
+
+        output = []
+        async for event, data in pipeline.astream(message, prompt_classification, best_models, timings=timings):
+            if event == 'model':
+                model_name = data
+            else:
+                output.append(data)
+            yield server_sent_event(event, data)
+    except Exception as e:
+        print("Error streaming response:", e)
+        yield server_sent_event('error', str(e))
+        return
+
+    messages.append({
+        'user': False,
+        'text': "".join(output).strip(),
+        'model': model_name
+    })
+    timings.report()
+
+    # The session middleware has already run by the time the stream finishes, so save here
+    await request.session.aset('messages', messages)
+    await request.session.asave()
+    yield server_sent_event('done', {})
+
+
+class ChatStreamView(View):
+    """Streams the answer to a chat message token by token (text/event-stream)."""
+
+    async def post(self, request, *args, **kwargs):
+        message = request.POST.get('message')
+
+        print(f"Message received: {message}")
+        if not message:
+            return HttpResponseBadRequest("Message is required")
 
+        response = StreamingHttpResponse(stream_response(request, message), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop proxies from buffering the stream
+        return response